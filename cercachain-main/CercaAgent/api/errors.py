@@ -1,4 +1,6 @@
 """Custom error classes for backend error handling"""
+# Raised by the inference executor, which is shared with the api app
+from ml_executor import DeadlineExceededError, OverloadedError  # noqa: F401
 
 class NetworkError(Exception):
     """Raised when network-related operations fail"""
@@ -16,4 +18,17 @@ class TimeoutError(Exception):
     """Raised when an operation times out"""
     def __init__(self, message="Operation timed out"):
         self.message = message
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+class RateLimitedError(Exception):
+    """Raised when one client is over its request rate or its share of requests in progress"""
+    def __init__(self, message="Too many requests", retry_after=1):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+class NoSpeechError(Exception):
+    """Raised when a clip holds no speech, so it is not worth transcribing"""
+    def __init__(self, message="No speech in the audio"):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,263 @@
+"""Full-pipeline benchmark and load test.
+
+Run from the CercaAgent directory:
+
+    python benchmark.py --backends torch,torch-int8 --sizes tiny,small --concurrency 1,4,8
+
+Every backend/size combination runs in its own process (settings are read
+at import time). Each one reports per-stage timings from a sequential pass
+over the synthetic corpus (decode, resample, features, encoder, decoder,
+classify, execute). It also reports end-to-end latency percentiles and
+throughput of POST /process_audio through an in-process ASGI client at each
+concurrency level. Results are saved as JSON and compared against
+``--baseline`` when given.
+
+``--decoding free,command`` compares the decoding profiles
+(voice_recognition/decoding.py); stage timings then include the number of
+tokens generated per request next to the decoder time.
+
+With ``--cascade tiny.en`` the load test runs through the two-tier cascade
+(inference/cascade.py) and also reports its escalation rate and per-tier
+latency, for tuning ``--cascade-min-logprob`` and ``--cascade-min-confidence``.
+
+``--encoder-buckets 5,10`` runs the torch backends' encoder on shorter
+windows than 30s (``encoder_buckets_s``). The stage timings then include the
+silence trimming stage, and every result reports the seconds of audio
+received, left after trimming and encoded; compare transcripts against a run
+without buckets before turning them on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Sequence
+
+from config import settings
+
+sys.path.append(os.path.abspath(settings.ml_path))
+
+from benchmark_corpus import (
+    compare_results,
+    load_results,
+    percentiles,
+    save_results,
+    synthesize_corpus,
+    time_stages,
+    timed_decode,
+)
+
+READY_TIMEOUT_S = 600
+
+def stage_benchmark(corpus: Sequence[Dict[str, Any]], repeats: int) -> Dict[str, Any]:
+    """Sequential per-stage timings, one clip at a time with no batching or pool
+
+    Returns the stage percentiles, the tokens generated per request and the
+    seconds of audio received, left after trimming and encoded.
+    """
+    from command_mapping.action_map import action_targets, get_action
+    from event_handling.engine import ActionEngine
+    from inference.registry import registry
+    from voice_recognition.classify import parse_batch
+    from voice_recognition.transcribe import transcribe_batch
+    from voice_recognition.vad import speech_bounds
+
+    registry.load_all()
+    registry.get("whisper").split_encoder = True
+    engine = ActionEngine(default_timeout=settings.action_timeout_s, targets=action_targets)
+    loop = asyncio.new_event_loop()
+
+    tokens: List[int] = []
+    audio: Dict[str, List[float]] = {"received": [], "speech": [], "encoded": []}
+
+    def run(audio_data: bytes, timings: Dict[str, int]):
+        samples = timed_decode(audio_data, timings)
+        received = len(samples) / 16000
+        if settings.trim_silence:
+            started = time.perf_counter_ns()
+            bounds = speech_bounds(samples, 16000, settings.vad_frame_ms, settings.trim_threshold_db,
+                                   settings.trim_padding_ms)
+            if bounds is not None:
+                samples = samples[bounds[0]:bounds[1]]
+            timings["trim"] = time.perf_counter_ns() - started
+        encoded: List[float] = []
+        texts = transcribe_batch([samples], timings, tokens, encoded)
+        audio["received"].append(received)
+        audio["speech"].append(len(samples) / 16000)
+        audio["encoded"].extend(encoded)
+        started = time.perf_counter_ns()
+        intent, args = parse_batch(texts)[0]
+        classified = time.perf_counter_ns()
+        loop.run_until_complete(engine.execute(intent, get_action(intent), args=args))
+        timings["classify"] = classified - started
+        timings["execute"] = time.perf_counter_ns() - classified
+
+    try:
+        stages = time_stages(run, corpus, repeats=repeats)
+        # The warmup pass generated tokens and audio too
+        measured = len(corpus) * repeats
+        return {"stages": stages, "tokens": percentiles(tokens[-measured:]),
+                "audio_s": {stage: round(sum(seconds[-measured:]), 2) for stage, seconds in audio.items()}}
+    finally:
+        loop.close()
+        engine.shutdown()
+
+async def load_test(corpus: Sequence[Dict[str, Any]], concurrency: Sequence[int],
+                    requests_per_level: int) -> Dict[str, Any]:
+    """End-to-end POST /process_audio latency and throughput through the ASGI app"""
+    import httpx
+    import main
+    from inference.registry import registry
+
+    levels = {}
+    async with main.lifespan(main.app):
+        waited = time.monotonic()
+        while not registry.ready:
+            if time.monotonic() - waited > READY_TIMEOUT_S:
+                raise RuntimeError("Models did not become ready; see logs/app.log")
+            await asyncio.sleep(0.1)
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for level in concurrency:
+                latencies: List[float] = []
+                statuses: Dict[int, int] = {}
+                pending = iter(range(requests_per_level))
+
+                async def worker():
+                    for i in pending:
+                        clip = corpus[i % len(corpus)]
+                        started = time.perf_counter_ns()
+                        response = await client.post("/process_audio", files={"audio": (f"{clip['name']}.wav", clip["wav"])})
+                        latencies.append((time.perf_counter_ns() - started) / 1e6)
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+                started = time.perf_counter()
+                await asyncio.gather(*[worker() for _ in range(level)])
+                elapsed = time.perf_counter() - started
+                levels[str(level)] = {
+                    "latency_ms": percentiles(latencies),
+                    "throughput_rps": len(latencies) / elapsed,
+                    "statuses": statuses,
+                    "batching": main.scheduler.stats(),
+                    # Cumulative over the levels run so far
+                    "cascade": main.cascade.stats(),
+                }
+    return levels
+
+def run_config(args) -> Dict[str, Any]:
+    # Settings must be overridden before anything that reads them is imported
+    settings.whisper_backend = args.backend
+    settings.whisper_size = args.size
+    settings.decoding_mode = args.decoding
+    settings.encoder_buckets_s = [float(b) for b in args.encoder_buckets.split(",")] if args.encoder_buckets else []
+    # Every load test request comes from one client; measure capacity, not its per-client limits
+    settings.fair_rate = 0
+    settings.fair_max_outstanding = 0
+    if not args.cache:
+        settings.cache_max_entries = 0
+    if args.cascade:
+        settings.cascade_enabled = True
+        settings.cascade_fast_size = args.cascade
+        settings.cascade_min_logprob = args.cascade_min_logprob
+        settings.cascade_min_confidence = args.cascade_min_confidence
+    os.makedirs("logs", exist_ok=True)
+
+    corpus = synthesize_corpus(args.seed)
+    result = {"backend": args.backend, "size": args.size, "decoding": args.decoding, "cascade": args.cascade,
+              "encoder_buckets": settings.encoder_buckets_s}
+    result.update(stage_benchmark(corpus, args.repeats))
+    result["load"] = asyncio.run(load_test(corpus, [int(c) for c in args.concurrency.split(",")], args.requests))
+    return result
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the transcribe/classify/execute pipeline")
+    parser.add_argument("--backends", default=settings.whisper_backend, help="comma-separated backends")
+    parser.add_argument("--sizes", default=settings.whisper_size, help="comma-separated Whisper sizes")
+    parser.add_argument("--decoding", default=settings.decoding_mode, help="comma-separated decoding modes: free, command")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=48, help="requests per concurrency level")
+    parser.add_argument("--repeats", type=int, default=2, help="passes over the corpus for stage timings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="keep the transcription cache enabled")
+    parser.add_argument("--cascade", help="fast Whisper size to cascade from, e.g. tiny.en")
+    parser.add_argument("--cascade-min-logprob", type=float, default=settings.cascade_min_logprob)
+    parser.add_argument("--cascade-min-confidence", type=float, default=settings.cascade_min_confidence)
+    parser.add_argument("--encoder-buckets", help="comma-separated encoder window lengths in seconds, e.g. 5,10")
+    parser.add_argument("--out", default=os.path.join("logs", "benchmark.json"))
+    parser.add_argument("--baseline", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed p50 slowdown, 0.1 = 10%%")
+    # Internal: run a single configuration and write its result to this file
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--size", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.result_file:
+        with open(args.result_file, "w") as f:
+            json.dump(run_config(args), f)
+        return 0
+
+    configs = {}
+    runs = [
+        (backend, size, decoding)
+        for backend in args.backends.split(",")
+        for size in args.sizes.split(",")
+        for decoding in args.decoding.split(",")
+    ]
+    for backend, size, decoding in runs:
+        name = f"{backend}-{size}" + (f"-{decoding}" if decoding != "free" else "") + (
+            f"-cascade-{args.cascade}" if args.cascade else ""
+        ) + (f"-buckets-{args.encoder_buckets.replace(',', '_')}" if args.encoder_buckets else "")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            result_file = f.name
+        try:
+            command = [
+                sys.executable, os.path.abspath(__file__), "--backend", backend, "--size", size,
+                "--decoding", decoding, "--result-file", result_file, "--concurrency", args.concurrency,
+                "--requests", str(args.requests), "--repeats", str(args.repeats), "--seed", str(args.seed),
+            ] + (["--cache"] if args.cache else []) + ([
+                "--cascade", args.cascade,
+                "--cascade-min-logprob", str(args.cascade_min_logprob),
+                "--cascade-min-confidence", str(args.cascade_min_confidence),
+            ] if args.cascade else []) + (
+                ["--encoder-buckets", args.encoder_buckets] if args.encoder_buckets else []
+            )
+            completed = subprocess.run(command)
+            if completed.returncode != 0:
+                configs[name] = {"error": f"exited with status {completed.returncode}"}
+                continue
+            with open(result_file) as f:
+                configs[name] = json.load(f)
+        finally:
+            os.remove(result_file)
+        print(f"{name}: " + ", ".join(
+            f"{stage} p50={stats['p50']:.1f}ms" for stage, stats in configs[name]["stages"].items()
+        ) + f", tokens p50={configs[name]['tokens'].get('p50', 0):.0f}")
+        audio = configs[name]["audio_s"]
+        print(f"  audio: {audio['received']:.1f}s received, {audio['speech']:.1f}s after trimming, "
+              f"{audio['encoded']:.1f}s encoded")
+        for level, load in configs[name]["load"].items():
+            print(f"  concurrency {level}: p50={load['latency_ms']['p50']:.0f}ms "
+                  f"p99={load['latency_ms']['p99']:.0f}ms {load['throughput_rps']:.2f} req/s")
+        if args.cascade:
+            cascade = configs[name]["load"][args.concurrency.split(",")[-1]]["cascade"]
+            print(f"  cascade: {cascade['escalation_rate']:.0%} escalated, p50 " + ", ".join(
+                f"{tier}={latency['p50']:.0f}ms" for tier, latency in cascade["latency_ms"].items()
+                if latency["p50"] is not None
+            ))
+
+    regressions = compare_results(load_results(args.baseline).get("configs", {}), configs, tolerance=args.tolerance)
+    save_results({"concurrency": args.concurrency, "requests": args.requests, "repeats": args.repeats,
+                  "configs": configs, "regressions": regressions}, args.out)
+    for regression in regressions:
+        print(f"REGRESSION {regression['config']} {regression['stage']}: "
+              f"{regression['baseline_ms']:.1f}ms -> {regression['current_ms']:.1f}ms")
+    print(f"Saved results to {args.out}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
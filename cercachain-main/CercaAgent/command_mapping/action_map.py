@@ -1,21 +1,62 @@
-def turn_on_lights():
-    print("Lights turned on")
+from typing import Optional
+from config import settings
+from command_mapping.catalog import CatalogFile
 
-def turn_off_lights():
-    print("Lights turned off")
+# Actions receive the slots their catalog pattern captured as keyword
+# arguments (see commands.yaml); commands matched by the classifier alone
+# call them with none.
 
-def play_music():
-    print("Music playing")
+def turn_on_lights(room: Optional[str] = None):
+    print(f"Lights turned on in {room}" if room else "Lights turned on")
 
-def stop_music():
-    print("Music stopped")
+def turn_off_lights(room: Optional[str] = None):
+    print(f"Lights turned off in {room}" if room else "Lights turned off")
+
+def set_light_level(level: int, room: Optional[str] = None):
+    print(f"Lights set to {level}% in {room}" if room else f"Lights set to {level}%")
+
+def play_music(genre: Optional[str] = None, room: Optional[str] = None, query: Optional[str] = None):
+    what = query or (f"{genre} music" if genre else "Music")
+    print(f"{what} playing in {room}" if room else f"{what} playing")
+
+def stop_music(room: Optional[str] = None):
+    print(f"Music stopped in {room}" if room else "Music stopped")
+
+def set_volume(level: int, room: Optional[str] = None):
+    print(f"Volume set to {level} in {room}" if room else f"Volume set to {level}")
+
+def turn_on_device(device: str, room: Optional[str] = None):
+    print(f"{device} turned on" + (f" in {room}" if room else ""))
+
+def turn_off_device(device: str, room: Optional[str] = None):
+    print(f"{device} turned off" + (f" in {room}" if room else ""))
 
 action_map = {
     "turn_on_lights": turn_on_lights,
     "turn_off_lights": turn_off_lights,
+    "set_light_level": set_light_level,
     "play_music": play_music,
-    "stop_music": stop_music
+    "stop_music": stop_music,
+    "set_volume": set_volume,
+    "turn_on_device": turn_on_device,
+    "turn_off_device": turn_off_device,
+}
+
+# Device each action drives; actions on the same target share a concurrency limit.
+# Actions may be plain functions or coroutines (see event_handling/engine.py).
+action_targets = {
+    "turn_on_lights": "lights",
+    "turn_off_lights": "lights",
+    "set_light_level": "lights",
+    "play_music": "speaker",
+    "stop_music": "speaker",
+    "set_volume": "speaker",
+    "turn_on_device": "devices",
+    "turn_off_device": "devices",
 }
 
+# Reloaded in every process when the file changes, no restart needed
+catalog = CatalogFile(settings.commands_path, actions=action_map, interval=settings.commands_reload_interval_s)
+
 def get_action(intent: str):
-    return action_map.get(intent)
\ No newline at end of file
+    return action_map.get(intent)
@@ -0,0 +1,423 @@
+"""Declarative command catalog compiled into a token trie.
+
+A catalog file (YAML or JSON, see commands.yaml) declares typed slots and
+commands. Each command names an action from action_map.py and lists
+patterns such as
+
+    "(turn | switch) on [the] {room} lights"
+    "set [the] lights to {level:percent} [percent]"
+
+``[...]`` is optional, ``(a | b)`` picks one, ``{slot}`` captures a slot
+value and ``{arg:slot}`` captures it under a different argument name. Every
+pattern is expanded and inserted into one trie, so matching a transcript
+walks its words once and costs the same with ten commands or ten thousand;
+only slot edges branch, and enum slots are tries themselves.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+MAX_EXPANSIONS = 512  # per pattern, against accidental combinatorial blow-ups
+MAX_DIGITS = 18
+_PATTERN_TOKEN = re.compile(r"\{[^}]*\}|[\[\]()|]|[^\s\[\]()|{}]+")
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+
+_UNITS = {
+    "zero": 0, "oh": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+_TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90}
+_NUMBER_WORDS = set(_UNITS) | set(_TENS) | {"hundred", "and"}
+
+class CatalogError(Exception):
+    """Raised when a catalog file cannot be parsed or compiled"""
+    def __init__(self, message="Invalid command catalog"):
+        self.message = message
+        super().__init__(self.message)
+
+def tokenize(text: str) -> List[str]:
+    return _PUNCTUATION.sub(" ", text.lower()).split()
+
+def parse_number(tokens: Sequence[str], i: int, hundreds: bool = True) -> List[Tuple[int, int]]:
+    """Numbers starting at ``tokens[i]`` as (value, end) pairs, longest first ("forty five", "45")"""
+    if tokens[i].isdecimal():
+        # Longer digit strings are no slot value, and int() refuses very long ones
+        return [(int(tokens[i]), i + 1)] if len(tokens[i]) <= MAX_DIGITS else []
+    candidates = []
+    value, j = None, i
+    if j < len(tokens) and tokens[j] in _TENS:
+        value, j = _TENS[tokens[j]], j + 1
+        candidates.append((value, j))
+        if j < len(tokens) and 0 < _UNITS.get(tokens[j], 0) < 10:
+            value, j = value + _UNITS[tokens[j]], j + 1
+            candidates.append((value, j))
+    elif j < len(tokens) and tokens[j] in _UNITS:
+        value, j = _UNITS[tokens[j]], j + 1
+        candidates.append((value, j))
+    if hundreds and value is not None and j < len(tokens) and tokens[j] == "hundred":
+        total, j = value * 100, j + 1
+        candidates.append((total, j))
+        # "and" may be the last word of a partial transcript, with the tens still to come
+        k = j + (j < len(tokens) and tokens[j] == "and")
+        rest = parse_number(tokens, k, False) if k < len(tokens) else []
+        candidates.extend((total + n, end) for n, end in rest if n < 100)
+    return sorted(candidates, key=lambda c: -c[1])
+
+class Slot:
+    """Matches one argument value at a position in the transcript
+
+    ``max_words`` bounds how many words a value can span and ``words`` lists
+    the words values are made of, when that is a closed set.
+    """
+
+    max_words = 1
+    words: Sequence[str] = ()
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        self.name = name
+        self.type = spec.get("type", "enum")
+
+    def match(self, tokens: Sequence[str], i: int) -> Iterable[Tuple[Any, int]]:
+        raise NotImplementedError
+
+    def extends(self, tokens: Sequence[str], i: int) -> bool:
+        """Whether ``tokens[i:]`` could be the start of a longer value"""
+        return True
+
+class NumberSlot(Slot):
+    max_words = 4  # "one hundred and five"
+
+    def __init__(self, name, spec):
+        super().__init__(name, spec)
+        self.min = spec.get("min")
+        self.max = spec.get("max")
+
+    def extends(self, tokens, i):
+        rest = tokens[i:]
+        return len(rest) < self.max_words and all(token in _NUMBER_WORDS for token in rest)
+
+    def match(self, tokens, i):
+        for value, end in parse_number(tokens, i):
+            if (self.min is None or value >= self.min) and (self.max is None or value <= self.max):
+                yield value, end
+
+class EnumSlot(Slot):
+    """Fixed values with synonyms, e.g. rooms or device names, kept in a word trie"""
+
+    def __init__(self, name, spec):
+        super().__init__(name, spec)
+        values = spec.get("values")
+        if isinstance(values, list):
+            values = {value: [] for value in values}
+        if not isinstance(values, dict) or not values:
+            raise CatalogError(f"Slot {name} needs a list or mapping of values")
+        self._trie: Dict[str, Any] = {}
+        self.size = 0
+        self.max_words = 0
+        words = set()
+        for canonical, synonyms in values.items():
+            synonyms = [synonyms] if isinstance(synonyms, str) else list(synonyms or [])
+            for phrase in [str(canonical).replace("_", " ")] + synonyms:
+                node = self._trie
+                phrase_words = tokenize(phrase)
+                for word in phrase_words:
+                    node = node.setdefault(word, {})
+                node[None] = canonical
+                self.size += 1
+                self.max_words = max(self.max_words, len(phrase_words))
+                words.update(phrase_words)
+        self.words = sorted(words)
+
+    def match(self, tokens, i):
+        node, found = self._trie, []
+        while i < len(tokens) and tokens[i] in node:
+            node = node[tokens[i]]
+            i += 1
+            if None in node:
+                found.append((node[None], i))
+        return reversed(found)
+
+    def extends(self, tokens, i):
+        node = self._trie
+        for token in tokens[i:]:
+            node = node.get(token)
+            if node is None:
+                return False
+        return any(key is not None for key in node)
+
+class TextSlot(Slot):
+    """Free text such as a song title, one to ``max_words`` words"""
+
+    def __init__(self, name, spec):
+        super().__init__(name, spec)
+        self.max_words = spec.get("max_words", 8)
+
+    def extends(self, tokens, i):
+        return len(tokens) - i < self.max_words
+
+    def match(self, tokens, i):
+        for end in range(min(len(tokens), i + self.max_words), i, -1):
+            yield " ".join(tokens[i:end]), end
+
+SLOT_TYPES = {"number": NumberSlot, "enum": EnumSlot, "text": TextSlot}
+
+class _Node:
+    __slots__ = ("words", "slots", "command")
+
+    def __init__(self):
+        self.words: Dict[str, "_Node"] = {}
+        self.slots: List[Tuple[str, Slot, "_Node"]] = []
+        self.command: Optional[Tuple[str, Dict[str, Any]]] = None
+
+def _parse_pattern(pattern: str) -> List[Tuple[str, ...]]:
+    """Expand a pattern into every word/slot sequence it accepts"""
+    tokens = _PATTERN_TOKEN.findall(pattern.lower())
+    position = 0
+
+    def alternatives() -> List[Tuple[str, ...]]:
+        nonlocal position
+        options = []
+        while True:
+            options.extend(sequence())
+            if position < len(tokens) and tokens[position] == "|":
+                position += 1
+                continue
+            return options
+
+    def sequence() -> List[Tuple[str, ...]]:
+        nonlocal position
+        expansions: List[Tuple[str, ...]] = [()]
+        while position < len(tokens) and tokens[position] not in ("|", "]", ")"):
+            token = tokens[position]
+            position += 1
+            if token in ("[", "("):
+                end = "]" if token == "[" else ")"
+                inner = alternatives()
+                if position >= len(tokens) or tokens[position] != end:
+                    raise CatalogError(f"Unclosed {token} in pattern: {pattern}")
+                position += 1
+                if token == "[":
+                    inner = inner + [()]
+                expansions = [head + tail for head in expansions for tail in inner]
+            elif token.startswith("{"):
+                expansions = [head + (token,) for head in expansions]
+            else:
+                words = tuple(tokenize(token))
+                expansions = [head + words for head in expansions]
+            if len(expansions) > MAX_EXPANSIONS:
+                raise CatalogError(f"Pattern expands to more than {MAX_EXPANSIONS} phrasings: {pattern}")
+        return expansions
+
+    expansions = alternatives()
+    if position < len(tokens):
+        raise CatalogError(f"Unexpected {tokens[position]} in pattern: {pattern}")
+    return expansions
+
+class CommandCatalog:
+    """A compiled catalog; ``match`` maps a transcript to (action, arguments)"""
+
+    def __init__(self, spec: Dict[str, Any], actions: Optional[Iterable[str]] = None, source: str = "<memory>"):
+        self.source = source
+        self.loaded_at = time.time()
+        self.ignore = set(spec.get("ignore", []))
+        self.slots = {}
+        for name, slot_spec in (spec.get("slots") or {}).items():
+            slot_type = SLOT_TYPES.get(slot_spec.get("type", "enum"))
+            if slot_type is None:
+                raise CatalogError(f"Slot {name} has unknown type {slot_spec.get('type')}")
+            self.slots[name] = slot_type(name, slot_spec)
+
+        known = set(actions) if actions is not None else None
+        self.root = _Node()
+        self.commands = 0
+        self.phrasings = 0
+        self.nodes = 1
+        # Literal pattern words by how many phrasings use them, and the longest phrasing
+        self.word_counts: Counter = Counter()
+        self.max_words = 0
+        for command in spec.get("commands") or []:
+            action = command.get("action")
+            if not action or (known is not None and action not in known):
+                raise CatalogError(f"Command {command.get('patterns')} names unknown action {action}")
+            fixed = dict(command.get("args") or {})
+            for pattern in command.get("patterns") or []:
+                for phrasing in _parse_pattern(pattern):
+                    self._insert(phrasing, action, fixed, pattern)
+            self.commands += 1
+
+    def _insert(self, phrasing: Tuple[str, ...], action: str, fixed: Dict[str, Any], pattern: str):
+        node = self.root
+        words = 0
+        for token in phrasing:
+            if token.startswith("{"):
+                arg, _, slot_name = token[1:-1].partition(":")
+                slot = self.slots.get(slot_name or arg)
+                if slot is None:
+                    raise CatalogError(f"Pattern {pattern} uses undeclared slot {slot_name or arg}")
+                edge = next((child for name, s, child in node.slots if name == arg and s is slot), None)
+                if edge is None:
+                    edge = _Node()
+                    node.slots.append((arg, slot, edge))
+                    self.nodes += 1
+                node = edge
+                words += slot.max_words
+            else:
+                words += 1
+                self.word_counts[token] += 1
+                if token not in node.words:
+                    node.words[token] = _Node()
+                    self.nodes += 1
+                node = node.words[token]
+        if node.command is not None:
+            if node.command != (action, fixed):
+                logging.warning(f"Catalog phrasing '{' '.join(phrasing)}' already runs {node.command[0]}; "
+                                f"ignored for {action}")
+            return
+        node.command = (action, fixed)
+        self.phrasings += 1
+        self.max_words = max(self.max_words, words)
+
+    def match(self, text: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(action, arguments) for the whole transcript, or None when no command fits"""
+        tokens = [token for token in tokenize(text) if token not in self.ignore]
+        if not tokens:
+            return None
+        return next(self._walk(self.root, tokens, 0, {}), None)
+
+    def _walk(self, node: _Node, tokens: List[str], i: int,
+              args: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        # Depth first; literal words are tried before slots so exact phrasings win
+        if i == len(tokens):
+            if node.command is not None:
+                action, fixed = node.command
+                yield action, {**fixed, **args}
+            return
+        child = node.words.get(tokens[i])
+        if child is not None:
+            yield from self._walk(child, tokens, i + 1, args)
+        for arg, slot, child in node.slots:
+            for value, end in slot.match(tokens, i):
+                yield from self._walk(child, tokens, end, {**args, arg: value})
+
+    def vocabulary(self) -> List[str]:
+        """Every word a command can contain, the most used pattern words first"""
+        words = [word for word, _ in self.word_counts.most_common()]
+        seen = set(words)
+        for slot in self.slots.values():
+            words.extend(word for word in slot.words if word not in seen)
+            seen.update(slot.words)
+        return words
+
+    def is_final(self, text: str) -> bool:
+        """Whether the transcript is a complete command that no longer phrasing could extend
+
+        Lets decoding stop as soon as the words heard so far can only mean one
+        thing; ignore words are skipped as in ``match``.
+        """
+        tokens = [token for token in tokenize(text) if token not in self.ignore]
+        if not tokens:
+            return False
+        complete, extendable = self._reach(self.root, tokens, 0)
+        return complete and not extendable
+
+    def _reach(self, node: _Node, tokens: List[str], i: int) -> Tuple[bool, bool]:
+        # (a phrasing ends exactly here, some phrasing could take more words)
+        if i == len(tokens):
+            return node.command is not None, bool(node.words or node.slots)
+        complete = extendable = False
+        child = node.words.get(tokens[i])
+        if child is not None:
+            complete, extendable = self._reach(child, tokens, i + 1)
+        for _, slot, child in node.slots:
+            for _, end in slot.match(tokens, i):
+                reached, more = self._reach(child, tokens, end)
+                complete = complete or reached
+                extendable = extendable or more
+            # The words left may be the start of a longer value
+            extendable = extendable or slot.extends(tokens, i)
+        return complete, extendable
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "commands": self.commands,
+            "phrasings": self.phrasings,
+            "nodes": self.nodes,
+            "max_words": self.max_words,
+            "slots": {name: slot.type for name, slot in self.slots.items()},
+        }
+
+def read_spec(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        try:
+            import yaml
+        except ImportError:
+            raise CatalogError(f"PyYAML is needed to read {path}; install it or use a .json catalog")
+        return yaml.safe_load(f) or {}
+
+class CatalogFile:
+    """Keeps the compiled catalog for a file current without a restart
+
+    ``current()`` checks the file's modification time at most every
+    ``interval`` seconds (0 never reloads) and recompiles when it changed. A catalog that fails
+    to compile is logged and the previous one stays in use. Each process
+    (API and pool workers) reloads on its own.
+    """
+
+    def __init__(self, path: str, actions: Optional[Iterable[str]] = None, interval: float = 2.0):
+        self.path = path
+        self.actions = set(actions) if actions is not None else None
+        self.interval = interval
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._catalog: Optional[CommandCatalog] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> CommandCatalog:
+        now = time.monotonic()
+        if self._catalog is None or (self.interval and now - self._checked_at >= self.interval):
+            with self._lock:
+                if self._catalog is None or now - self._checked_at >= self.interval:
+                    self._checked_at = now
+                    self._refresh()
+        return self._catalog
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            mtime = None
+            if self._catalog is None:
+                raise CatalogError(f"Command catalog {self.path} is missing: {e}")
+        if self._catalog is not None and mtime == self._mtime:
+            return
+        try:
+            started = time.perf_counter()
+            catalog = CommandCatalog(read_spec(self.path), self.actions, source=self.path)
+        except Exception as e:
+            self.last_error = str(e)
+            if self._catalog is None:
+                raise
+            logging.error(f"Keeping the previous command catalog; {self.path} failed to load: {e}")
+            self._mtime = mtime
+            return
+        self._catalog, self._mtime, self.last_error = catalog, mtime, None
+        self.reloads += 1
+        logging.info(
+            f"Loaded command catalog {self.path}: {catalog.commands} commands, {catalog.phrasings} phrasings "
+            f"in {time.perf_counter() - started:.3f}s"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.current().stats(), "reloads": self.reloads, "last_error": self.last_error}
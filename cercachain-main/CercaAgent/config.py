@@ -0,0 +1,127 @@
+import os
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+class Settings(BaseModel):
+    # Modules shared with the api app, imported flat; the entry points put this on sys.path
+    ml_path: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ml", "audio_recognition")
+
+    # Queue-based JSON-lines logging (see logging_config.py)
+    log_path: str = "logs/app.log"
+    log_level: str = "INFO"
+    log_queue_size: int = 10000  # records beyond this are dropped rather than blocking requests
+
+    # Model selection and startup (see inference/registry.py)
+    whisper_size: str = "small"  # tiny, base or small
+    whisper_backend: str = "torch"  # torch, torch-int8, onnx or ctranslate2 (see voice_recognition/backends.py)
+    whisper_model_path: Optional[str] = None  # exported ONNX / converted CTranslate2 model directory
+    intra_op_threads: Optional[int] = None  # per worker; defaults to the library's choice
+    inter_op_threads: Optional[int] = None
+    preload_models: bool = True  # load and warm up before /ready; False loads on first use
+    load_models_on_import: bool = False  # for gunicorn --preload style prefork servers
+    intent_model_path: str = "models/intent.joblib"  # trained and saved on first load when missing
+
+    # Whisper decoding profile (see voice_recognition/decoding.py)
+    decoding_mode: str = "free"  # free, or command: short outputs shaped by the command catalog
+    decoding_language: Optional[str] = "en"  # forced in command mode on multilingual models
+    command_prompt_words: int = 40  # most used catalog words in the initial prompt; 0 disables
+    command_logit_bias: float = 2.0  # added to catalog words' logits; 0 disables (not on ctranslate2)
+    command_stop_early: bool = True  # stop once the transcript can only be one command (not on ctranslate2)
+
+    # Two-tier cascade (see inference/cascade.py): a fast Whisper first, the main model only for
+    # clips whose transcript or intent it is unsure of
+    cascade_enabled: bool = False
+    cascade_fast_size: str = "tiny.en"
+    cascade_fast_model_path: Optional[str] = None  # like whisper_model_path, for the fast model
+    cascade_min_logprob: float = -0.6  # average token log-probability of the fast transcript
+    cascade_min_confidence: float = 0.7  # intent confidence; catalog matches count as 1.0
+
+    # Command catalog (see command_mapping/catalog.py); edits are picked up without a restart
+    commands_path: str = "command_mapping/commands.yaml"  # .yaml or .json
+    commands_reload_interval_s: float = 2.0  # how often each process checks the file; 0 never reloads
+
+    # Micro-batching of Whisper inference (see voice_recognition/batching.py)
+    batch_max_size: int = 8
+    batch_max_wait_ms: float = 20.0
+
+    # Inference executor and admission control (see inference/executor.py)
+    executor_kind: str = "process"  # process, thread or inline
+    executor_workers: Optional[int] = None  # defaults to the CPU count
+    executor_start_method: str = "fork"  # fork shares loaded weights copy-on-write
+    max_in_flight: int = 16
+    request_deadline_s: Optional[float] = 30.0
+    overload_status_code: int = 503  # 429 or 503
+    retry_after_s: int = 1
+
+    # Per-client fair sharing of transcription (see inference/fairness.py); clients are API keys or IPs
+    fair_slots: int = 8  # clips decoding or transcribing at once; keep near batch_max_size
+    fair_bulk_slots: int = 2  # of those, the most that bulk (long audio) requests may hold
+    fair_interactive_max_s: float = 10.0  # uploads up to this long are interactive commands
+    fair_rate: float = 5.0  # requests/s per client, token bucket; 0 disables
+    fair_burst: float = 10.0
+    fair_max_outstanding: int = 4  # requests per client in progress at once; 0 disables
+    fair_api_keys: Dict[str, str] = {}  # X-API-Key value -> client name; other callers are told apart by IP
+    fair_weights: Dict[str, float] = {}  # "key:<name>" or "ip:<address>" -> share of the slots, default 1
+    fair_trust_forwarded_for: bool = False  # only behind a proxy that sets X-Forwarded-For
+
+    # Chunked upload ingestion (see ml/audio_recognition/upload_ingest.py); over-limit uploads get a 413
+    upload_chunk_bytes: int = 64 * 1024
+    max_upload_bytes: int = 10 * 1024 * 1024
+    max_audio_duration_s: Optional[float] = 60.0  # commands are short; Whisper only sees the first 30s
+
+    # Bulk transcription jobs on /jobs (see jobs/store.py and jobs/runner.py)
+    jobs_db_path: str = "data/jobs.db"  # SQLite in WAL mode; also read by `python -m jobs.runner` workers
+    jobs_upload_dir: str = "data/job_uploads"  # uploaded files wait here until transcribed
+    jobs_manifest_root: Optional[str] = None  # manifests may only name files under here; None disables them
+    jobs_max_files: int = 10000  # per job
+    jobs_batch_size: int = 8  # items claimed and transcribed in one model call
+    jobs_concurrency: int = 1  # in-process claim loops, each holding one pool worker; 0 leaves jobs to workers
+    jobs_max_attempts: int = 3
+    jobs_lease_s: float = 600.0  # running items are requeued after this, e.g. when their worker died
+    jobs_poll_interval_s: float = 1.0
+
+    # Command clip preprocessing before inference (see voice_recognition/transcribe.py::load_command)
+    trim_silence: bool = True  # cut leading and trailing silence, found with vad_frame_ms frames
+    trim_threshold_db: float = -45.0  # frames quieter than this are silence
+    trim_padding_ms: int = 200  # audio kept on each side of the speech
+    reject_silence: bool = True  # clips with no frame above the threshold get a 422 without reaching the model
+    # Encoder windows for short clips, e.g. [5, 10, 20]: a batch is encoded in the smallest
+    # window its longest clip fits instead of a padded 30s one. Torch backends only; Whisper
+    # is trained on 30s windows, so check accuracy with benchmark.py --encoder-buckets first
+    encoder_buckets_s: List[float] = []
+
+    # Streaming transcription over /ws/transcribe (see voice_recognition/streaming.py)
+    vad_frame_ms: int = 30
+    vad_threshold_db: float = -45.0
+    vad_start_ms: int = 90
+    vad_hangover_ms: int = 600
+    max_utterance_s: float = 20.0
+    partial_interval_ms: int = 600
+    partial_window_s: float = 8.0
+    # PCM rates a client may declare; anything else is refused when the socket opens
+    stream_min_sample_rate: int = 8000
+    stream_max_sample_rate: int = 192000
+
+    # Transcription result cache (see ml/audio_recognition/transcription_cache.py)
+    cache_max_entries: int = 1024  # 0 keeps request coalescing only
+    cache_ttl_s: float = 600.0
+    cache_redis_url: Optional[str] = None  # e.g. redis://localhost:6379/0
+
+    # Action execution (see event_handling/engine.py)
+    action_timeout_s: float = 5.0
+    action_timeouts: Dict[str, float] = {}  # per-intent overrides
+    action_workers: int = 8  # threads for sync actions
+    action_target_concurrency: int = 2
+    idempotency_ttl_s: float = 300.0
+    max_action_jobs: int = 1000
+
+    # Per-request profiling of /process_audio (see inference/profiling.py); costs nothing unless a request
+    # is picked. A profiled request skips the cache, batching and cascade and runs alone on a pool worker.
+    profile_token: Optional[str] = None  # X-Profile-Token value that profiles a request and opens /debug/profiles
+    profile_sample_rate: float = 0.0  # fraction of requests profiled without the header
+    profile_interval_ms: float = 5.0  # Python stack sampling interval
+    profile_torch_ops: bool = True  # torch.profiler operator timings, when torch is installed
+    profile_dir: str = "logs/profiles"
+    profile_max_saved: int = 50  # oldest profiles are removed beyond this
+
+settings = Settings()
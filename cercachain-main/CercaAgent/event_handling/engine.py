@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+from logging_config import correlation_id, run_with_correlation_id
+
+class ActionEngine:
+    """Runs mapped actions off the request path.
+
+    Async actions are awaited, sync ones run on a small thread pool. Each
+    call is bounded by a timeout and by a per-target concurrency limit (so
+    one slow device cannot tie up every slot). Retried commands carrying the
+    same idempotency key share one execution, and background calls return a
+    job ID whose status is kept for later lookup.
+    """
+
+    def __init__(self, max_workers: int = 8, default_timeout: float = 5.0,
+                 target_concurrency: int = 2, idempotency_ttl: float = 300.0,
+                 max_jobs: int = 1000, timeouts: Optional[Dict[str, float]] = None,
+                 targets: Optional[Dict[str, str]] = None,
+                 observer: Optional[Callable[[str, str, int], None]] = None):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="actions")
+        self.default_timeout = default_timeout
+        self.target_concurrency = target_concurrency
+        self.idempotency_ttl = idempotency_ttl
+        self.max_jobs = max_jobs
+        self.timeouts = timeouts or {}
+        self.targets = targets or {}
+        # Called with (intent, status, nanoseconds) after every run, e.g. for metrics
+        self.observer = observer
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._idempotent: Dict[str, tuple] = {}
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tasks = set()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+    async def execute(self, intent: str, action: Optional[Callable], idempotency_key: Optional[str] = None,
+                      args: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run an action with the command's arguments and wait for its result dict"""
+        if idempotency_key is None:
+            return await self._run(intent, action, args or {})
+        self._expire_keys()
+        entry = self._idempotent.get(idempotency_key)
+        if entry is None:
+            task = asyncio.ensure_future(self._run(intent, action, args or {}))
+            entry = self._idempotent[idempotency_key] = (time.monotonic() + self.idempotency_ttl, task)
+        result = await asyncio.shield(entry[1])
+        return {**result, "idempotency_key": idempotency_key}
+
+    def submit(self, intent: str, action: Optional[Callable], idempotency_key: Optional[str] = None,
+               args: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Fire-and-forget: start the action and return its job record"""
+        job = {
+            "id": uuid.uuid4().hex,
+            "intent": intent,
+            "args": args or {},
+            "status": "queued",
+            "result": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        self.jobs[job["id"]] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+
+        async def run():
+            job["status"] = "running"
+            result = await self.execute(intent, action, idempotency_key, args)
+            job.update(status=result["status"], result=result, finished_at=time.time())
+
+        task = asyncio.ensure_future(run())
+        # Keep a reference until it finishes so the task is not garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    def _semaphore(self, intent: str) -> asyncio.Semaphore:
+        target = self.targets.get(intent, intent)
+        if target not in self._semaphores:
+            self._semaphores[target] = asyncio.Semaphore(self.target_concurrency)
+        return self._semaphores[target]
+
+    def _expire_keys(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._idempotent.items() if expires_at < now]:
+            del self._idempotent[key]
+
+    async def _run(self, intent: str, action: Optional[Callable], args: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter_ns()
+        result = await self._execute(intent, action, args)
+        if self.observer is not None:
+            self.observer(intent, result["status"], time.perf_counter_ns() - started)
+        return result
+
+    async def _execute(self, intent: str, action: Optional[Callable], args: Dict[str, Any]) -> Dict[str, Any]:
+        if not action:
+            logging.warning(f"Unknown intent: {intent}")
+            return {"status": "unknown_command", "message": "Command not recognized"}
+
+        timeout = self.timeouts.get(intent, self.default_timeout)
+        semaphore = self._semaphore(intent)
+        try:
+            started = time.monotonic()
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+            remaining = timeout - (time.monotonic() - started)
+            if asyncio.iscoroutinefunction(action):
+                try:
+                    await asyncio.wait_for(action(**args), remaining)
+                finally:
+                    semaphore.release()
+            else:
+                # Threads cannot be cancelled: an overrunning sync action keeps its
+                # target slot until it really finishes, but stops holding the caller
+                future = asyncio.get_running_loop().run_in_executor(
+                    self.pool, run_with_correlation_id, correlation_id.get(), partial(action, **args)
+                )
+                future.add_done_callback(lambda f: semaphore.release() or f.exception())
+                await asyncio.wait_for(asyncio.shield(future), remaining)
+            logging.info(f"Executed intent: {intent}", extra={"intent": intent, "action_args": args})
+            return {"status": "success", "message": f"Command '{intent}' executed"}
+        except asyncio.TimeoutError:
+            logging.error(f"Timed out executing {intent} after {timeout}s")
+            return {"status": "timeout", "message": f"Command '{intent}' timed out after {timeout}s"}
+        except Exception as e:
+            logging.error(f"Error executing {intent}: {e}")
+            return {"status": "error", "message": str(e)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": len(self.jobs),
+            "running_jobs": len(self._tasks),
+            "idempotency_keys": len(self._idempotent),
+            "targets": {
+                target: self.target_concurrency - semaphore._value
+                for target, semaphore in self._semaphores.items()
+            },
+        }
@@ -1,15 +1,14 @@
 import logging
 
-logging.basicConfig(filename="logs/app.log", level=logging.INFO, format="%(asctime)s - %(message)s")
-
-def execute_action(intent: str, action):
+# Synchronous variant kept for scripts; the API goes through event_handling/engine.py
+def execute_action(intent: str, action, args=None):
     if action:
         try:
-            action()
+            action(**(args or {}))
             logging.info(f"Executed intent: {intent}")
             return {"status": "success", "message": f"Command '{intent}' executed"}
         except Exception as e:
             logging.error(f"Error executing {intent}: {e}")
             return {"status": "error", "message": str(e)}
     logging.warning(f"Unknown intent: {intent}")
-    return {"status": "unknown_command", "message": "Command not recognized"}"}}}
\ No newline at end of file
+    return {"status": "unknown_command", "message": "Command not recognized"}
\ No newline at end of file
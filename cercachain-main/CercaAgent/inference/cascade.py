@@ -0,0 +1,102 @@
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from voice_recognition.batching import BatchScheduler
+
+class Cascade:
+    """Two-tier transcription: a fast Whisper first, the main model only when it is unsure.
+
+    Every clip is decoded by the fast model and classified
+    (inference/pipeline.py::transcribe_fast). The result is accepted when the
+    transcript's average token log-probability and the intent confidence both
+    clear their thresholds; the rest go through the main model's scheduler as
+    usual and pay for both tiers. ``stats()`` reports the escalation rate and
+    per-tier latency for tuning the thresholds. Without a fast scheduler
+    everything goes straight to the main model.
+    """
+
+    def __init__(self, full: BatchScheduler, fast: Optional[BatchScheduler] = None,
+                 min_logprob: float = -0.6, min_confidence: float = 0.7, window: int = 1000,
+                 observer: Optional[Callable[[str, int], None]] = None):
+        self.full = full
+        self.fast = fast
+        self.min_logprob = min_logprob
+        self.min_confidence = min_confidence
+        # Called with (tier, nanoseconds) for every cascaded clip, e.g. for metrics
+        self.observer = observer
+        self.requests = {"fast": 0, "escalated": 0}
+        self.reasons = {"low_logprob": 0, "low_confidence": 0}
+        # Recent per-tier latencies in milliseconds, for percentiles
+        self._latencies = {tier: deque(maxlen=window) for tier in self.requests}
+
+    async def start(self):
+        await self.full.start()
+        if self.fast is not None:
+            await self.fast.start()
+
+    async def stop(self):
+        if self.fast is not None:
+            await self.fast.stop()
+        await self.full.stop()
+
+    def escalation_reasons(self, decoded: Dict[str, Any]) -> List[str]:
+        reasons = []
+        if decoded["logprob"] < self.min_logprob:
+            reasons.append("low_logprob")
+        if decoded["confidence"] < self.min_confidence:
+            reasons.append("low_confidence")
+        return reasons
+
+    async def submit(self, samples) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Transcribe and classify one clip; same result shape as BatchScheduler.submit
+
+        Results from the cascade also carry the "tier" that produced them, and
+        their timings name first-tier stages with a "fast_" prefix. Escalated
+        clips count both tiers' encoder passes in "encoded_s".
+        """
+        if self.fast is None:
+            return await self.full.submit(samples)
+        started = time.perf_counter_ns()
+        fast, batch = await self.fast.submit(samples)
+        fast_timings = {f"fast_{stage}": ns for stage, ns in fast["timings"].items()}
+        reasons = self.escalation_reasons(fast)
+        if not reasons:
+            self._record("fast", started)
+            return {**fast, "tier": "fast", "timings": fast_timings}, batch
+
+        for reason in reasons:
+            self.reasons[reason] += 1
+        decoded, batch = await self.full.submit(samples)
+        self._record("escalated", started)
+        first_tier = {"text": fast["text"], "logprob": fast["logprob"], "confidence": fast["confidence"]}
+        return {**decoded, "tier": "escalated", "fast": first_tier,
+                "encoded_s": fast["encoded_s"] + decoded["encoded_s"],
+                "timings": {**fast_timings, **decoded["timings"]}}, batch
+
+    def _record(self, tier: str, started: int):
+        elapsed = time.perf_counter_ns() - started
+        self.requests[tier] += 1
+        self._latencies[tier].append(elapsed / 1e6)
+        if self.observer is not None:
+            self.observer(tier, elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.requests.values())
+        latency = {}
+        for tier, values in self._latencies.items():
+            ordered = sorted(values)
+            latency[tier] = {
+                "count": len(ordered),
+                "p50": ordered[len(ordered) // 2] if ordered else None,
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else None,
+            }
+        return {
+            "enabled": self.fast is not None,
+            "min_logprob": self.min_logprob,
+            "min_confidence": self.min_confidence,
+            "requests": dict(self.requests),
+            "escalation_rate": self.requests["escalated"] / total if total else 0.0,
+            "escalation_reasons": dict(self.reasons),
+            "latency_ms": latency,
+        }
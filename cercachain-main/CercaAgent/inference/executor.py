@@ -0,0 +1,33 @@
+"""CercaAgent's inference pool: the executor shared with the api app (ml_executor) with this app's models"""
+import logging
+import os
+
+from logging_config import setup_worker_logging
+from ml_executor import Deadline, DeadlineExceededError, InferenceExecutor, OverloadedError  # noqa: F401
+
+def warmup_models():
+    """Run one inference through every model so lazy allocations happen up front"""
+    import numpy as np
+    from config import settings
+    from inference.pipeline import transcribe_and_classify, transcribe_fast
+
+    silence = [np.zeros(16000, dtype=np.float32)]
+    transcribe_and_classify(silence)
+    if settings.cascade_enabled:
+        transcribe_fast(silence)
+
+def preload_models(log_queue=None):
+    """Process pool initializer: load and warm up the models once per worker process
+
+    With the fork start method the weights the parent already loaded are
+    inherited copy-on-write and only the warmup runs here. Log records go
+    to the parent over ``log_queue``.
+    """
+    setup_worker_logging(log_queue)
+    from inference.registry import registry
+    import voice_recognition.transcribe  # noqa: F401
+    import voice_recognition.classify  # noqa: F401
+
+    registry.load_all()
+    warmup_models()
+    logging.info(f"Inference worker {os.getpid()} ready")
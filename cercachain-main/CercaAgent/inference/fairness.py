@@ -0,0 +1,232 @@
+"""Per-client fair sharing of transcription slots.
+
+Every /process_audio caller is a client: the name of a configured API key,
+else its IP address. ``FairScheduler.admit`` rate limits each client with a
+token bucket and caps how many of its requests are outstanding at once.
+Clients over either limit get a RateLimitedError (429).
+
+``FairScheduler.slot`` then hands out the ``slots`` transcription slots.
+There are two priority classes. Interactive requests (short commands) are
+served strictly ahead of bulk requests (long audio, background mode). Bulk
+requests never hold more than ``bulk_slots`` slots, so the rest stay free
+for interactive ones. Within a class, waiting requests are served by
+weighted fair queueing. Each request gets a virtual finish time of
+``max(class clock, client's last finish) + cost / weight``, and the
+smallest finish time goes first. A client sending back to back therefore
+takes turns with everyone else rather than going ahead of them, and an
+idle client does not bank credit.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional
+
+from api.errors import RateLimitedError
+
+PRIORITIES = ("interactive", "bulk")
+# Wait times kept per client and per class for the percentiles in stats()
+RECENT_WAITS = 256
+
+def client_id(api_key: Optional[str], host: Optional[str], forwarded_for: Optional[str] = None,
+              api_keys: Optional[Mapping[str, str]] = None) -> str:
+    """Who is calling: ``key:<name>`` for a configured API key, else ``ip:<address>``
+
+    Unknown keys are ignored rather than trusted, so a client cannot escape
+    its limits by inventing a new key per request. ``forwarded_for`` (the
+    first X-Forwarded-For address) is only passed when a trusted proxy sets it.
+    """
+    if api_key and api_keys and api_key in api_keys:
+        return f"key:{api_keys[api_key]}"
+    if forwarded_for:
+        host = forwarded_for.split(",")[0].strip() or host
+    return f"ip:{host or 'unknown'}"
+
+def _percentiles(values) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    return {
+        "p50": round(ordered[len(ordered) // 2], 3) if ordered else None,
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3) if ordered else None,
+    }
+
+class _Client:
+    def __init__(self, weight: float, burst: float, now: float):
+        self.weight = weight
+        self.tokens = burst
+        self.refilled = now
+        # Virtual finish time of the client's last request, per class
+        self.finish = {priority: 0.0 for priority in PRIORITIES}
+        self.outstanding = 0
+        self.queued = 0
+        self.active = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.waits: Deque[float] = deque(maxlen=RECENT_WAITS)
+
+class FairScheduler:
+    """Token-bucket admission and weighted fair queueing for transcription slots"""
+
+    def __init__(self, slots: int = 8, bulk_slots: int = 2, rate: float = 5.0, burst: float = 10.0,
+                 max_outstanding: int = 4, weights: Optional[Mapping[str, float]] = None, max_clients: int = 10000,
+                 retry_after: int = 1, observer: Optional[Callable[[str, float], None]] = None):
+        self.slots = max(1, slots)
+        self.bulk_slots = max(1, min(bulk_slots, self.slots))
+        self.rate = rate
+        self.burst = burst
+        self.max_outstanding = max_outstanding
+        self.weights = dict(weights or {})
+        self.max_clients = max_clients
+        self.retry_after = retry_after
+        # Called with (priority, seconds waited) for every granted slot
+        self.observer = observer
+        self.clients: "OrderedDict[str, _Client]" = OrderedDict()
+        self.active = {priority: 0 for priority in PRIORITIES}
+        self.clock = {priority: 0.0 for priority in PRIORITIES}
+        self._queues: Dict[str, List] = {priority: [] for priority in PRIORITIES}
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=RECENT_WAITS) for priority in PRIORITIES}
+        self._order = itertools.count()
+        self.rate_limited = 0
+
+    def _client(self, client: str) -> _Client:
+        state = self.clients.pop(client, None)
+        if state is None:
+            state = _Client(self.weights.get(client, 1.0), self.burst, time.monotonic())
+        # Most recently seen last; idle clients are forgotten first, never ones with requests in flight
+        self.clients[client] = state
+        for stale in list(itertools.islice(self.clients, max(0, len(self.clients) - self.max_clients))):
+            if not self.clients[stale].outstanding:
+                del self.clients[stale]
+        return state
+
+    @asynccontextmanager
+    async def admit(self, client: str):
+        """Hold one of the client's outstanding requests, or raise RateLimitedError
+
+        A ``rate`` or ``max_outstanding`` of 0 turns that limit off.
+        """
+        state = self._client(client)
+        if self.max_outstanding and state.outstanding >= self.max_outstanding:
+            self._limit(state)
+            raise RateLimitedError(f"{client} already has {state.outstanding} requests in progress",
+                                   retry_after=self.retry_after)
+        if self.rate > 0:
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.refilled) * self.rate)
+            state.refilled = now
+            if state.tokens < 1:
+                self._limit(state)
+                raise RateLimitedError(f"{client} is over {self.rate:g} requests/s",
+                                       retry_after=max(self.retry_after, math.ceil((1 - state.tokens) / self.rate)))
+            state.tokens -= 1
+        state.outstanding += 1
+        state.admitted += 1
+        try:
+            yield
+        finally:
+            state.outstanding -= 1
+
+    def _limit(self, state: _Client):
+        state.rate_limited += 1
+        self.rate_limited += 1
+
+    def _can_start(self, priority: str) -> bool:
+        if sum(self.active.values()) >= self.slots:
+            return False
+        return priority != "bulk" or self.active["bulk"] < self.bulk_slots
+
+    @asynccontextmanager
+    async def slot(self, client: str, priority: str = "interactive", cost: float = 1.0):
+        """Wait for a transcription slot in fair order; yields the seconds waited"""
+        state = self._client(client)
+        tag = max(self.clock[priority], state.finish[priority]) + cost / state.weight
+        state.finish[priority] = tag
+        started = time.perf_counter()
+        # Straight in only when nobody who should go first is waiting
+        ahead = PRIORITIES[:PRIORITIES.index(priority) + 1]
+        if self._can_start(priority) and not any(self._waiting[p] for p in ahead):
+            self._start(priority, tag)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queues[priority], (tag, next(self._order), future))
+            self._waiting[priority] += 1
+            state.queued += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Granted in the same tick it was cancelled: hand the slot on
+                if future.done() and not future.cancelled():
+                    self._release(priority)
+                else:
+                    self._waiting[priority] -= 1
+                raise
+            finally:
+                state.queued -= 1
+        waited = time.perf_counter() - started
+        state.waits.append(waited * 1000)
+        self._waits[priority].append(waited * 1000)
+        if self.observer is not None:
+            self.observer(priority, waited)
+        state.active += 1
+        try:
+            yield waited
+        finally:
+            state.active -= 1
+            self._release(priority)
+
+    def _start(self, priority: str, tag: float):
+        self.active[priority] += 1
+        self.clock[priority] = max(self.clock[priority], tag)
+
+    def _release(self, priority: str):
+        self.active[priority] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots: interactive first, then bulk, smallest finish time first"""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue and self._can_start(priority):
+                tag, _, future = heapq.heappop(queue)
+                if future.done():  # cancelled while waiting
+                    continue
+                self._waiting[priority] -= 1
+                self._start(priority, tag)
+                future.set_result(None)
+
+    def stats(self, top: int = 20) -> Dict[str, Any]:
+        """Slot use and waits per class, and for the ``top`` clients with the most requests in progress"""
+        busiest = sorted(self.clients.items(), key=lambda item: (item[1].outstanding, item[1].admitted),
+                         reverse=True)[:top]
+        return {
+            "slots": self.slots,
+            "bulk_slots": self.bulk_slots,
+            "rate": self.rate,
+            "burst": self.burst,
+            "max_outstanding": self.max_outstanding,
+            "clients_tracked": len(self.clients),
+            "rate_limited": self.rate_limited,
+            "classes": {
+                priority: {
+                    "active": self.active[priority],
+                    "queue_depth": self._waiting[priority],
+                    "wait_ms": _percentiles(self._waits[priority]),
+                }
+                for priority in PRIORITIES
+            },
+            "clients": {
+                client: {
+                    "weight": state.weight,
+                    "outstanding": state.outstanding,
+                    "queue_depth": state.queued,
+                    "active": state.active,
+                    "admitted": state.admitted,
+                    "rate_limited": state.rate_limited,
+                    "wait_ms": _percentiles(state.waits),
+                }
+                for client, state in busiest
+            },
+        }
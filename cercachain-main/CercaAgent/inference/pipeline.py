@@ -0,0 +1,54 @@
+import time
+from typing import Dict, List, Sequence
+from voice_recognition.transcribe import load_command, transcribe_batch, transcribe_fast_batch
+from voice_recognition.classify import parse_batch, score_commands
+
+def transcribe_and_classify(batch: Sequence) -> List[Dict]:
+    """Batch function for the scheduler: one generate call, then one catalog/classifier pass
+
+    Each result carries the command's arguments under "args", the seconds
+    of audio its encoder pass covered under "encoded_s" and the batch's stage
+    timings (nanoseconds) under "timings".
+    """
+    timings: Dict[str, int] = {}
+    encoded: List[float] = []
+    texts = transcribe_batch(batch, timings, encoded=encoded)
+    started = time.perf_counter_ns()
+    parsed = parse_batch(texts)
+    timings["classify"] = time.perf_counter_ns() - started
+    return [
+        {"text": text, "intent": intent, "args": args, "encoded_s": seconds, "timings": timings}
+        for text, seconds, (intent, args) in zip(texts, encoded, parsed)
+    ]
+
+def transcribe_upload(audio_data: bytes) -> Dict:
+    """Decode, trim, transcribe and classify one upload in one call, for profiling a request end to end
+
+    Like transcribe_and_classify on a batch of one, plus the audio seconds
+    received and left after trimming.
+    """
+    samples, received = load_command(audio_data)
+    result = transcribe_and_classify([samples])[0]
+    result["audio"] = {"received_s": round(received, 3), "speech_s": round(len(samples) / 16000, 3),
+                       "encoded_s": result["encoded_s"]}
+    return result
+
+def transcribe_fast(batch: Sequence) -> List[Dict]:
+    """Batch function for the cascade's first tier (see inference/cascade.py)
+
+    Like transcribe_and_classify with the fast model, plus what the cascade
+    decides on: the transcript's average token log-probability ("logprob")
+    and the intent confidence ("confidence").
+    """
+    timings: Dict[str, int] = {}
+    logprobs: List[float] = []
+    encoded: List[float] = []
+    texts = transcribe_fast_batch(batch, timings, logprobs, encoded)
+    started = time.perf_counter_ns()
+    scored = score_commands(texts)
+    timings["classify"] = time.perf_counter_ns() - started
+    return [
+        {"text": text, "intent": intent, "args": args, "logprob": logprob, "confidence": confidence,
+         "encoded_s": seconds, "timings": timings}
+        for text, logprob, seconds, (intent, args, confidence) in zip(texts, logprobs, encoded, scored)
+    ]
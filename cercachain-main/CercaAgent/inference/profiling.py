@@ -0,0 +1,186 @@
+"""Opt-in per-request profiling, saved as collapsed stacks for flamegraph tools.
+
+A profiled request runs its whole pipeline as one pool task under
+``profile_call``. A sampler thread records the calling thread's Python stack
+every few milliseconds. When torch is installed, torch.profiler also records
+operator timings for the model call. Both are written in the collapsed-stack
+format: one ``frame;frame;frame weight`` line per stack. flamegraph.pl,
+inferno and speedscope all read it.
+
+Nothing here runs unless a request is picked for profiling.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Deeper stacks are cut at the root end; the leaf frames are where the time goes
+MAX_DEPTH = 128
+# Profile IDs: creation time to the millisecond, then a random suffix, e.g. 20260101T120000123-1a2b3c4d
+_PROFILE_ID = re.compile(r"^\d{8}T\d{9}-[0-9a-f]{8}$")
+# Saved files per profile, by kind
+KINDS = {"python": ".folded", "torch": ".torch.folded", "meta": ".json"}
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    # ';' separates frames and a trailing number is the weight, so neither may appear in a name
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval from a background thread"""
+
+    def __init__(self, thread_id: int, interval_s: float = 0.005):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None and len(frames) < MAX_DEPTH:
+                frames.append(_frame_name(frame))
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+def _torch_profiler():
+    try:
+        from torch.profiler import ProfilerActivity, profile
+    except ImportError:
+        return None
+    return profile(activities=[ProfilerActivity.CPU])
+
+def profile_call(fn: Callable[..., Any], *args, interval_ms: float = 5.0,
+                 torch_ops: bool = True) -> Tuple[Any, Dict[str, Any]]:
+    """Run ``fn(*args)`` under the stack sampler (and torch.profiler), as a pool task
+
+    Returns the result and the profile: sampled Python ``stacks`` (stack ->
+    samples), ``torch_ops`` (operator -> self CPU microseconds) and wall
+    ``seconds``. Exceptions from ``fn`` propagate; the profile is lost.
+    """
+    sampler = StackSampler(threading.get_ident(), interval_ms / 1000)
+    torch_profile = _torch_profiler() if torch_ops else None
+    started = time.perf_counter()
+    sampler.start()
+    try:
+        if torch_profile is None:
+            result = fn(*args)
+        else:
+            with torch_profile:
+                result = fn(*args)
+    finally:
+        stacks = sampler.stop()
+    seconds = time.perf_counter() - started
+    ops: Dict[str, float] = {}
+    if torch_profile is not None:
+        for event in torch_profile.key_averages():
+            if event.self_cpu_time_total > 0:
+                ops[event.key] = event.self_cpu_time_total
+    return result, {"stacks": dict(stacks), "torch_ops": ops, "seconds": seconds, "interval_ms": interval_ms}
+
+class ProfileStore:
+    """The ``max_profiles`` newest profiles on disk, oldest removed first
+
+    Every profile is saved as ``<id>.folded`` (Python samples),
+    ``<id>.torch.folded`` (torch operator microseconds, when recorded) and
+    ``<id>.json`` (what was profiled and how long it took).
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.saved = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def new_id(self) -> str:
+        now = time.time()
+        created = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"{int(now * 1000) % 1000:03d}"
+        return f"{created}-{uuid.uuid4().hex[:8]}"
+
+    def path(self, profile_id: str, kind: str = "python") -> Optional[str]:
+        """The file of one kind for a profile, or None when it does not exist"""
+        if not _PROFILE_ID.match(profile_id) or kind not in KINDS:
+            return None
+        path = os.path.join(self.directory, profile_id + KINDS[kind])
+        return path if os.path.isfile(path) else None
+
+    def save(self, profile_id: str, profile: Dict[str, Any], meta: Dict[str, Any]) -> Dict[str, Any]:
+        """Write a profile from ``profile_call`` and drop the oldest beyond the limit"""
+        os.makedirs(self.directory, exist_ok=True)
+        stem = os.path.join(self.directory, profile_id)
+        with open(stem + KINDS["python"], "w") as f:
+            for stack, samples in sorted(profile["stacks"].items()):
+                f.write(f"{stack} {samples}\n")
+        if profile["torch_ops"]:
+            with open(stem + KINDS["torch"], "w") as f:
+                for op, micros in sorted(profile["torch_ops"].items()):
+                    f.write(f"model;{op.replace(';', ':')} {round(micros)}\n")
+        meta = {
+            "id": profile_id,
+            **meta,
+            "seconds": round(profile["seconds"], 4),
+            "interval_ms": profile["interval_ms"],
+            "samples": sum(profile["stacks"].values()),
+            "torch_ops": len(profile["torch_ops"]),
+            "created": time.time(),
+        }
+        # Written last: a profile is listed once its metadata exists
+        with open(stem + KINDS["meta"], "w") as f:
+            json.dump(meta, f)
+        with self._lock:
+            self.saved += 1
+            self._evict()
+        return meta
+
+    def _evict(self):
+        # IDs start with their creation time, so name order is age order
+        suffix = KINDS["meta"]
+        ids = sorted(name[:-len(suffix)] for name in os.listdir(self.directory) if name.endswith(suffix))
+        for profile_id in ids[:max(0, len(ids) - self.max_profiles)]:
+            for kind in KINDS.values():
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + kind))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.warning(f"Could not remove old profile {profile_id}{kind}: {e}")
+            self.evicted += 1
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Saved profiles' metadata, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith(KINDS["meta"]):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                # Evicted or half-written meanwhile
+                continue
+        return profiles
+
+    def stats(self) -> Dict[str, Any]:
+        return {"directory": self.directory, "max_profiles": self.max_profiles, "saved": self.saved,
+                "evicted": self.evicted}
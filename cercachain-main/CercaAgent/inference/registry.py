@@ -0,0 +1,66 @@
+import gc
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict
+from metrics import resident_memory_bytes
+
+class ModelRegistry:
+    """Loads models on first use (or all at once on startup) and tracks readiness.
+
+    Loaders are registered by the modules that own the models, so importing
+    them stays cheap. ``ready`` only flips once the app has loaded and warmed
+    up everything it needs.
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.load_seconds: Dict[str, float] = {}
+        # Resident memory growth while each model loaded, an estimate of its footprint
+        self.memory_bytes: Dict[str, int] = {}
+        self.warmup_seconds = None
+        self.ready = False
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        self._loaders[name] = loader
+
+    def get(self, name: str) -> Any:
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            if name not in self._models:
+                start_time = time.perf_counter()
+                rss_before = resident_memory_bytes()
+                self._models[name] = self._loaders[name]()
+                self.load_seconds[name] = time.perf_counter() - start_time
+                self.memory_bytes[name] = max(0, resident_memory_bytes() - rss_before)
+                logging.info(f"Loaded model {name} in {self.load_seconds[name]:.2f}s")
+        return self._models[name]
+
+    def load_all(self):
+        for name in list(self._loaders):
+            self.get(name)
+
+    def freeze(self):
+        """Move everything loaded so far out of the GC's reach.
+
+        Forked workers then share the weights copy-on-write instead of
+        dirtying every page the first time the collector walks them.
+        """
+        gc.collect()
+        gc.freeze()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "loaded": sorted(self._models),
+            "pending": sorted(set(self._loaders) - set(self._models)),
+            "load_seconds": {name: round(seconds, 3) for name, seconds in self.load_seconds.items()},
+            "memory_bytes": self.memory_bytes,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+        }
+
+registry = ModelRegistry()
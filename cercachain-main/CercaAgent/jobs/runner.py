@@ -0,0 +1,187 @@
+"""Workers for bulk transcription jobs (see jobs/store.py).
+
+In the API process, JobRunner claims batches and runs them on the inference
+pool next to interactive requests. More throughput comes from dedicated
+worker processes sharing the same database, started from the CercaAgent
+directory:
+
+    python -m jobs.runner --batch-size 16
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+if __name__ == "__main__":
+    # A standalone worker; in the API process main.py has already put the shared modules on the path
+    sys.path.append(os.path.abspath(settings.ml_path))
+
+from jobs.store import JobStore, worker_name
+from logging_config import correlation_id, setup_logging
+
+def transcribe_files(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Pool task: decode, transcribe and classify a claimed batch in one model call
+
+    Timed like the benchmarks: per-file read and decode, then the shared
+    batch stages from the pipeline, all in milliseconds.
+    """
+    from inference.pipeline import transcribe_and_classify
+    from voice_recognition.transcribe import load_command
+
+    results, samples = [], []
+    for item in items:
+        started = time.perf_counter_ns()
+        try:
+            with open(item["path"], "rb") as f:
+                data = f.read()
+            read = time.perf_counter_ns()
+            samples.append(load_command(data)[0])
+        except Exception as e:
+            results.append({"id": item["id"], "error": str(e)})
+            continue
+        decoded = time.perf_counter_ns()
+        timings = {"read": (read - started) / 1e6, "decode": (decoded - read) / 1e6}
+        results.append({"id": item["id"], "timings": timings})
+
+    ok = [result for result in results if "error" not in result]
+    if ok:
+        for result, output in zip(ok, transcribe_and_classify(samples)):
+            result.update(text=output["text"], intent=output["intent"])
+            result["timings"].update({stage: ns / 1e6 for stage, ns in output["timings"].items()})
+            result["timings"]["batch_size"] = len(ok)
+    return results
+
+def remove_files(paths: List[str]):
+    """Delete finished uploads, and their job's directory once it is empty"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.warning(f"Could not remove finished job upload {path}: {e}")
+    for directory in {os.path.dirname(path) for path in paths}:
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass  # other files of the job are still waiting
+
+class JobRunner:
+    """Claim loops inside the API process
+
+    Each loop keeps one batch on the inference pool at a time, so
+    ``concurrency`` bounds how much of the pool bulk work can take from
+    interactive requests.
+    """
+
+    def __init__(self, store: JobStore, executor, concurrency: int = 1, batch_size: int = 8,
+                 poll_interval: float = 1.0):
+        self.store = store
+        self.executor = executor
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.batches = 0
+        self.items = 0
+        self.failures = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._loop(i)) for i in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self, index: int):
+        loop = asyncio.get_running_loop()
+        worker = worker_name(index)
+        correlation_id.set(f"jobs:{worker}")
+        while True:
+            try:
+                items = await loop.run_in_executor(None, self.store.claim, worker, self.batch_size)
+                if not items:
+                    failed = await loop.run_in_executor(None, self.store.requeue_expired)
+                    await loop.run_in_executor(None, remove_files, failed)
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self.run_batch(worker, items)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep the loop alive through database hiccups
+                logging.error(f"Job runner {worker} failed: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def run_batch(self, worker: str, items: List[Dict[str, Any]]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await self.executor.run(transcribe_files, items)
+        except asyncio.CancelledError:
+            # Shutting down: hand the batch back without spending an attempt on it
+            await loop.run_in_executor(None, self.store.release, worker, [item["id"] for item in items])
+            raise
+        except Exception as e:
+            self.failures += 1
+            logging.error(f"Job batch of {len(items)} failed: {e}")
+            results = [{"id": item["id"], "error": str(e)} for item in items]
+        finished = await loop.run_in_executor(None, self.store.complete, worker, results)
+        await loop.run_in_executor(None, remove_files, finished)
+        self.batches += 1
+        self.items += len(items)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "processed": self.items,
+            "failed_batches": self.failures,
+            **self.store.stats(),
+        }
+
+def run_worker(store: JobStore, batch_size: int, poll_interval: float, max_batches: Optional[int] = None):
+    """Standalone worker loop: models load in this process and batches run inline"""
+    from inference.registry import registry
+    import voice_recognition.transcribe  # noqa: F401
+    import voice_recognition.classify  # noqa: F401
+
+    registry.load_all()
+    worker = worker_name()
+    correlation_id.set(f"jobs:{worker}")
+    logging.info(f"Job worker {worker} ready")
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        items = store.claim(worker, batch_size)
+        if not items:
+            remove_files(store.requeue_expired())
+            time.sleep(poll_interval)
+            continue
+        try:
+            results = transcribe_files(items)
+        except Exception as e:
+            logging.error(f"Job batch of {len(items)} failed: {e}")
+            results = [{"id": item["id"], "error": str(e)} for item in items]
+        remove_files(store.complete(worker, results))
+        batches += 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process bulk transcription jobs from the job database")
+    parser.add_argument("--db", default=settings.jobs_db_path)
+    parser.add_argument("--batch-size", type=int, default=settings.jobs_batch_size)
+    parser.add_argument("--poll-interval", type=float, default=settings.jobs_poll_interval_s)
+    args = parser.parse_args(argv)
+
+    # Its own file: only one process may rotate the app's log
+    root, ext = os.path.splitext(settings.log_path)
+    setup_logging(f"{root}.jobs-{os.getpid()}{ext}", level=settings.log_level, queue_size=settings.log_queue_size)
+    store = JobStore(args.db, lease_s=settings.jobs_lease_s, max_attempts=settings.jobs_max_attempts).open()
+    run_worker(store, args.batch_size, args.poll_interval)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import glob
+import os
+import shutil
+from typing import BinaryIO, List, Optional, Sequence, Tuple
+
+from api.errors import ValidationError
+
+def manifest_files(root: Optional[str], paths: Sequence[str] = (), directory: Optional[str] = None,
+                   pattern: str = "*.wav", recursive: bool = False) -> List[Tuple[str, str, bool]]:
+    """Resolve a manifest (explicit paths and/or a directory glob) to job files under ``root``
+
+    Relative paths are taken from ``root``; anything resolving outside it is
+    refused, so a manifest cannot read arbitrary files off the server.
+    """
+    if not root:
+        raise ValidationError("Directory manifests are disabled; set jobs_manifest_root")
+    root = os.path.realpath(root)
+    candidates = [os.path.join(root, path) for path in paths]
+    if directory is not None:
+        base = os.path.join(root, directory, "**" if recursive else "", pattern)
+        candidates.extend(sorted(glob.glob(base, recursive=recursive)))
+
+    files = []
+    for candidate in candidates:
+        path = os.path.realpath(candidate)
+        if os.path.commonpath([root, path]) != root:
+            raise ValidationError(f"{candidate} is outside the manifest root")
+        if not os.path.isfile(path):
+            raise ValidationError(f"{os.path.relpath(path, root)} is not a file")
+        files.append((os.path.relpath(path, root), path, False))
+    return files
+
+def spool_file(source: BinaryIO, directory: str, position: int, name: str) -> str:
+    """Copy an upload (already spooled by the server) into the job's directory in bounded chunks"""
+    os.makedirs(directory, exist_ok=True)
+    # Only the base name, so a crafted filename cannot escape the directory
+    path = os.path.join(directory, f"{position:06d}_{os.path.basename(name or 'audio')}")
+    source.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(source, f, 1024 * 1024)
+    return path
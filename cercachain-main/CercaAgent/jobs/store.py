@@ -0,0 +1,418 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    total INTEGER NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    spooled INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    claimed_at REAL,
+    finished_at REAL,
+    text TEXT,
+    intent TEXT,
+    error TEXT,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS items_by_status ON items (status, id);
+CREATE UNIQUE INDEX IF NOT EXISTS items_by_job ON items (job_id, position);
+"""
+
+JOB_COLUMNS = ("id", "created_at", "finished_at", "total", "source")
+ITEM_COLUMNS = (
+    "id", "job_id", "position", "name", "path", "spooled", "status", "attempts", "claimed_by",
+    "claimed_at", "finished_at", "text", "intent", "error", "timings",
+)
+FINISHED = ("done", "failed")
+
+def is_corruption(error: Exception) -> bool:
+    """sqlite3 raises the base DatabaseError for damaged files, subclasses for everything else"""
+    message = str(error).lower()
+    return type(error) is sqlite3.DatabaseError or "malformed" in message or "not a database" in message
+
+class JobStore:
+    """Durable queue of bulk transcription jobs in a SQLite database in WAL mode.
+
+    A job is a list of audio files (items). Workers in any process claim
+    queued items in batches and write results back in one transaction per
+    batch. Items claimed by a worker that died are requeued once their lease
+    runs out. A damaged database file is moved aside on open and every row
+    that can still be read is copied into a fresh one.
+    """
+
+    def __init__(self, path: str, lease_s: float = 600.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.recoveries = 0
+        self._local = threading.local()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def open(self) -> "JobStore":
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            conn = self._conn()
+            check = conn.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise sqlite3.DatabaseError(f"quick_check failed: {check}")
+            conn.executescript(SCHEMA)
+        except sqlite3.DatabaseError as e:
+            if not is_corruption(e):
+                raise
+            self.recover(e)
+        return self
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread, reopened after a recovery (here or in another process) swapped the file"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.generation == self._generation and self._local.inode == _inode(self.path):
+            return conn
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps commits durable across crashes with NORMAL; only power loss can drop the last ones
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.generation = self._generation
+        self._local.inode = _inode(self.path)
+        return conn
+
+    def _write(self, fn, *args):
+        """Run ``fn(conn, *args)`` in a write transaction, recovering once from corruption"""
+        for attempt in (0, 1):
+            conn = self._conn()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    result = fn(conn, *args)
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+                return result
+            except sqlite3.DatabaseError as e:
+                if attempt or not is_corruption(e):
+                    raise
+                self.recover(e)
+
+    def _read(self, sql: str, params: Sequence = ()) -> List[sqlite3.Row]:
+        for attempt in (0, 1):
+            try:
+                return self._conn().execute(sql, params).fetchall()
+            except sqlite3.DatabaseError as e:
+                if attempt or not is_corruption(e):
+                    raise
+                self.recover(e)
+
+    def recover(self, error: Exception):
+        """Move the damaged file aside and rebuild the queue from whatever rows survive
+
+        Threads and processes sharing the file take turns through a lock file
+        next to it. One that finds the file already swapped by another's
+        rebuild only reconnects.
+        """
+        seen = getattr(self._local, "inode", None)
+        with self._lock, _file_lock(self.path + ".lock"):
+            current = _inode(self.path)
+            if seen is not None and current is not None and current != seen:
+                logging.info(f"Job database {self.path} was already rebuilt elsewhere; reconnecting")
+                return
+            logging.error(f"Job database {self.path} is damaged ({error}); rebuilding it")
+            conn = getattr(self._local, "conn", None)
+            if conn is not None:
+                conn.close()
+                self._local.conn = None
+            damaged = f"{self.path}.corrupt-{int(time.time())}"
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.replace(self.path + suffix, damaged + suffix)
+            jobs = _salvage(damaged, "jobs", JOB_COLUMNS)
+            items = _salvage(damaged, "items", ITEM_COLUMNS)
+            self._generation += 1
+            self.recoveries += 1
+
+            conn = self._conn()
+            conn.executescript(SCHEMA)
+            known = {job["id"] for job in jobs}
+            # Items whose job row was lost get a stand-in so their results stay reachable
+            for job_id in sorted({item["job_id"] for item in items} - known):
+                positions = [item["position"] for item in items if item["job_id"] == job_id]
+                jobs.append({"id": job_id, "created_at": time.time(), "finished_at": None,
+                             "total": max(positions) + 1, "source": "recovered"})
+            for item in items:
+                if item["status"] not in FINISHED:
+                    item.update(status="queued", claimed_by=None, claimed_at=None)
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(_insert("jobs", JOB_COLUMNS), [tuple(job[c] for c in JOB_COLUMNS) for job in jobs])
+            conn.executemany(_insert("items", ITEM_COLUMNS), [tuple(item[c] for c in ITEM_COLUMNS) for item in items])
+            conn.execute("COMMIT")
+            logging.warning(
+                f"Recovered {len(jobs)} jobs and {len(items)} items into a new {self.path}; "
+                f"the damaged file is kept at {damaged}"
+            )
+
+    def create_job(self, files: Sequence[Tuple[str, str, bool]], source: str) -> str:
+        """Enqueue a job of (name, path, spooled) files in one transaction; spooled files are deleted once done"""
+        job_id = uuid.uuid4().hex
+
+        def insert(conn):
+            conn.execute("INSERT INTO jobs (id, created_at, total, source) VALUES (?, ?, ?, ?)",
+                         (job_id, time.time(), len(files), source))
+            conn.executemany(
+                "INSERT INTO items (job_id, position, name, path, spooled) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, position, name, path, int(spooled)) for position, (name, path, spooled) in enumerate(files)]
+            )
+
+        self._write(insert)
+        return job_id
+
+    def claim(self, worker: str, limit: int) -> List[Dict[str, Any]]:
+        """Atomically take up to ``limit`` queued items, oldest first"""
+        def take(conn):
+            rows = conn.execute(
+                "SELECT id, job_id, position, name, path, attempts FROM items "
+                "WHERE status = 'queued' ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE items SET status = 'running', claimed_by = ?, claimed_at = ?, attempts = attempts + 1 "
+                    "WHERE id = ?", [(worker, time.time(), row["id"]) for row in rows]
+                )
+            return [dict(row) for row in rows]
+
+        return self._write(take)
+
+    def complete(self, worker: str, results: Iterable[Dict[str, Any]]) -> List[str]:
+        """Write a batch of results in one transaction
+
+        Each result has the item ``id`` and either ``text``/``intent``/``timings``
+        or ``error``. Failed items are requeued until they run out of attempts.
+        Only items still running under ``worker``'s claim are written, so a
+        worker that outlived its lease cannot overwrite a newer result.
+        Returns the paths of finished spooled files, which the caller can delete.
+        """
+        results = list(results)
+
+        def write(conn):
+            now = time.time()
+            written = []
+            for r in results:
+                if "error" in r:
+                    cursor = conn.execute(
+                        "UPDATE items SET error = ?, claimed_by = NULL, "
+                        "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                        "finished_at = CASE WHEN attempts >= ? THEN ? END "
+                        "WHERE id = ? AND status = 'running' AND claimed_by = ?",
+                        (r["error"], self.max_attempts, self.max_attempts, now, r["id"], worker)
+                    )
+                else:
+                    cursor = conn.execute(
+                        "UPDATE items SET status = 'done', finished_at = ?, text = ?, intent = ?, timings = ?, "
+                        "error = NULL WHERE id = ? AND status = 'running' AND claimed_by = ?",
+                        (now, r["text"], r["intent"], json.dumps(r.get("timings", {})), r["id"], worker)
+                    )
+                if cursor.rowcount:
+                    written.append(r["id"])
+            if len(written) < len(results):
+                logging.warning(f"Dropped {len(results) - len(written)} job results from {worker}: "
+                                f"their lease ran out and the items were taken back")
+            return _finish(conn, written, now)
+
+        return self._write(write) if results else []
+
+    def release(self, worker: str, ids: Sequence[int]):
+        """Hand a claimed batch back untouched, e.g. on shutdown, without spending an attempt"""
+        def requeue(conn):
+            conn.executemany(
+                "UPDATE items SET status = 'queued', claimed_by = NULL, attempts = attempts - 1 "
+                "WHERE id = ? AND status = 'running' AND claimed_by = ?", [(item_id, worker) for item_id in ids]
+            )
+
+        self._write(requeue)
+
+    def requeue_expired(self) -> List[str]:
+        """Take back running items whose worker has not reported back within the lease
+
+        Items that have used all their attempts fail instead of going round
+        again. Returns the paths of spooled files of the items that failed.
+        """
+        def requeue(conn):
+            now = time.time()
+            expired = now - self.lease_s
+            failed = [row["id"] for row in conn.execute(
+                "SELECT id FROM items WHERE status = 'running' AND claimed_at < ? AND attempts >= ?",
+                (expired, self.max_attempts)
+            )]
+            conn.executemany(
+                "UPDATE items SET status = 'failed', claimed_by = NULL, finished_at = ?, "
+                "error = 'lease expired: the worker stopped responding on every attempt' WHERE id = ?",
+                [(now, item_id) for item_id in failed]
+            )
+            requeued = conn.execute(
+                "UPDATE items SET status = 'queued', claimed_by = NULL WHERE status = 'running' AND claimed_at < ?",
+                (expired,)
+            ).rowcount
+            return requeued, failed, _finish(conn, failed, now)
+
+        requeued, failed, spooled = self._write(requeue)
+        if requeued or failed:
+            logging.warning(f"Requeued {requeued} and failed {len(failed)} job items whose worker stopped responding")
+        return spooled
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._read("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        counts = {status: 0 for status in ("queued", "running", "done", "failed")}
+        for row in self._read("SELECT status, COUNT(*) AS n FROM items WHERE job_id = ? GROUP BY status", (job_id,)):
+            counts[row["status"]] = row["n"]
+        job = dict(rows[0])
+        job["status"] = "finished" if job["finished_at"] else ("running" if counts["running"] or counts["done"]
+                                                                 or counts["failed"] else "queued")
+        job["counts"] = counts
+        return job
+
+    def jobs(self, after: Optional[float] = None, limit: int = 50) -> Dict[str, Any]:
+        """Page through jobs, newest first; pass the returned ``next`` as ``after``"""
+        rows = self._read(
+            "SELECT id FROM jobs WHERE created_at < ? ORDER BY created_at DESC LIMIT ?",
+            (after if after is not None else float("inf"), limit)
+        )
+        jobs = [self.job(row["id"]) for row in rows]
+        return {"jobs": jobs, "next": jobs[-1]["created_at"] if len(jobs) == limit else None}
+
+    def results(self, job_id: str, after: int = -1, limit: int = 100,
+                status: Optional[str] = None) -> Dict[str, Any]:
+        """Page through a job's items in submission order; pass the returned ``next`` as ``after``"""
+        sql = ("SELECT position, name, status, attempts, text, intent, error, timings, finished_at FROM items "
+               "WHERE job_id = ? AND position > ?")
+        params: List[Any] = [job_id, after]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        rows = self._read(sql + " ORDER BY position LIMIT ?", params + [limit])
+        items = []
+        for row in rows:
+            item = dict(row)
+            item["timings"] = json.loads(item["timings"]) if item["timings"] else None
+            items.append(item)
+        return {"items": items, "next": items[-1]["position"] if len(items) == limit else None}
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._read("SELECT status, COUNT(*) AS n FROM items GROUP BY status")
+        counts = {row["status"]: row["n"] for row in rows}
+        return {"path": self.path, "items": counts, "recoveries": self.recoveries}
+
+def worker_name(index: int = 0) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock across processes, held on a sidecar file so the database can be swapped under it"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                f.seek(0)
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ten seconds
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _inode(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except OSError:
+        return None
+
+def _finish(conn: sqlite3.Connection, ids: Sequence[int], now: float) -> List[str]:
+    """Close out the jobs of ``ids`` that have nothing left to run; returns their finished spooled files"""
+    if not ids:
+        return []
+    marks = ",".join("?" * len(ids))
+    spooled = [row["path"] for row in conn.execute(
+        f"SELECT path FROM items WHERE id IN ({marks}) AND spooled = 1 AND status IN ('done', 'failed')", ids
+    )]
+    conn.execute(
+        f"UPDATE jobs SET finished_at = ? WHERE finished_at IS NULL "
+        f"AND id IN (SELECT job_id FROM items WHERE id IN ({marks})) "
+        f"AND NOT EXISTS (SELECT 1 FROM items i "
+        f"WHERE i.job_id = jobs.id AND i.status IN ('queued', 'running'))",
+        [now] + list(ids)
+    )
+    return spooled
+
+def _insert(table: str, columns: Sequence[str]) -> str:
+    return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+def _salvage(path: str, table: str, columns: Sequence[str]) -> List[Dict[str, Any]]:
+    """Every row of ``table`` that can still be read from a damaged database"""
+    if not os.path.exists(path):
+        return []
+    select = f"SELECT {', '.join(columns)} FROM {table}"
+    try:
+        conn = sqlite3.connect(path)
+    except sqlite3.DatabaseError:
+        return []
+    try:
+        try:
+            return [dict(zip(columns, row)) for row in conn.execute(select)]
+        except sqlite3.DatabaseError:
+            pass
+        # A full scan stops at the first bad page; fall back to reading rows one at a time
+        try:
+            last = conn.execute(f"SELECT max(rowid) FROM {table}").fetchone()[0] or 0
+        except sqlite3.DatabaseError:
+            return []
+        rows = []
+        for rowid in range(1, last + 1):
+            try:
+                row = conn.execute(f"{select} WHERE rowid = ?", (rowid,)).fetchone()
+            except sqlite3.DatabaseError:
+                continue
+            if row is not None:
+                rows.append(dict(zip(columns, row)))
+        return rows
+    finally:
+        conn.close()
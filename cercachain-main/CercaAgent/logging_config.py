@@ -0,0 +1,22 @@
+"""CercaAgent's log file on top of the logging subsystem shared with the api app (ml_logging)"""
+import logging.handlers
+import os
+
+from ml_logging import (  # noqa: F401
+    JsonFormatter,
+    correlation_id,
+    logging_stats,
+    new_correlation_id,
+    rate_limit,
+    run_with_correlation_id,
+    setup_worker_logging,
+    start_logging,
+    worker_log_queue,
+)
+
+def setup_logging(path="logs/app.log", level="INFO", queue_size=10000):
+    """JSON lines to a rotating ``path``, written by a background listener (see ml_logging)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=1024 * 1024 * 5, backupCount=5)
+    file_handler.setFormatter(JsonFormatter())
+    return start_logging([file_handler], level, queue_size)
@@ -1,23 +1,588 @@
-from fastapi import FastAPI, UploadFile, File
+import asyncio
+import hmac
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from functools import partial
+from fastapi import FastAPI, Header, HTTPException, Request, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from voice_recognition.transcribe import transcribe_audio
-from voice_recognition.classify import classify_intent
-from command_mapping.action_map import get_action
-from event_handling.execute import execute_action
+from config import settings
 
-app = FastAPI()
+# The modules shared with the api app import flat; each entry point puts them on the path
+sys.path.append(os.path.abspath(settings.ml_path))
+
+from logging_config import correlation_id, logging_stats, new_correlation_id, setup_logging
+from metrics import (
+    INTENTS,
+    OUTCOMES,
+    STAGE_SECONDS,
+    UPLOAD_BYTES,
+    metrics,
+    observe_action,
+    observe_audio,
+    observe_cascade,
+    observe_fair_wait,
+    observe_pipeline,
+    resident_memory_bytes,
+    timed,
+)
+from api.errors import (
+    DeadlineExceededError,
+    NoSpeechError,
+    OverloadedError,
+    RateLimitedError,
+    ValidationError,
+)
+from inference.executor import Deadline, InferenceExecutor, preload_models, warmup_models
+from inference.fairness import FairScheduler, client_id
+from inference.profiling import ProfileStore, profile_call
+from inference.registry import registry
+from voice_recognition.audio import (
+    AudioDecodeError,
+    RedisBackend,
+    TranscriptionCache,
+    UploadLimitError,
+    check_sample_rate,
+    decode_pcm,
+    make_key,
+    read_upload,
+)
+from inference.cascade import Cascade
+from inference.pipeline import transcribe_and_classify, transcribe_fast, transcribe_upload
+from voice_recognition.transcribe import FAST_MODEL_NAME, MODEL_NAME, load_command
+from voice_recognition.batching import BatchScheduler
+from voice_recognition.streaming import StreamingSession
+from voice_recognition.vad import EnergyVAD
+from voice_recognition.classify import MODEL_VERSION as INTENT_MODEL_VERSION, parse_command
+from typing import List, Optional
+from pydantic import BaseModel
+from command_mapping.action_map import action_targets, catalog, get_action
+from event_handling.engine import ActionEngine
+from jobs.runner import JobRunner
+from jobs.sources import manifest_files, spool_file
+from jobs.store import JobStore
+
+setup_logging(settings.log_path, level=settings.log_level, queue_size=settings.log_queue_size)
+
+executor = InferenceExecutor(
+    kind=settings.executor_kind,
+    max_workers=settings.executor_workers,
+    max_in_flight=settings.max_in_flight,
+    retry_after=settings.retry_after_s,
+    initializer=preload_models,
+    start_method=settings.executor_start_method
+)
+# Decides which client's request takes the next transcription slot
+fair = FairScheduler(
+    slots=settings.fair_slots,
+    bulk_slots=settings.fair_bulk_slots,
+    rate=settings.fair_rate,
+    burst=settings.fair_burst,
+    max_outstanding=settings.fair_max_outstanding,
+    weights=settings.fair_weights,
+    retry_after=settings.retry_after_s,
+    observer=observe_fair_wait
+)
+scheduler = BatchScheduler(
+    transcribe_and_classify,
+    max_batch_size=settings.batch_max_size,
+    max_wait_ms=settings.batch_max_wait_ms,
+    executor=executor.pool,
+    max_concurrent_batches=executor.max_workers
+)
+# Everything transcribes through the cascade, which without cascade_enabled is just the scheduler above
+cascade = Cascade(
+    scheduler,
+    BatchScheduler(
+        transcribe_fast,
+        max_batch_size=settings.batch_max_size,
+        max_wait_ms=settings.batch_max_wait_ms,
+        executor=executor.pool,
+        max_concurrent_batches=executor.max_workers
+    ) if settings.cascade_enabled else None,
+    min_logprob=settings.cascade_min_logprob,
+    min_confidence=settings.cascade_min_confidence,
+    observer=observe_cascade
+)
+# The cascade can answer with a different model, so its settings are part of the cache key
+CASCADE_KEY = {
+    "cascade": [FAST_MODEL_NAME, settings.cascade_min_logprob, settings.cascade_min_confidence]
+} if settings.cascade_enabled else {}
+# Trimming changes what the model hears, and a bucketed encoder what it sees
+TRIM_KEY = [settings.trim_silence, settings.trim_threshold_db, settings.trim_padding_ms, settings.encoder_buckets_s]
+cache = TranscriptionCache(
+    max_entries=settings.cache_max_entries,
+    ttl=settings.cache_ttl_s,
+    backend=RedisBackend(settings.cache_redis_url, ttl=settings.cache_ttl_s) if settings.cache_redis_url else None
+)
+actions = ActionEngine(
+    max_workers=settings.action_workers,
+    default_timeout=settings.action_timeout_s,
+    target_concurrency=settings.action_target_concurrency,
+    idempotency_ttl=settings.idempotency_ttl_s,
+    max_jobs=settings.max_action_jobs,
+    timeouts=settings.action_timeouts,
+    targets=action_targets,
+    observer=observe_action
+)
+
+profiles = ProfileStore(settings.profile_dir, max_profiles=settings.profile_max_saved)
+
+jobs = JobStore(settings.jobs_db_path, lease_s=settings.jobs_lease_s, max_attempts=settings.jobs_max_attempts)
+job_runner = JobRunner(
+    jobs, executor,
+    concurrency=settings.jobs_concurrency,
+    batch_size=settings.jobs_batch_size,
+    poll_interval=settings.jobs_poll_interval_s
+)
+
+metrics.gauge("cerca_in_flight_requests", "Requests holding an inference slot", lambda: executor.in_flight)
+metrics.gauge("cerca_batch_queue_depth", "Clips waiting for a micro-batch", lambda: scheduler.stats()["queue_depth"])
+metrics.gauge(
+    "cerca_fair_queue_depth", "Requests waiting for a transcription slot by priority class",
+    lambda: {(priority,): stats["queue_depth"] for priority, stats in fair.stats(top=0)["classes"].items()},
+    ["priority"]
+)
+metrics.gauge("cerca_action_jobs_running", "Background action jobs still running", lambda: actions.stats()["running_jobs"])
+metrics.gauge(
+    "cerca_model_memory_bytes", "Resident memory added while loading each model",
+    lambda: {(name,): size for name, size in registry.memory_bytes.items()}, ["model"]
+)
+metrics.gauge("cerca_resident_memory_bytes", "Resident memory of the API process", resident_memory_bytes)
+metrics.gauge(
+    "cerca_job_items", "Bulk transcription job items by status",
+    lambda: {(status,): n for status, n in jobs.stats()["items"].items()}, ["status"]
+)
+
+async def load_models():
+    if settings.preload_models:
+        try:
+            # Load in the parent first so forked pool workers share the weights
+            await run_in_threadpool(registry.load_all)
+            registry.freeze()
+            start_time = time.perf_counter()
+            await executor.prestart()
+            if executor.pool is None:
+                await run_in_threadpool(warmup_models)
+            else:
+                await executor.run(warmup_models)
+            registry.warmup_seconds = time.perf_counter() - start_time
+        except Exception as e:
+            logging.error(f"Model loading failed, staying unready: {e}")
+            raise
+    registry.ready = True
+    # Bulk jobs only start taking pool time once interactive requests can be served
+    job_runner.start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Also where a damaged job database is rebuilt, before anything reads it
+    await run_in_threadpool(jobs.open)
+    await cascade.start()
+    # Liveness is served while the models load; /ready flips once they are warm
+    loading = asyncio.create_task(load_models())
+    yield
+    loading.cancel()
+    await job_runner.stop()
+    await cascade.stop()
+    executor.shutdown()
+    actions.shutdown()
+
+if settings.load_models_on_import:
+    # For preforking servers (gunicorn --preload): load once in the master
+    # so every worker shares the weights copy-on-write
+    registry.load_all()
+    registry.freeze()
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="ui/static"), name="static")
 
+@app.middleware("http")
+async def correlation_id_middleware(request: Request, call_next):
+    # Carried into transcription, classification and action logs through a contextvar
+    cid = request.headers.get("X-Request-ID") or new_correlation_id()
+    token = correlation_id.set(cid)
+    try:
+        response = await call_next(request)
+    finally:
+        correlation_id.reset(token)
+    response.headers["X-Request-ID"] = cid
+    return response
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    OUTCOMES.inc("overloaded")
+    return JSONResponse(
+        status_code=settings.overload_status_code,
+        content={"status": "overloaded", "message": exc.message},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(RateLimitedError)
+async def rate_limited_handler(request: Request, exc: RateLimitedError):
+    OUTCOMES.inc("rate_limited")
+    return JSONResponse(
+        status_code=429,
+        content={"status": "rate_limited", "message": exc.message},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(UploadLimitError)
+async def upload_limit_handler(request: Request, exc: UploadLimitError):
+    OUTCOMES.inc("rejected_upload")
+    return JSONResponse(status_code=413, content={"status": "rejected", "message": exc.message, "type": exc.error_type})
+
+@app.exception_handler(AudioDecodeError)
+async def audio_decode_handler(request: Request, exc: AudioDecodeError):
+    OUTCOMES.inc("invalid_audio")
+    # Compressed audio this server has no decoder for is an unsupported format; anything else is a bad upload
+    status_code = 415 if exc.error_type in ("DECODER_MISSING", "UNSUPPORTED_WAV") else 400
+    return JSONResponse(status_code=status_code,
+                        content={"status": "invalid_audio", "message": exc.message, "error_type": exc.error_type})
+
+@app.exception_handler(NoSpeechError)
+async def no_speech_handler(request: Request, exc: NoSpeechError):
+    OUTCOMES.inc("no_speech")
+    return JSONResponse(status_code=422, content={"status": "no_speech", "message": exc.message})
+
+@app.exception_handler(ValidationError)
+async def validation_handler(request: Request, exc: ValidationError):
+    return JSONResponse(status_code=400, content={"status": "error", "message": exc.message})
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_handler(request: Request, exc: DeadlineExceededError):
+    OUTCOMES.inc("deadline_exceeded")
+    return JSONResponse(
+        status_code=504,
+        content={"status": "timeout", "message": exc.message},
+        headers={"Retry-After": str(settings.retry_after_s)}
+    )
+
+@app.get("/")
+async def read_root():
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    status = registry.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+def request_client(request: Request) -> str:
+    forwarded_for = request.headers.get("X-Forwarded-For") if settings.fair_trust_forwarded_for else None
+    return client_id(request.headers.get("X-API-Key"), request.client.host if request.client else None,
+                     forwarded_for, settings.fair_api_keys)
+
+def upload_priority(upload, size: int, background: bool = False) -> str:
+    """Interactive for command-length uploads, bulk for long audio and background mode"""
+    if background:
+        # Nobody is waiting on the action, so it can wait behind interactive commands
+        return "bulk"
+    # Compressed uploads have no header duration; assume a 128 kbit/s codec
+    seconds = upload.duration_s if upload.duration_s is not None else size / 16000
+    return "interactive" if seconds <= settings.fair_interactive_max_s else "bulk"
+
+def valid_profile_token(token: Optional[str]) -> bool:
+    return bool(settings.profile_token) and token is not None and hmac.compare_digest(
+        token.encode(), settings.profile_token.encode()
+    )
+
+def profile_trigger(token: Optional[str]) -> Optional[str]:
+    """Why a request is profiled ("header" or "sampled"), or None for almost every request"""
+    if token is not None and valid_profile_token(token):
+        return "header"
+    if settings.profile_sample_rate and random.random() < settings.profile_sample_rate:
+        return "sampled"
+    return None
+
+async def profile_request(audio_data: bytes, trigger: str, deadline: Deadline):
+    """Transcribe one upload alone on a pool worker under the profiler, and save its profile
+
+    It skips the cache, the batch scheduler and the cascade, so the profile
+    holds only this request's decoding and inference.
+    """
+    profiled = partial(profile_call, interval_ms=settings.profile_interval_ms, torch_ops=settings.profile_torch_ops)
+    decoded, profile = await executor.run(profiled, transcribe_upload, audio_data, deadline=deadline)
+    observe_pipeline(decoded["timings"])
+    observe_audio(decoded["audio"])
+    meta = await run_in_threadpool(profiles.save, profiles.new_id(), profile, {
+        "correlation_id": correlation_id.get(), "trigger": trigger, "audio_bytes": len(audio_data),
+        "audio": decoded["audio"], "intent": decoded["intent"],
+        "timings_ms": {stage: ns / 1e6 for stage, ns in decoded["timings"].items()}
+    })
+    logging.info("Saved request profile", extra={"profile_id": meta["id"], "trigger": trigger,
+                                                 "profile_seconds": meta["seconds"]})
+    return {**decoded, "tier": None, "batch": None, "profile_id": meta["id"]}
+
 @app.post("/process_audio")
-async def process_audio(audio: UploadFile = File(...)):
-    audio_data = await audio.read()
-    transcription = transcribe_audio(audio_data)
-    intent = classify_intent(transcription)
-    action = get_action(intent)
-    result = execute_action(intent, action)
-    return {"transcription": transcription, "intent": intent, **result}
+async def process_audio(request: Request, audio: UploadFile = File(...), background: bool = False,
+                        idempotency_key: Optional[str] = Header(None),
+                        x_profile_token: Optional[str] = Header(None)):
+    client = request_client(request)
+    # Per-client limits first, so a client over its share is refused before it takes a global slot
+    async with fair.admit(client), executor.admit():
+        deadline = Deadline(settings.request_deadline_s)
+        with STAGE_SECONDS.time("upload_read"):
+            # Chunked into one buffer, rejected as soon as it crosses a limit
+            upload = await read_upload(
+                audio.read, settings.upload_chunk_bytes, max_bytes=settings.max_upload_bytes,
+                max_duration_s=settings.max_audio_duration_s, size_hint=audio.size
+            )
+            audio_data = upload.finish()
+        UPLOAD_BYTES.observe(upload.peak_buffered)
+        priority = upload_priority(upload, len(audio_data), background)
+
+        async def transcribe():
+            # Timed inside the worker so pool queueing is not counted as decoding
+            async with fair.slot(client, priority) as waited:
+                # Silent clips are rejected here, before they take a batch slot
+                (samples, received_s), decode_ns = await executor.run(
+                    timed, load_command, audio_data, deadline=deadline
+                )
+                STAGE_SECONDS.observe_ns(decode_ns, "decode")
+                decoded, batch = await cascade.submit(samples)
+            batch = {**batch, "slot_wait_ms": round(waited * 1000, 3)}
+            observe_pipeline(decoded["timings"])
+            audio = {
+                "received_s": round(received_s, 3),
+                "speech_s": round(len(samples) / 16000, 3),
+                "encoded_s": decoded["encoded_s"]
+            }
+            observe_audio(audio)
+            return {
+                "text": decoded["text"], "intent": decoded["intent"], "args": decoded["args"],
+                "tier": decoded.get("tier"), "batch": batch, "audio": audio
+            }
+
+        trigger = profile_trigger(x_profile_token)
+        if trigger is not None:
+            async with fair.slot(client, priority):
+                decoded, cached = await profile_request(audio_data, trigger, deadline), False
+        else:
+            # A catalog edit changes what cached transcripts parse to
+            key = make_key(audio_data, MODEL_NAME, backend=settings.whisper_backend,
+                           intent_model=INTENT_MODEL_VERSION, decoding=settings.decoding_mode, trim=TRIM_KEY,
+                           commands=catalog.current().loaded_at, **CASCADE_KEY)
+            decoded, cached = await executor.wait(cache.aget_or_compute(key, transcribe), deadline.remaining())
+        transcription = decoded["text"]
+        intent = decoded["intent"]
+        args = decoded["args"]
+        action = get_action(intent)
+    INTENTS.inc(intent)
+    logging.info("Transcribed audio", extra={
+        "intent": intent, "cached": cached, "audio_bytes": len(audio_data), "peak_buffered_bytes": upload.peak_buffered,
+        "client": client, "priority": priority
+    })
+    # Actions run outside the inference slot; background mode returns a job ID right away
+    if background:
+        job = actions.submit(intent, action, idempotency_key, args)
+        result = {"status": "accepted", "message": f"Command '{intent}' queued", "job_id": job["id"]}
+    else:
+        result = await actions.execute(intent, action, idempotency_key, args)
+    OUTCOMES.inc(result["status"])
+    return {
+        "transcription": transcription,
+        "intent": intent,
+        "args": args,
+        "tier": decoded["tier"],
+        "priority": priority,
+        "batch": None if cached else decoded["batch"],
+        "audio": decoded["audio"],
+        "cached": cached,
+        **({"profile_id": decoded["profile_id"]} if "profile_id" in decoded else {}),
+        **result
+    }
+
+@app.websocket("/ws/transcribe")
+async def ws_transcribe(websocket: WebSocket, sample_rate: int = 16000):
+    """Stream little-endian int16 mono PCM as binary frames; send the text "end" to flush"""
+    correlation_id.set(websocket.headers.get("X-Request-ID") or new_correlation_id())
+    try:
+        check_sample_rate(sample_rate, settings.stream_min_sample_rate, settings.stream_max_sample_rate)
+    except AudioDecodeError as e:
+        # Accepted only to deliver the reason and the 1003 close code; no session is started
+        await websocket.accept()
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close(code=1003)
+        return
+    await websocket.accept()
+
+    async def transcribe(samples):
+        decoded, _ = await cascade.submit(samples)
+        return decoded["text"]
+
+    async def on_final(text):
+        # Sub-millisecond, so it runs inline rather than on the pool
+        with STAGE_SECONDS.time("classify_intent"):
+            intent, args = parse_command(text)
+        INTENTS.inc(intent)
+        action = get_action(intent)
+        return {"intent": intent, "args": args, **(await actions.execute(intent, action, args=args))}
+
+    vad = EnergyVAD(
+        frame_ms=settings.vad_frame_ms,
+        threshold_db=settings.vad_threshold_db,
+        start_ms=settings.vad_start_ms,
+        hangover_ms=settings.vad_hangover_ms,
+        max_utterance_s=settings.max_utterance_s
+    )
+    session = StreamingSession(
+        transcribe, websocket.send_json, on_final, vad=vad,
+        partial_interval_ms=settings.partial_interval_ms,
+        window_s=settings.partial_window_s
+    )
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                await session.feed(decode_pcm(message["bytes"], sample_rate))
+            elif message.get("text") == "end":
+                await session.close()
+                await websocket.close()
+                break
+    except AudioDecodeError as e:
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close(code=1003)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.abort()
+
+class JobManifest(BaseModel):
+    """Files under jobs_manifest_root: explicit relative paths and/or a directory glob"""
+    paths: List[str] = []
+    directory: Optional[str] = None
+    pattern: str = "*.wav"
+    recursive: bool = False
+
+def check_job_size(count: int):
+    if count > settings.jobs_max_files:
+        raise ValidationError(f"{count} files is over the {settings.jobs_max_files} file limit per job")
+
+@app.post("/jobs", status_code=202)
+async def create_job(files: List[UploadFile] = File(...)):
+    """Queue uploaded files for bulk transcription; poll /jobs/{job_id} and page /jobs/{job_id}/results"""
+    check_job_size(len(files))
+    for upload in files:
+        if upload.size and upload.size > settings.max_upload_bytes:
+            raise UploadLimitError(
+                "UPLOAD_TOO_LARGE", f"{upload.filename} is over the {settings.max_upload_bytes} byte limit"
+            )
+    directory = os.path.join(settings.jobs_upload_dir, uuid.uuid4().hex)
+
+    def spool():
+        return [
+            (upload.filename or f"file{position}", spool_file(upload.file, directory, position, upload.filename), True)
+            for position, upload in enumerate(files)
+        ]
+
+    job_id = await run_in_threadpool(jobs.create_job, await run_in_threadpool(spool), "upload")
+    return await run_in_threadpool(jobs.job, job_id)
+
+@app.post("/jobs/manifest", status_code=202)
+async def create_manifest_job(manifest: JobManifest):
+    """Queue files already on the server, e.g. an archive directory"""
+    files = await run_in_threadpool(
+        manifest_files, settings.jobs_manifest_root, manifest.paths, manifest.directory,
+        manifest.pattern, manifest.recursive
+    )
+    if not files:
+        raise ValidationError("The manifest matched no files")
+    check_job_size(len(files))
+    job_id = await run_in_threadpool(jobs.create_job, files, "manifest")
+    return await run_in_threadpool(jobs.job, job_id)
+
+@app.get("/jobs")
+async def list_jobs(after: Optional[float] = None, limit: int = 50):
+    """Bulk jobs, newest first; pass ``next`` back as ``after`` for the next page"""
+    return await run_in_threadpool(jobs.jobs, after, max(1, min(limit, 500)))
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """A background action job or a bulk transcription job"""
+    job = actions.get_job(job_id) or await run_in_threadpool(jobs.job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, after: int = -1, limit: int = 100, status: Optional[str] = None):
+    """A page of a bulk job's results in submission order; pass ``next`` back as ``after``"""
+    if await run_in_threadpool(jobs.job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await run_in_threadpool(jobs.results, job_id, after, max(1, min(limit, 1000)), status)
+
+def check_profile_token(token: Optional[str]):
+    if not settings.profile_token:
+        raise HTTPException(status_code=404, detail="Profiling is disabled; set profile_token")
+    if not valid_profile_token(token):
+        raise HTTPException(status_code=403, detail="Missing or wrong X-Profile-Token")
+
+@app.get("/debug/profiles")
+async def list_profiles(x_profile_token: Optional[str] = Header(None)):
+    """Saved request profiles, newest first"""
+    check_profile_token(x_profile_token)
+    return {**profiles.stats(), "profiles": await run_in_threadpool(profiles.list)}
+
+@app.get("/debug/profiles/{profile_id}")
+async def download_profile(profile_id: str, kind: str = "python", x_profile_token: Optional[str] = Header(None)):
+    """One profile's collapsed stacks ("python" or "torch", for flamegraph tools) or its "meta" JSON"""
+    check_profile_token(x_profile_token)
+    path = profiles.path(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json" if kind == "meta" else "text/plain",
+                        filename=os.path.basename(path))
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/actions")
+async def action_stats():
+    return actions.stats()
+
+@app.get("/stats/batching")
+async def batching_stats():
+    return scheduler.stats()
+
+@app.get("/stats/cascade")
+async def cascade_stats():
+    return cascade.stats()
+
+@app.get("/stats/cache")
+async def cache_stats():
+    return cache.stats()
+
+@app.get("/stats/fairness")
+async def fairness_stats(top: int = 20):
+    """Slot use and wait times per priority class and for the busiest clients"""
+    return fair.stats(top=max(0, min(top, 1000)))
+
+@app.get("/stats/executor")
+async def executor_stats():
+    return executor.stats()
+
+@app.get("/stats/jobs")
+async def job_stats():
+    return await run_in_threadpool(job_runner.stats)
+
+@app.get("/stats/commands")
+async def command_stats():
+    return catalog.stats()
+
+@app.get("/stats/logging")
+async def log_stats():
+    return logging_stats()
 
 # Stub for future video processing
 @app.post("/process_video")
@@ -27,4 +592,4 @@ async def process_video():
 # Stub for future text processing
 @app.post("/process_text")
 async def process_text():
-    return {"status": "not_implemented", "message": "Text processing not available in MVP"}
\ No newline at end of file
+    return {"status": "not_implemented", "message": "Text processing not available in MVP"}
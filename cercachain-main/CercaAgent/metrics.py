@@ -0,0 +1,65 @@
+"""CercaAgent's metrics, on top of the registry shared with the api app (ml_metrics)"""
+from typing import Dict
+
+from ml_metrics import MetricsRegistry, resident_memory_bytes, timed  # noqa: F401
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "cerca_stage_seconds", "Time spent in each stage of the voice pipeline", ["stage"]
+)
+INTENTS = metrics.counter("cerca_intents_total", "Classified commands by intent", ["intent"])
+OUTCOMES = metrics.counter("cerca_outcomes_total", "Voice requests by outcome", ["outcome"])
+ACTIONS = metrics.counter("cerca_actions_total", "Executed actions by intent and status", ["intent", "status"])
+# 16 KiB to 256 MiB
+UPLOAD_BYTES = metrics.histogram(
+    "cerca_upload_peak_buffered_bytes", "Most upload bytes held in memory at once per request",
+    buckets=[2 ** n for n in range(14, 30, 2)]
+)
+
+CASCADE_SECONDS = metrics.histogram(
+    "cerca_cascade_seconds", "Transcription latency by the cascade tier that answered", ["tier"]
+)
+# received / speech is the silence trimmed away, encoded / speech the padding Whisper still saw
+AUDIO_SECONDS = metrics.counter(
+    "cerca_audio_seconds_total", "Seconds of audio received, left after trimming silence, and encoded", ["stage"]
+)
+
+FAIR_WAIT_SECONDS = metrics.histogram(
+    "cerca_fair_wait_seconds", "Time waited for a transcription slot by priority class", ["priority"]
+)
+
+def observe_pipeline(timings: Dict[str, int]):
+    """Record the batch timings from inference/pipeline.py (nanoseconds) as stages
+
+    The cascade's first tier (inference/cascade.py) is recorded under
+    "fast_"-prefixed stages; escalated clips have both.
+    """
+    for prefix in ("", "fast_"):
+        if f"{prefix}features" not in timings:
+            continue
+        STAGE_SECONDS.observe_ns(timings[f"{prefix}features"], f"{prefix}feature_extraction")
+        generate = timings.get(
+            f"{prefix}generate", timings.get(f"{prefix}encoder", 0) + timings.get(f"{prefix}decoder", 0)
+        )
+        STAGE_SECONDS.observe_ns(generate, f"{prefix}generate")
+        if f"{prefix}classify" in timings:
+            STAGE_SECONDS.observe_ns(timings[f"{prefix}classify"], f"{prefix}classify_intent")
+
+def observe_audio(audio: Dict[str, float]):
+    """Record a clip's received, speech and encoded seconds"""
+    for stage in ("received", "speech", "encoded"):
+        AUDIO_SECONDS.inc(stage, amount=audio[f"{stage}_s"])
+
+def observe_fair_wait(priority: str, seconds: float):
+    """FairScheduler observer"""
+    FAIR_WAIT_SECONDS.observe(seconds, priority)
+
+def observe_cascade(tier: str, nanoseconds: int):
+    """Cascade observer"""
+    CASCADE_SECONDS.observe_ns(nanoseconds, tier)
+
+def observe_action(intent: str, status: str, nanoseconds: int):
+    """ActionEngine observer"""
+    STAGE_SECONDS.observe_ns(nanoseconds, "execute_action")
+    ACTIONS.inc(intent, status)
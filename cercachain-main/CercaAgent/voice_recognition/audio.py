@@ -0,0 +1,11 @@
+"""Entry point to the audio modules shared with ml/audio_recognition"""
+from audio_ingest import (  # noqa: F401
+    TARGET_SAMPLE_RATE,
+    AudioDecodeError,
+    UploadLimitError,
+    check_sample_rate,
+    decode_audio,
+    decode_pcm,
+)
+from upload_ingest import read_upload  # noqa: F401
+from transcription_cache import RedisBackend, TranscriptionCache, make_key  # noqa: F401
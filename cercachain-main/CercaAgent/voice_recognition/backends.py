@@ -0,0 +1,405 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from voice_recognition.decoding import DecodingProfile
+
+SAMPLE_RATE = 16000
+# Whisper's full encoder window
+CHUNK_SECONDS = 30.0
+# Punctuation and the end-of-text token on top of the words of a command
+TOKEN_MARGIN = 4
+
+class TranscriptionBackend:
+    """Interface shared by the Whisper inference backends.
+
+    Every backend takes a batch of 16kHz mono float32 clips and returns one
+    transcript per clip. Heavy imports happen in ``load`` so that selecting a
+    backend never pulls in the others' dependencies.
+
+    When a ``timings`` dict is passed, stage durations in nanoseconds are
+    written into it: "features", then "generate", or "encoder" and "decoder"
+    for backends that run them separately (PyTorch only with ``split_encoder``,
+    as that changes the generate call, or for a short encoder window).
+
+    When a ``logprobs`` list is passed, the average log-probability of each
+    clip's generated tokens is appended to it, a cheap confidence signal for
+    the cascade (see inference/cascade.py). A ``tokens`` list receives the
+    number of text tokens generated per clip.
+
+    ``profile`` selects free-form or command-mode decoding (see
+    voice_recognition/decoding.py); None is free-form.
+
+    An ``encoded`` list receives the seconds of audio the encoder ran on per
+    clip: 30 for the padded window, less with ``encoder_buckets`` on backends
+    whose encoder takes shorter input (``length_buckets``).
+    """
+
+    name = "base"
+    split_encoder = False
+    length_buckets = False
+
+    def __init__(self, model_name: str, intra_op_threads: Optional[int] = None,
+                 inter_op_threads: Optional[int] = None, model_path: Optional[str] = None,
+                 encoder_buckets: Sequence[float] = ()):
+        self.model_name = model_name
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.model_path = model_path
+        self.encoder_buckets = sorted(b for b in encoder_buckets if 0 < b < CHUNK_SECONDS)
+        self.processor = None
+        self.model = None
+        # Generate options of the last decoding profile, keyed by (name, version)
+        self._options: Dict[tuple, Dict[str, Any]] = {}
+
+    def load(self) -> "TranscriptionBackend":
+        raise NotImplementedError
+
+    def transcribe_batch(self, batch: Sequence, timings: Optional[Dict[str, int]] = None,
+                         logprobs: Optional[List[float]] = None, profile: Optional[DecodingProfile] = None,
+                         tokens: Optional[List[int]] = None, encoded: Optional[List[float]] = None) -> List[str]:
+        raise NotImplementedError
+
+    def _load_processor(self):
+        from transformers import WhisperProcessor
+        self.processor = WhisperProcessor.from_pretrained(self.model_name)
+
+    def encoder_seconds(self, batch: Sequence) -> float:
+        """Encoder window for a batch: the smallest bucket its longest clip fits, else the full 30s"""
+        longest = max((len(clip) for clip in batch), default=0) / SAMPLE_RATE
+        return next((bucket for bucket in self.encoder_buckets if longest <= bucket), CHUNK_SECONDS)
+
+    def features(self, batch: Sequence, seconds: float = CHUNK_SECONDS, return_tensors: str = "pt"):
+        """Log-mel features padded to ``seconds`` rather than always to 30s"""
+        if seconds >= CHUNK_SECONDS:
+            return self.processor(list(batch), sampling_rate=SAMPLE_RATE, return_tensors=return_tensors).input_features
+        # 320 samples per encoder position: 160 per mel frame, then the stride-2 convolution
+        return self.processor.feature_extractor(
+            list(batch), sampling_rate=SAMPLE_RATE, return_tensors=return_tensors,
+            padding="max_length", max_length=round(seconds * SAMPLE_RATE / 320) * 320
+        ).input_features
+
+    def token_budget(self, profile: DecodingProfile) -> Optional[int]:
+        """max_new_tokens for a profile: its longest phrasing at the longest word's token count"""
+        if not profile.max_words:
+            return None
+        tokenizer = self.processor.tokenizer
+        per_word = max((len(tokenizer.encode(" " + word, add_special_tokens=False)) for word in profile.vocabulary),
+                       default=2)
+        return profile.max_words * per_word + TOKEN_MARGIN
+
+    def count_tokens(self, sequences) -> List[int]:
+        """Text tokens per generated sequence, leaving out special and padding tokens"""
+        special = set(self.processor.tokenizer.all_special_ids)
+        return [sum(1 for token in sequence if token not in special) for sequence in sequences]
+
+    def generate_options(self, profile: Optional[DecodingProfile]) -> Dict[str, Any]:
+        """Hugging Face generate() keyword arguments for a decoding profile"""
+        if profile is None or profile.name == "free":
+            return {}
+        options = self._cached_options(profile)
+        if profile.is_final is not None:
+            # Holds per-call state, so a fresh one every time
+            options["stopping_criteria"] = command_stopping_criteria(self.processor.tokenizer, profile.is_final)
+        return options
+
+    def _cached_options(self, profile: DecodingProfile) -> Dict[str, Any]:
+        key = (profile.name, profile.version)
+        if key not in self._options:
+            self._options = {key: self._profile_options(profile)}
+        return dict(self._options[key])
+
+    def _profile_options(self, profile: DecodingProfile) -> Dict[str, Any]:
+        tokenizer = self.processor.tokenizer
+        options: Dict[str, Any] = {}
+        # English-only checkpoints reject language and task; they never detect anyway
+        if profile.language and getattr(self.model.generation_config, "is_multilingual", False):
+            options.update(language=profile.language, task="transcribe")
+        budget = self.token_budget(profile)
+        if budget:
+            options["max_new_tokens"] = budget
+        if profile.prompt:
+            options["prompt_ids"] = self.processor.get_prompt_ids(profile.prompt, return_tensors="pt")
+        if profile.bias:
+            options["sequence_bias"] = {
+                tuple(ids): profile.bias
+                for ids in (tokenizer.encode(" " + word, add_special_tokens=False) for word in profile.vocabulary)
+                if ids
+            }
+        return options
+
+def command_stopping_criteria(tokenizer, is_final):
+    """StoppingCriteriaList ending each clip once ``is_final`` accepts its transcript so far"""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class CommandComplete(StoppingCriteria):
+        def __init__(self):
+            self.start = None
+
+        def __call__(self, input_ids, scores, **kwargs):
+            if self.start is None:
+                # Called after every new token, so everything before the first one is prompt
+                self.start = input_ids.shape[1] - 1
+            texts = tokenizer.batch_decode(input_ids[:, self.start:], skip_special_tokens=True)
+            return torch.tensor([is_final(text) for text in texts], dtype=torch.bool, device=input_ids.device)
+
+    return StoppingCriteriaList([CommandComplete()])
+
+def generate(model, input_features, logprobs: Optional[List[float]] = None, **kwargs):
+    """Hugging Face generate(), also appending each sequence's average token log-probability to ``logprobs``"""
+    if logprobs is None:
+        return model.generate(input_features, **kwargs)
+    import torch
+
+    outputs = model.generate(input_features, output_scores=True, return_dict_in_generate=True, **kwargs)
+    # One score tensor per generated step, aligned with the tail of the sequences
+    steps = torch.stack(outputs.scores, dim=1).float().log_softmax(dim=-1)
+    length = min(steps.shape[1], outputs.sequences.shape[1])
+    steps, tokens = steps[:, -length:], outputs.sequences[:, -length:]
+    token_logprobs = steps.gather(-1, tokens.unsqueeze(-1)).squeeze(-1)
+    # Padding after the end of a shorter sequence does not count
+    pad_token_id = model.generation_config.pad_token_id
+    mask = tokens != pad_token_id if pad_token_id is not None else torch.ones_like(tokens, dtype=torch.bool)
+    totals = (token_logprobs * mask).sum(dim=1)
+    logprobs.extend((totals / mask.sum(dim=1).clamp(min=1)).tolist())
+    return outputs.sequences
+
+class TorchBackend(TranscriptionBackend):
+    """Hugging Face Whisper in fp32 on PyTorch"""
+
+    name = "torch"
+    length_buckets = True
+
+    def load(self):
+        import torch
+        from transformers import WhisperForConditionalGeneration
+
+        if self.intra_op_threads:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError as e:
+                # Only allowed once, before any inter-op parallel work has started
+                logging.warning(f"Could not set inter-op threads: {e}")
+        self._load_processor()
+        self.model = self.prepare(WhisperForConditionalGeneration.from_pretrained(self.model_name)).eval()
+        # Short-window encoders by length, see short_encoder
+        self._encoders: Dict[int, Any] = {}
+        return self
+
+    def prepare(self, model):
+        return model
+
+    def short_encoder(self, positions: int):
+        """The encoder for ``positions`` (mel frames / 2) instead of 1500
+
+        A shallow copy sharing every weight; only the positional embedding is
+        cut to the first ``positions`` rows, which is all the shorter input
+        needs. Cached per length.
+        """
+        import copy
+        import torch
+
+        if positions not in self._encoders:
+            encoder = self.model.get_encoder()
+            short = copy.copy(encoder)
+            # Its own submodule table, so replacing the embedding leaves the full encoder alone
+            short._modules = copy.copy(encoder._modules)
+            short.config = copy.copy(encoder.config)
+            short.config.max_source_positions = short.max_source_positions = positions
+            embedding = torch.nn.Embedding(positions, encoder.embed_positions.embedding_dim)
+            embedding.weight = torch.nn.Parameter(encoder.embed_positions.weight.detach()[:positions],
+                                                  requires_grad=False)
+            short.embed_positions = embedding
+            self._encoders[positions] = short
+        return self._encoders[positions]
+
+    def transcribe_batch(self, batch, timings=None, logprobs=None, profile=None, tokens=None, encoded=None):
+        import torch
+
+        started = time.perf_counter_ns()
+        seconds = self.encoder_seconds(batch)
+        input_features = self.features(batch, seconds)
+        options = self.generate_options(profile)
+        features_done = time.perf_counter_ns()
+        with torch.inference_mode():
+            if seconds < CHUNK_SECONDS or (timings is not None and self.split_encoder):
+                # generate() skips the encoder when handed its output
+                encoder = self.model.get_encoder() if seconds >= CHUNK_SECONDS else self.short_encoder(
+                    input_features.shape[-1] // 2
+                )
+                encoder_outputs = encoder(input_features)
+                encoder_done = time.perf_counter_ns()
+                predicted_ids = generate(self.model, input_features, logprobs, encoder_outputs=encoder_outputs,
+                                         **options)
+                if timings is not None:
+                    timings["encoder"] = encoder_done - features_done
+                    timings["decoder"] = time.perf_counter_ns() - encoder_done
+            else:
+                predicted_ids = generate(self.model, input_features, logprobs, **options)
+                if timings is not None:
+                    timings["generate"] = time.perf_counter_ns() - features_done
+        if timings is not None:
+            timings["features"] = features_done - started
+        if tokens is not None:
+            tokens.extend(self.count_tokens(predicted_ids.tolist()))
+        if encoded is not None:
+            encoded.extend([seconds] * len(batch))
+        return self.processor.batch_decode(predicted_ids, skip_special_tokens=True)
+
+class TorchInt8Backend(TorchBackend):
+    """PyTorch with dynamic int8 quantization of every Linear layer"""
+
+    name = "torch-int8"
+
+    def prepare(self, model):
+        import torch
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class OnnxBackend(TranscriptionBackend):
+    """ONNX Runtime encoder/decoder through optimum.
+
+    ``model_path`` points at an exported model directory; without it the
+    model is exported from ``model_name`` at load time.
+    """
+
+    name = "onnx"
+
+    def load(self):
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.intra_op_threads:
+            options.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads:
+            options.inter_op_num_threads = self.inter_op_threads
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+        self._load_processor()
+        self.model = ORTModelForSpeechSeq2Seq.from_pretrained(
+            self.model_path or self.model_name,
+            export=self.model_path is None,
+            session_options=options,
+            provider="CPUExecutionProvider"
+        )
+        return self
+
+    def transcribe_batch(self, batch, timings=None, logprobs=None, profile=None, tokens=None, encoded=None):
+        started = time.perf_counter_ns()
+        input_features = self.features(batch)
+        options = self.generate_options(profile)
+        generate_started = time.perf_counter_ns()
+        predicted_ids = generate(self.model, input_features, logprobs, **options)
+        if timings is not None:
+            timings["features"] = generate_started - started
+            timings["generate"] = time.perf_counter_ns() - generate_started
+        if tokens is not None:
+            tokens.extend(self.count_tokens(predicted_ids.tolist()))
+        if encoded is not None:
+            encoded.extend([CHUNK_SECONDS] * len(batch))
+        return self.processor.batch_decode(predicted_ids, skip_special_tokens=True)
+
+class CTranslate2Backend(TranscriptionBackend):
+    """CTranslate2 int8 Whisper.
+
+    ``model_path`` must point at a model converted with
+    ``ct2-transformers-converter --quantization int8``.
+    """
+
+    name = "ctranslate2"
+
+    def load(self):
+        import ctranslate2
+
+        if not self.model_path:
+            raise ValueError("The ctranslate2 backend needs a converted model path")
+        self._load_processor()
+        self.model = ctranslate2.models.Whisper(
+            self.model_path,
+            device="cpu",
+            compute_type="int8",
+            intra_threads=self.intra_op_threads or 0,
+            inter_threads=self.inter_op_threads or 1
+        )
+        return self
+
+    def generate_options(self, profile):
+        """generate() keyword arguments for a profile; CTranslate2 has no logit bias or stopping callback"""
+        if profile is None or profile.name == "free":
+            return {}
+        return self._cached_options(profile)
+
+    def _profile_options(self, profile):
+        tokenizer = self.processor.tokenizer
+        options: Dict[str, Any] = {}
+        if profile.language and self.model.is_multilingual:
+            options["language"] = f"<|{profile.language}|>"
+        if profile.prompt:
+            options["previous"] = tokenizer.convert_tokens_to_ids(["<|startofprev|>"]) + tokenizer.encode(
+                " " + profile.prompt.strip(), add_special_tokens=False
+            )
+        budget = self.token_budget(profile)
+        if budget:
+            options["max_new_tokens"] = budget
+        return options
+
+    def transcribe_batch(self, batch, timings=None, logprobs=None, profile=None, tokens=None, encoded=None):
+        import ctranslate2
+
+        started = time.perf_counter_ns()
+        input_features = self.features(batch, return_tensors="np")
+        features = ctranslate2.StorageView.from_array(input_features)
+        encoder_started = time.perf_counter_ns()
+        # detect_language() and generate() both accept encoder output in place of features
+        features = self.model.encode(features)
+        decoder_started = time.perf_counter_ns()
+        tokenizer = self.processor.tokenizer
+        options = self.generate_options(profile)
+        if "language" in options:
+            # Forced by the profile, so no detection pass
+            languages = [options["language"]] * len(batch)
+        elif self.model.is_multilingual:
+            languages = [result[0][0] for result in self.model.detect_language(features)]
+        else:
+            languages = [None] * len(batch)
+        previous = options.get("previous", [])
+        prompts = [
+            previous + tokenizer.convert_tokens_to_ids(
+                ["<|startoftranscript|>"] + ([language, "<|transcribe|>"] if language else []) + ["<|notimestamps|>"]
+            )
+            for language in languages
+        ]
+        generate_options = {"return_scores": logprobs is not None}
+        if "max_new_tokens" in options:
+            # max_length covers the prompt too
+            generate_options["max_length"] = len(prompts[0]) + options["max_new_tokens"]
+        results = self.model.generate(features, prompts, **generate_options)
+        if logprobs is not None:
+            # Scores are the sequence log-probability normalized by its length
+            logprobs.extend(result.scores[0] for result in results)
+        if timings is not None:
+            timings["features"] = encoder_started - started
+            timings["encoder"] = decoder_started - encoder_started
+            timings["decoder"] = time.perf_counter_ns() - decoder_started
+        if tokens is not None:
+            tokens.extend(self.count_tokens([result.sequences_ids[0] for result in results]))
+        if encoded is not None:
+            encoded.extend([CHUNK_SECONDS] * len(batch))
+        return tokenizer.batch_decode([result.sequences_ids[0] for result in results], skip_special_tokens=True)
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (TorchBackend, TorchInt8Backend, OnnxBackend, CTranslate2Backend)
+}
+
+def create_backend(name: str, model_name: str, **kwargs) -> TranscriptionBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name} (expected one of {sorted(BACKENDS)})")
+    if kwargs.get("encoder_buckets") and not BACKENDS[name].length_buckets:
+        # ONNX exports and CTranslate2 fix the encoder input at 3000 mel frames
+        logging.warning(f"The {name} backend always encodes {CHUNK_SECONDS:g}s windows; ignoring encoder buckets")
+        kwargs["encoder_buckets"] = ()
+    return BACKENDS[name](model_name, **kwargs)
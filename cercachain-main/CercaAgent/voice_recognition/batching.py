@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from logging_config import correlation_id, run_with_correlation_id
+
+class BatchScheduler:
+    """Collects concurrent transcription requests into micro-batches.
+
+    Requests are queued on an asyncio queue. A single worker task takes up to
+    ``max_batch_size`` items, waiting at most ``max_wait_ms`` after the first
+    one arrives, and hands them to ``batch_fn`` in one call on ``executor``
+    (the loop's default thread pool when not given). Up to
+    ``max_concurrent_batches`` batches run at once, so a pool with several
+    workers is kept busy; pass the pool's worker count.
+    """
+
+    def __init__(self, batch_fn: Callable[[Sequence[Any]], List[Any]],
+                 max_batch_size: int = 8, max_wait_ms: float = 20.0,
+                 executor: Optional[Executor] = None, max_concurrent_batches: int = 1):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._queue = None
+        self._worker = None
+        self._slots = None
+        self._collecting: List[tuple] = []
+        self._running: Dict[asyncio.Task, List[tuple]] = {}
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "queue_wait_total_ms": 0.0,
+            "queue_wait_max_ms": 0.0,
+            "batch_sizes": {},
+        }
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        # Callers still queued or in a running batch fail rather than wait forever
+        stopped = RuntimeError("Batch scheduler stopped")
+        self._fail(self._collecting, stopped)
+        while self._queue is not None and not self._queue.empty():
+            self._fail([self._queue.get_nowait()], stopped)
+        # A task cancelled before its first step never reaches its own handler
+        running = dict(self._running)
+        for task, batch in running.items():
+            task.cancel()
+            self._fail(batch, stopped)
+        await asyncio.gather(*running, return_exceptions=True)
+
+    async def submit(self, item: Any) -> Tuple[Any, Dict[str, Any]]:
+        """Queue one item and wait for its result.
+
+        Returns:
+            Tuple of the result and per-request metrics (queue wait, batch size)
+        """
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter(), correlation_id.get()))
+        return await future
+
+    async def _collect(self) -> List[tuple]:
+        batch = self._collecting = []
+        batch.append(await self._queue.get())
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            # Waiting for a free slot first lets the next batch fill up meanwhile
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+                self._collecting = []
+            except BaseException:
+                self._slots.release()
+                raise
+            # Callers that gave up while queued are dropped from the batch
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._running[task] = batch
+            task.add_done_callback(lambda done: self._running.pop(done, None))
+
+    async def _dispatch(self, batch: List[tuple]):
+        loop = asyncio.get_running_loop()
+        try:
+            started = time.perf_counter()
+            waits = [(started - queued_at) * 1000 for _, _, queued_at, _ in batch]
+            self._record(len(batch), waits)
+            # The batch runs under every contributing request's correlation ID
+            cids = ",".join(cid for _, _, _, cid in batch)
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, run_with_correlation_id, cids, self.batch_fn, [item for item, _, _, _ in batch]
+                )
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                logging.error(f"Batch of {len(batch)} failed: {e}", extra={"correlation_ids": cids})
+                self._stats["errors"] += 1
+                self._fail(batch, e)
+                return
+            except asyncio.CancelledError:
+                self._fail(batch, RuntimeError("Batch scheduler stopped"))
+                raise
+
+            for (_, future, _, _), result, wait in zip(batch, results, waits):
+                if not future.done():
+                    future.set_result((result, {"queue_wait_ms": round(wait, 3), "batch_size": len(batch)}))
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _fail(batch: List[tuple], error: BaseException):
+        for _, future, _, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _record(self, size: int, waits: List[float]):
+        stats = self._stats
+        stats["requests"] += size
+        stats["batches"] += 1
+        stats["queue_wait_total_ms"] += sum(waits)
+        stats["queue_wait_max_ms"] = max(stats["queue_wait_max_ms"], max(waits))
+        stats["batch_sizes"][size] = stats["batch_sizes"].get(size, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._stats
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "running_batches": len(self._running),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "requests": stats["requests"],
+            "batches": stats["batches"],
+            "errors": stats["errors"],
+            "avg_batch_size": stats["requests"] / stats["batches"] if stats["batches"] else 0.0,
+            "avg_queue_wait_ms": stats["queue_wait_total_ms"] / stats["requests"] if stats["requests"] else 0.0,
+            "max_queue_wait_ms": stats["queue_wait_max_ms"],
+            "batch_sizes": dict(sorted(stats["batch_sizes"].items())),
+        }
@@ -1,5 +1,21 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+import logging
+import os
+import re
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from config import settings
+
+if __name__ == "__main__":
+    # Retraining runs on its own, without main.py putting the shared modules on the path
+    sys.path.append(os.path.abspath(settings.ml_path))
+
+from command_mapping.action_map import catalog
+from inference.registry import registry
+
+# Bump whenever the training data or features change so stale artifacts are retrained
+MODEL_VERSION = 1
+CONFIDENCE_THRESHOLD = 0.5
 
 # Training data (hardcoded for MVP)
 commands = [
@@ -13,16 +29,116 @@ commands = [
     ("pause music", "stop_music"),
     ("hello there", "unknown")
 ]
-texts, intents = zip(*commands)
 
-# Train classifier
-vectorizer = TfidfVectorizer()
-X = vectorizer.fit_transform(texts)
-clf = LogisticRegression()
-clf.fit(X, intents)
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("Turn on the lights!" -> "turn on the lights")"""
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", text.lower())).strip()
+
+def train_classifier() -> Dict:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    texts, intents = zip(*commands)
+    vectorizer = TfidfVectorizer()
+    X = vectorizer.fit_transform(texts)
+    clf = LogisticRegression()
+    clf.fit(X, intents)
+    return {
+        "version": MODEL_VERSION,
+        "trained_at": datetime.utcnow().isoformat(),
+        "vectorizer": vectorizer,
+        "clf": clf,
+        # Known phrases skip the model entirely
+        "phrases": {normalize(text): intent for text, intent in commands},
+    }
+
+def save_model(model: Dict, path: str):
+    import joblib
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+
+def load_model(path: Optional[str] = None) -> Dict:
+    """Load the persisted artifact, retraining and saving it when missing or stale"""
+    import joblib
+
+    path = path or settings.intent_model_path
+    if os.path.exists(path):
+        try:
+            model = joblib.load(path)
+            if model.get("version") == MODEL_VERSION:
+                return model
+            logging.info(f"Intent model at {path} is version {model.get('version')}, retraining")
+        except Exception as e:
+            logging.warning(f"Could not load intent model from {path}: {e}")
+    model = train_classifier()
+    try:
+        save_model(model, path)
+    except OSError as e:
+        logging.warning(f"Could not save intent model to {path}: {e}")
+    return model
+
+registry.register("intent", load_model)
+
+def score_batch(texts: Sequence[str]) -> List[Tuple[str, float]]:
+    """(intent, confidence) per text: phrase table first, then one vectorized model pass"""
+    model = registry.get("intent")
+    phrases = model["phrases"]
+    scores: List[Tuple[str, float]] = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
+        intent = phrases.get(normalize(text))
+        if intent is not None:
+            scores[i] = (intent, 1.0)
+        else:
+            pending.append(i)
+
+    if pending:
+        clf = model["clf"]
+        probabilities = clf.predict_proba(model["vectorizer"].transform([texts[i] for i in pending]))
+        best = probabilities.argmax(axis=1)
+        for row, i in enumerate(pending):
+            scores[i] = (str(clf.classes_[best[row]]), float(probabilities[row, best[row]]))
+    return scores
+
+def classify_batch(texts: Sequence[str]) -> List[str]:
+    return [intent if confidence > CONFIDENCE_THRESHOLD else "unknown" for intent, confidence in score_batch(texts)]
 
 def classify_intent(text: str) -> str:
-    X_test = vectorizer.transform([text])
-    intent = clf.predict(X_test)[0]
-    confidence = clf.predict_proba(X_test).max()
-    return intent if confidence > 0.5 else "unknown"
\ No newline at end of file
+    return classify_batch([text])[0]
+
+def score_commands(texts: Sequence[str]) -> List[Tuple[str, Dict[str, Any], float]]:
+    """(intent, arguments, confidence) per text: the command catalog first, the classifier for the rest
+
+    Catalog matches are exact and count as fully confident.
+    """
+    current = catalog.current()
+    parsed: List[Tuple[str, Dict[str, Any], float]] = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
+        match = current.match(text)
+        if match is not None:
+            parsed[i] = (*match, 1.0)
+        else:
+            pending.append(i)
+    if pending:
+        for i, (intent, confidence) in zip(pending, score_batch([texts[i] for i in pending])):
+            parsed[i] = (intent if confidence > CONFIDENCE_THRESHOLD else "unknown", {}, confidence)
+    return parsed
+
+def parse_batch(texts: Sequence[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(intent, arguments) per text: the command catalog first, the classifier for the rest"""
+    return [(intent, args) for intent, args, _ in score_commands(texts)]
+
+def parse_command(text: str) -> Tuple[str, Dict[str, Any]]:
+    return parse_batch([text])[0]
+
+if __name__ == "__main__":
+    # Retrain and persist the artifact: python -m voice_recognition.classify
+    save_model(train_classifier(), settings.intent_model_path)
+    print(f"Saved intent model v{MODEL_VERSION} to {settings.intent_model_path}")
@@ -0,0 +1,50 @@
+"""Decoding profiles for Whisper's generate call.
+
+"free" keeps the model's defaults: language detection on multilingual
+models and outputs up to the full 448 tokens. "command" is built from the
+command catalog for short voice commands. It forces the language and task,
+so there is no detection pass. max_new_tokens comes from the longest
+catalog phrasing. An initial prompt and a logit bias favour the catalog's
+words, and decoding stops once the transcript can only be one command.
+
+Backends turn a profile into their own generate options
+(voice_recognition/backends.py); options a backend cannot express are skipped.
+"""
+from typing import Callable, List, Optional
+
+class DecodingProfile:
+    """Generate options independent of the backend and its tokenizer"""
+
+    def __init__(self, name: str = "free", language: Optional[str] = None, max_words: Optional[int] = None,
+                 vocabulary: Optional[List[str]] = None, prompt: Optional[str] = None, bias: float = 0.0,
+                 is_final: Optional[Callable[[str], bool]] = None, version: object = None):
+        self.name = name
+        self.language = language
+        # Longest expected transcript in words; backends turn it into a token budget
+        # using the longest vocabulary word
+        self.max_words = max_words
+        self.vocabulary = vocabulary or []
+        self.prompt = prompt
+        # Added to the logits of every vocabulary word; 0 disables the bias
+        self.bias = bias
+        # Called with the transcript so far; True ends that clip's decoding
+        self.is_final = is_final
+        # Backends cache their converted options per (name, version)
+        self.version = version
+
+FREE = DecodingProfile()
+
+def command_profile(catalog, language: Optional[str] = "en", prompt_words: int = 40, bias: float = 2.0,
+                    stop_early: bool = True) -> DecodingProfile:
+    """Profile for a compiled CommandCatalog (command_mapping/catalog.py)"""
+    vocabulary = catalog.vocabulary()
+    return DecodingProfile(
+        "command",
+        language=language,
+        max_words=catalog.max_words,
+        vocabulary=vocabulary,
+        prompt=", ".join(vocabulary[:prompt_words]) if prompt_words else None,
+        bias=bias,
+        is_final=catalog.is_final if stop_early else None,
+        version=catalog.loaded_at,
+    )
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+import numpy as np
+from typing import Any, Awaitable, Callable, Dict, Optional
+from voice_recognition.vad import EnergyVAD
+
+SAMPLE_RATE = 16000
+
+class StreamingSession:
+    """Incremental transcription of one audio stream.
+
+    Chunks of 16kHz mono float32 audio are fed to an ``EnergyVAD``. While an
+    utterance is open, the last ``window_s`` seconds are re-decoded every
+    ``partial_interval_ms`` of new audio and sent as a partial transcript
+    (at most one partial decode runs at a time). When the VAD closes the
+    utterance, the whole utterance is decoded and handed to ``on_final``.
+    """
+
+    def __init__(self, transcribe: Callable[[np.ndarray], Awaitable[str]],
+                 send: Callable[[Dict[str, Any]], Awaitable[None]],
+                 on_final: Callable[[str], Awaitable[Dict[str, Any]]],
+                 vad: Optional[EnergyVAD] = None,
+                 partial_interval_ms: int = 600, window_s: float = 8.0):
+        self.transcribe = transcribe
+        self.send = send
+        self.on_final = on_final
+        self.vad = vad or EnergyVAD(sample_rate=SAMPLE_RATE)
+        self.partial_interval = SAMPLE_RATE * partial_interval_ms // 1000
+        self.window = int(SAMPLE_RATE * window_s)
+        self.utterances = 0
+        self._since_partial = 0
+        self._partial_task: Optional[asyncio.Task] = None
+
+    async def feed(self, samples: np.ndarray):
+        for event, utterance in self.vad.feed(samples):
+            if event == "start":
+                self._since_partial = 0
+                await self.send({"type": "speech_start", "utterance": self.utterances})
+            else:
+                await self._finalize(utterance)
+
+        if self.vad.in_speech:
+            self._since_partial += len(samples)
+            if self._since_partial >= self.partial_interval and not self._partial_running():
+                self._since_partial = 0
+                self._partial_task = asyncio.create_task(self._partial(self.utterances))
+
+    async def close(self):
+        utterance = self.vad.flush()
+        if utterance is not None:
+            await self._finalize(utterance)
+        self._cancel_partial()
+
+    def abort(self):
+        """Drop any in-flight partial decode when the client goes away"""
+        self._cancel_partial()
+
+    def _partial_running(self) -> bool:
+        return self._partial_task is not None and not self._partial_task.done()
+
+    def _cancel_partial(self):
+        if self._partial_running():
+            self._partial_task.cancel()
+
+    async def _partial(self, utterance_id: int):
+        window = self.vad.current()[-self.window:]
+        if not len(window):
+            return
+        try:
+            text = await self.transcribe(window)
+        except Exception as e:
+            logging.warning(f"Partial decode failed: {e}")
+            return
+        # Drop partials that finished after their utterance was finalized
+        if utterance_id == self.utterances and self.vad.in_speech:
+            await self.send({"type": "partial", "utterance": utterance_id, "text": text})
+
+    async def _finalize(self, utterance: np.ndarray):
+        self._cancel_partial()
+        utterance_id = self.utterances
+        self.utterances += 1
+        ended_at = time.perf_counter()
+        text = await self.transcribe(utterance)
+        decoded_at = time.perf_counter()
+        result = await self.on_final(text)
+        await self.send({
+            "type": "final",
+            "utterance": utterance_id,
+            "text": text,
+            "audio_seconds": round(len(utterance) / SAMPLE_RATE, 3),
+            "decode_ms": round((decoded_at - ended_at) * 1000, 3),
+            "endpoint_to_intent_ms": round((time.perf_counter() - ended_at) * 1000, 3),
+            **result
+        })
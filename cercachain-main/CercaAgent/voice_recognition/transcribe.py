@@ -1,18 +1,94 @@
-from transformers import WhisperProcessor, WhisperForConditionalGeneration
-from pydub import AudioSegment
-import io
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import settings
+from api.errors import NoSpeechError
+from command_mapping.action_map import catalog
+from inference.registry import registry
+from voice_recognition.audio import decode_audio
+from voice_recognition.backends import SAMPLE_RATE, create_backend
+from voice_recognition.decoding import FREE, DecodingProfile, command_profile
+from voice_recognition.vad import speech_bounds
 
-processor = WhisperProcessor.from_pretrained("openai/whisper-small")
-model = WhisperForConditionalGeneration.from_pretrained("openai/whisper-small")
+MODEL_NAME = f"openai/whisper-{settings.whisper_size}"
+FAST_MODEL_NAME = f"openai/whisper-{settings.cascade_fast_size}"
+
+def load_whisper():
+    return create_backend(
+        settings.whisper_backend,
+        MODEL_NAME,
+        intra_op_threads=settings.intra_op_threads,
+        inter_op_threads=settings.inter_op_threads,
+        model_path=settings.whisper_model_path,
+        encoder_buckets=settings.encoder_buckets_s
+    ).load()
+
+def load_fast_whisper():
+    return create_backend(
+        settings.whisper_backend,
+        FAST_MODEL_NAME,
+        intra_op_threads=settings.intra_op_threads,
+        inter_op_threads=settings.inter_op_threads,
+        model_path=settings.cascade_fast_model_path,
+        encoder_buckets=settings.encoder_buckets_s
+    ).load()
+
+registry.register("whisper", load_whisper)
+if settings.cascade_enabled:
+    registry.register("whisper_fast", load_fast_whisper)
+
+_profile = FREE
+
+def decoding_profile() -> DecodingProfile:
+    """The configured decoding profile; in command mode it follows catalog reloads"""
+    global _profile
+    if settings.decoding_mode == "free":
+        return FREE
+    if settings.decoding_mode != "command":
+        raise ValueError(f"Unknown decoding mode: {settings.decoding_mode} (expected free or command)")
+    current = catalog.current()
+    if _profile.version != current.loaded_at:
+        _profile = command_profile(
+            current,
+            language=settings.decoding_language,
+            prompt_words=settings.command_prompt_words,
+            bias=settings.command_logit_bias,
+            stop_early=settings.command_stop_early
+        )
+    return _profile
+
+def load_samples(audio_data: bytes):
+    # Whisper expects 16kHz mono float32 in [-1, 1]
+    return decode_audio(audio_data, max_duration_s=settings.max_audio_duration_s)
+
+def load_command(audio_data: bytes) -> Tuple[Sequence, float]:
+    """Decode a command clip and cut its leading and trailing silence
+
+    Returns the samples to transcribe and the seconds of audio received.
+    Raises NoSpeechError for a clip with no speech when reject_silence is set.
+    """
+    samples = load_samples(audio_data)
+    received = len(samples) / SAMPLE_RATE
+    if not (settings.trim_silence or settings.reject_silence):
+        return samples, received
+    bounds = speech_bounds(samples, SAMPLE_RATE, settings.vad_frame_ms, settings.trim_threshold_db,
+                           settings.trim_padding_ms)
+    if bounds is None:
+        if settings.reject_silence:
+            raise NoSpeechError(f"No speech in {received:.2f}s of audio")
+        return samples, received
+    return (samples[bounds[0]:bounds[1]] if settings.trim_silence else samples), received
+
+def transcribe_batch(batch: Sequence, timings: Optional[Dict[str, int]] = None,
+                     tokens: Optional[List[int]] = None, encoded: Optional[List[float]] = None) -> List[str]:
+    # The processor pads every clip to the same window (30s, or the batch's
+    # encoder bucket), so the whole batch goes through a single generate call
+    return registry.get("whisper").transcribe_batch(batch, timings, profile=decoding_profile(), tokens=tokens,
+                                                    encoded=encoded)
+
+def transcribe_fast_batch(batch: Sequence, timings: Optional[Dict[str, int]] = None,
+                          logprobs: Optional[List[float]] = None, encoded: Optional[List[float]] = None) -> List[str]:
+    """The cascade's first tier; ``logprobs`` receives each transcript's average token log-probability"""
+    return registry.get("whisper_fast").transcribe_batch(batch, timings, logprobs, profile=decoding_profile(),
+                                                         encoded=encoded)
 
 def transcribe_audio(audio_data: bytes) -> str:
-    # Convert audio to WAV if needed
-    audio = AudioSegment.from_file(io.BytesIO(audio_data))
-    audio = audio.set_frame_rate(16000).set_channels(1)  # Whisper expects 16kHz mono
-    audio.export("temp.wav", format="wav")
-
-    # Process audio
-    input_features = processor(audio.get_array_of_samples(), sampling_rate=16000, return_tensors="pt").input_features
-    predicted_ids = model.generate(input_features)
-    transcription = processor.batch_decode(predicted_ids, skip_special_tokens=True)[0]
-    return transcription
\ No newline at end of file
+    return transcribe_batch([load_command(audio_data)[0]])[0]
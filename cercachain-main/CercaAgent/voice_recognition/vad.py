@@ -0,0 +1,105 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+def speech_bounds(samples: np.ndarray, sample_rate: int = 16000, frame_ms: int = 30, threshold_db: float = -45.0,
+                  padding_ms: int = 200) -> Optional[Tuple[int, int]]:
+    """Sample range from the first to the last frame louder than ``threshold_db``, widened by ``padding_ms``
+
+    Frame energies are computed in one vectorized pass and compared in the
+    power domain, so there is no log per frame. Returns None when no frame
+    is loud enough, i.e. the clip is silence.
+    """
+    frame_size = max(1, sample_rate * frame_ms // 1000)
+    n_frames = len(samples) // frame_size
+    frames = samples[:n_frames * frame_size].reshape(n_frames, frame_size)
+    power = np.mean(np.square(frames, dtype=np.float32), axis=1)
+    tail = samples[n_frames * frame_size:]
+    if len(tail):
+        power = np.append(power, np.mean(np.square(tail, dtype=np.float32)))
+    voiced = np.flatnonzero(power > 10 ** (threshold_db / 10))
+    if not len(voiced):
+        return None
+    padding = sample_rate * padding_ms // 1000
+    return max(0, int(voiced[0]) * frame_size - padding), min(len(samples), (int(voiced[-1]) + 1) * frame_size + padding)
+
+class EnergyVAD:
+    """Energy-based voice activity detector that splits a stream into utterances.
+
+    Audio is cut into fixed frames and each frame's RMS level (dBFS) is
+    compared to ``threshold_db``. An utterance starts after ``start_ms`` of
+    consecutive speech frames (keeping ``preroll_ms`` of audio before it) and
+    ends after ``hangover_ms`` of silence or once it reaches ``max_utterance_s``.
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 30, threshold_db: float = -45.0,
+                 start_ms: int = 90, hangover_ms: int = 600, preroll_ms: int = 300,
+                 max_utterance_s: float = 20.0):
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.threshold_db = threshold_db
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.preroll_frames = preroll_ms // frame_ms
+        self.max_frames = int(max_utterance_s * 1000 // frame_ms)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll: List[np.ndarray] = []
+        self._frames: List[np.ndarray] = []
+        self._speech_run = 0
+        self._silence_run = 0
+        self.in_speech = False
+
+    def frame_levels(self, frames: np.ndarray) -> np.ndarray:
+        """RMS level in dBFS for each row of a (n_frames, frame_size) array"""
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        return 20 * np.log10(np.maximum(rms, 1e-10))
+
+    def feed(self, samples: np.ndarray) -> List[Tuple[str, Optional[np.ndarray]]]:
+        """Consume float32 samples and return ("start", None) / ("end", utterance) events"""
+        samples = np.concatenate([self._pending, samples]) if len(self._pending) else samples
+        n_frames = len(samples) // self.frame_size
+        self._pending = samples[n_frames * self.frame_size:]
+        if not n_frames:
+            return []
+
+        frames = samples[:n_frames * self.frame_size].reshape(n_frames, self.frame_size)
+        voiced = self.frame_levels(frames) > self.threshold_db
+        events = []
+        for frame, is_speech in zip(frames, voiced):
+            if not self.in_speech:
+                self._preroll.append(frame)
+                self._speech_run = self._speech_run + 1 if is_speech else 0
+                if self._speech_run >= self.start_frames:
+                    self.in_speech = True
+                    self._frames = self._preroll[-(self.preroll_frames + self.start_frames):]
+                    self._preroll = []
+                    self._silence_run = 0
+                    events.append(("start", None))
+                else:
+                    del self._preroll[:-(self.preroll_frames + self.start_frames)]
+                continue
+
+            self._frames.append(frame)
+            self._silence_run = 0 if is_speech else self._silence_run + 1
+            if self._silence_run >= self.hangover_frames or len(self._frames) >= self.max_frames:
+                events.append(("end", self._finish()))
+        return events
+
+    def current(self) -> np.ndarray:
+        """Audio of the utterance in progress"""
+        if not self._frames:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(self._frames)
+
+    def flush(self) -> Optional[np.ndarray]:
+        """End the stream, returning the open utterance if there is one"""
+        self._pending = np.zeros(0, dtype=np.float32)
+        return self._finish() if self.in_speech else None
+
+    def _finish(self) -> np.ndarray:
+        # Trailing silence past the first hangover frame adds nothing to decode
+        keep = len(self._frames) - max(0, self._silence_run - 1)
+        utterance = np.concatenate(self._frames[:keep])
+        self._frames = []
+        self._speech_run = 0
+        self._silence_run = 0
+        self.in_speech = False
+        return utterance
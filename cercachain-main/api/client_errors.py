@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+class ClientErrorLimitError(Exception):
+    """Raised when a client error batch is too large to accept"""
+    def __init__(self, message="Client error batch is too large"):
+        self.message = message
+        super().__init__(self.message)
+
+# Only this much of each report is fingerprinted; the rest cannot tell errors apart
+MAX_MESSAGE_CHARS = 1000
+MAX_STACK_FRAMES = 8
+
+_URL = re.compile(r"\b[a-z][a-z0-9+.-]*://[^\s/]+")
+_UUID = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE)
+# Hex IDs and addresses: 0x-prefixed, or 8+ hex digits including a digit
+_HEX = re.compile(r"\b(?:0x[0-9a-f]+|(?=[0-9a-f]*\d)[0-9a-f]{8,})\b", re.IGNORECASE)
+_NUMBER = re.compile(r"\d+")
+_QUERY = re.compile(r"\?[^\s):]*")
+# Content hashes in bundle names change with every deploy: main.3f2a91c4.js
+_BUNDLE_HASH = re.compile(r"[.-][0-9a-f]{6,}(?=\.[a-z]+\b)", re.IGNORECASE)
+_POSITION = re.compile(r"(:\d+)+(?=\)?\s*$)")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_message(message: str) -> str:
+    """Strip what varies between occurrences of one error: URLs' hosts, IDs and numbers"""
+    message = _URL.sub("<url>", message[:MAX_MESSAGE_CHARS])
+    message = _UUID.sub("<uuid>", message)
+    message = _HEX.sub("<hex>", message)
+    message = _NUMBER.sub("<n>", message)
+    return _WHITESPACE.sub(" ", message).strip()
+
+def normalize_stack(stack: Optional[str]) -> List[str]:
+    """The top frames without hosts, query strings, bundle hashes or line numbers"""
+    frames = []
+    for line in (stack or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        line = _POSITION.sub("", _BUNDLE_HASH.sub("", _QUERY.sub("", _URL.sub("", line))))
+        frames.append(line)
+        if len(frames) == MAX_STACK_FRAMES:
+            break
+    return frames
+
+def fingerprint(message: str, stack: Optional[str] = None) -> str:
+    """Stable ID for one kind of error, equal across browsers, users and deploys"""
+    key = "\n".join([normalize_message(message)] + normalize_stack(stack))
+    return hashlib.sha1(key.encode("utf-8", "replace")).hexdigest()[:16]
+
+async def read_body(chunks: AsyncIterator[bytes], encoding: Optional[str], max_bytes: int) -> bytes:
+    """Read a request body of at most ``max_bytes``, gunzipping it when ``encoding`` is gzip
+
+    The limit applies both to the bytes received and to the decompressed
+    body, so a small gzip bomb is refused as early as a large upload.
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding not in ("identity", "gzip"):
+        raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if encoding == "gzip" else None
+    body = bytearray()
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise ClientErrorLimitError(f"Body is over the {max_bytes} byte limit")
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk, max_bytes + 1 - len(body))
+            if decompressor.unconsumed_tail:
+                raise ClientErrorLimitError(f"Decompressed body is over the {max_bytes} byte limit")
+        body += chunk
+        if len(body) > max_bytes:
+            raise ClientErrorLimitError(f"Body is over the {max_bytes} byte limit")
+    if decompressor is not None:
+        try:
+            body += decompressor.flush()
+        except zlib.error as e:
+            raise ValueError(f"Invalid gzip body: {e}")
+        if not decompressor.eof:
+            raise ValueError("Truncated gzip body")
+    return bytes(body)
+
+class ClientRateLimiter:
+    """Token bucket per client, so one broken browser cannot crowd out the rest
+
+    Only the ``max_clients`` most recently seen clients keep a bucket; a
+    forgotten client starts again with a full burst.
+    """
+
+    def __init__(self, rate: float = 5.0, burst: int = 100, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.limited = 0
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def take(self, client: str, count: int) -> int:
+        """Take up to ``count`` tokens for ``client``; returns how many it got"""
+        now = time.monotonic()
+        bucket = self._buckets.pop(client, None)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        granted = min(count, int(tokens))
+        bucket[:] = [tokens - granted, now]
+        self._buckets[client] = bucket
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        self.limited += count - granted
+        return granted
+
+    def retry_after(self) -> int:
+        """Seconds until an empty bucket holds a token again"""
+        return max(1, math.ceil(1 / self.rate)) if self.rate > 0 else 60
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rate": self.rate, "burst": self.burst, "clients": len(self._buckets), "limited": self.limited}
+
+class ErrorAggregator:
+    """Counts client errors per fingerprint and logs one summary per fingerprint per window.
+
+    Reports are grouped by ``fingerprint(message, stack)``. Each group keeps
+    the first message and stack it saw as its sample, a total count and the
+    count for the current window. ``flush()`` writes one log record for every
+    group that saw errors since the last flush. The ``max_fingerprints`` most
+    recently seen groups are remembered for ``top()``. Every API worker
+    process aggregates its own reports.
+    """
+
+    def __init__(self, logger: logging.Logger, window_s: float = 60.0, max_fingerprints: int = 1000,
+                 max_window_clients: int = 1000):
+        self.logger = logger
+        self.window_s = window_s
+        self.max_fingerprints = max_fingerprints
+        self.max_window_clients = max_window_clients
+        self.groups: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.received = 0
+        self.flushed = 0
+        self.evicted = 0
+        self._pending = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, message: str, stack: Optional[str] = None, context: Optional[Dict[str, Any]] = None,
+            timestamp: Optional[str] = None, client: str = "-") -> str:
+        """Count one report and return its fingerprint"""
+        key = fingerprint(message, stack)
+        now = time.time()
+        group = self.groups.pop(key, None)
+        if group is None:
+            group = {
+                "fingerprint": key,
+                "message": message[:MAX_MESSAGE_CHARS],
+                "stack": stack,
+                "context": context or {},
+                "count": 0,
+                "window_count": 0,
+                "window_clients": set(),
+                "first_seen": now,
+                "last_seen": now,
+                "client_timestamp": timestamp,
+            }
+        group["count"] += 1
+        group["window_count"] += 1
+        group["last_seen"] = now
+        group["client_timestamp"] = timestamp
+        if len(group["window_clients"]) < self.max_window_clients:
+            group["window_clients"].add(client)
+        # Most recently seen last, so eviction drops the stalest group
+        self.groups[key] = group
+        self._pending.add(key)
+        self.received += 1
+        while len(self.groups) > self.max_fingerprints:
+            stale, _ = self.groups.popitem(last=False)
+            self._pending.discard(stale)
+            self.evicted += 1
+        return key
+
+    def flush(self) -> int:
+        """Log a summary of every fingerprint seen this window; returns how many were written"""
+        written = 0
+        for key in self._pending:
+            group = self.groups.get(key)
+            if group is None or not group["window_count"]:
+                continue
+            self.logger.error(
+                f"Client error x{group['window_count']}: {group['message']}",
+                extra={
+                    "fingerprint": key,
+                    "count": group["window_count"],
+                    "total_count": group["count"],
+                    "clients": len(group["window_clients"]),
+                    "window_s": self.window_s,
+                    "timestamp": group["client_timestamp"],
+                    "stack": group["stack"],
+                    "context": group["context"],
+                }
+            )
+            group["window_count"] = 0
+            group["window_clients"] = set()
+            written += 1
+        self._pending = set()
+        self.flushed += written
+        return written
+
+    def top(self, n: int = 10) -> List[Dict[str, Any]]:
+        """The ``n`` fingerprints with the most reports, busiest first"""
+        groups = sorted(self.groups.values(), key=lambda g: g["count"], reverse=True)[:n]
+        return [
+            {
+                "fingerprint": g["fingerprint"],
+                "message": g["message"],
+                "stack": g["stack"],
+                "count": g["count"],
+                "window_count": g["window_count"],
+                "window_clients": len(g["window_clients"]),
+                "first_seen": g["first_seen"],
+                "last_seen": g["last_seen"],
+            }
+            for g in groups
+        ]
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.window_s)
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Client error flush failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_s": self.window_s,
+            "received": self.received,
+            "fingerprints": len(self.groups),
+            "pending": len(self._pending),
+            "summaries_written": self.flushed,
+            "evicted": self.evicted,
+        }
@@ -1,5 +1,6 @@
+import os
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class Settings(BaseModel):
     debug: bool = False
@@ -7,5 +8,47 @@ class Settings(BaseModel):
     port: int = 8000
     cors_origins: List[str] = ["http://localhost:3000"]
     log_level: str = "INFO"
+    # Queue-based JSON-lines logging (see logging_config.py)
+    environment: str = "development"  # selects logs/<environment>.log and the file log level
+    log_queue_size: int = 10000  # records beyond this are dropped rather than blocking requests
+    client_error_log_rate: float = 10.0  # client error summary records per second, token bucket
+    client_error_log_burst: int = 50
+    client_error_log_sample_rate: float = 1.0  # fraction of client error summary records kept
+    # Client error ingestion on /log-error and /log-errors (see client_errors.py)
+    client_error_window_s: float = 60.0  # one summary record per error fingerprint per window
+    client_error_max_fingerprints: int = 1000  # most recently seen, kept for /log-errors/top
+    client_error_client_rate: float = 5.0  # reports per second per client address, token bucket
+    client_error_client_burst: int = 100
+    client_error_max_batch: int = 100  # reports per /log-errors request
+    client_error_max_body_bytes: int = 1024 * 1024  # received, and again after gzip decompression
+    # Speech recognition engine (see speech.py)
+    speech_engine: str = "whisper"  # whisper, deepspeech or google (network, not for air-gapped hosts)
+    speech_fallback: Optional[str] = None  # engine to retry with when the main one fails, e.g. "google"
+    whisper_model: str = "tiny.en"
+    whisper_backend: str = "torch"  # torch (openai-whisper) or ctranslate2 (faster-whisper)
+    deepspeech_model_path: Optional[str] = None  # .pbmm file
+    deepspeech_scorer_path: Optional[str] = None  # .scorer file, enables the language model
+    deepspeech_pool_size: Optional[int] = None  # models per worker; defaults to 1 for process executors, else the CPU count
+    short_command_engine: Optional[str] = None  # e.g. "deepspeech": low-latency engine for short clips
+    short_command_max_s: float = 4.0  # WAV uploads up to this long go to short_command_engine
+    cpu_threads: Optional[int] = None  # per worker; defaults to the library's choice
+    ml_path: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ml", "audio_recognition")
+    # Chunked upload ingestion (see ml/audio_recognition/upload_ingest.py); over-limit uploads get a 413
+    upload_chunk_bytes: int = 64 * 1024
+    max_upload_bytes: int = 25 * 1024 * 1024
+    max_audio_duration_s: Optional[float] = 300.0  # /process-audio; None disables the check
+    longform_max_upload_bytes: int = 256 * 1024 * 1024
+    longform_max_duration_s: Optional[float] = 2 * 3600.0
+    # Long-form transcription on /process-audio/long (see ml/audio_recognition/longform.py)
+    longform_window_s: float = 28.0  # owned audio per window; plus overlap must stay within 30s for Whisper
+    longform_overlap_s: float = 1.0
+    longform_max_parallel: Optional[int] = None  # windows in flight per recording; defaults to executor_workers
+    # Off-event-loop execution of speech recognition (see executor.py)
+    executor_kind: str = "process"  # process, thread or inline
+    executor_workers: Optional[int] = None  # defaults to the CPU count
+    max_in_flight: int = 16
+    request_deadline_s: Optional[float] = 30.0
+    overload_status_code: int = 503  # 429 or 503
+    retry_after_s: int = 1
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
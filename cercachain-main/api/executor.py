@@ -0,0 +1,12 @@
+"""The api app's recognition pool: the executor shared with CercaAgent (ml_executor) with this app's engines"""
+import logging
+import os
+from logging_config import setup_worker_logging
+from ml_executor import Deadline, DeadlineExceededError, InferenceExecutor, OverloadedError  # noqa: F401
+
+def preload(log_queue=None):
+    """Process pool initializer: load the speech engine once per worker; it logs to the parent over ``log_queue``"""
+    setup_worker_logging(log_queue)
+    from speech import load_engines
+    load_engines()
+    logging.info(f"Speech worker {os.getpid()} ready")
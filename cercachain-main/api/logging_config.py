@@ -1,40 +1,35 @@
-import logging.config
+"""The api app's console and log file on top of the logging subsystem shared with CercaAgent (ml_logging)"""
+import logging
+import logging.handlers
 import os
+from config import settings
+
+from ml_logging import (  # noqa: F401
+    JsonFormatter,
+    correlation_id,
+    logging_stats,
+    new_correlation_id,
+    rate_limit,
+    run_with_correlation_id,
+    setup_worker_logging,
+    start_logging,
+    worker_log_queue,
+)
+
+def setup_logging(env, queue_size=10000):
+    """Console lines plus JSON lines in logs/<env>.log, written by a background listener (see ml_logging)"""
+    level = logging.DEBUG if env == 'development' else logging.INFO
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(name)s [%(correlation_id)s]: %(message)s'))
+    console.setLevel(logging.INFO)
 
-def setup_logging(env):
-    config = {
-        'version': 1,
-        'disable_existing_loggers': False,
-        'formatters': {
-            'standard': {
-                'format': '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
-            },
-            'detailed': {
-                'format': '%(asctime)s [%(levelname)s] %(name)s:%(lineno)d: %(message)s'
-            }
-        },
-        'handlers': {
-            'console': {
-                'class': 'logging.StreamHandler',
-                'formatter': 'standard',
-                'level': 'INFO'
-            },
-            'file': {
-                'class': 'logging.handlers.RotatingFileHandler',
-                'filename': os.path.join('logs', f'{env}.log'),
-                'maxBytes': 1024 * 1024 * 5,  # 5 MB
-                'backupCount': 5,
-                'formatter': 'detailed',
-                'level': 'DEBUG' if env == 'development' else 'INFO'
-            }
-        },
-        'loggers': {
-            '': {
-                'handlers': ['console', 'file'],
-                'level': 'DEBUG' if env == 'development' else 'INFO'
-            }
-        }
-    }
-    
     os.makedirs('logs', exist_ok=True)
-    logging.config.dictConfig(config)
\ No newline at end of file
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join('logs', f'{env}.log'),
+        maxBytes=1024 * 1024 * 5,  # 5 MB
+        backupCount=5
+    )
+    file_handler.setFormatter(JsonFormatter())
+    file_handler.setLevel(level)
+    return start_logging([console, file_handler], level, queue_size)
@@ -1,16 +1,56 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, parse_obj_as
 from datetime import datetime
+import json
 import logging
+import time
+from functools import partial
+from typing import List, Optional, Tuple
 from fastapi import FastAPI, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-import speech_recognition as sr
-from io import BytesIO
+import os
+import sys
 import wave
 from config import settings
+
+# The shared ml/audio_recognition modules import flat; this is the one place that puts them on the path
+sys.path.append(os.path.abspath(settings.ml_path))
+
+from executor import Deadline, DeadlineExceededError, InferenceExecutor, OverloadedError, preload
+from metrics import CLIENT_ERRORS, OUTCOMES, STAGE_SECONDS, UPLOAD_BYTES, metrics, resident_memory_bytes
+from logging_config import (
+    correlation_id, logging_stats, new_correlation_id, rate_limit, run_with_correlation_id, setup_logging
+)
+from client_errors import ClientErrorLimitError, ClientRateLimiter, ErrorAggregator, read_body
+from speech import decode_samples, load_engines, transcribe_bytes, transcribe_window
+from audio_ingest import TARGET_SAMPLE_RATE, UploadLimitError
+from longform import aiter_segments
+from upload_ingest import read_upload
 import uvicorn
 
+setup_logging(settings.environment, queue_size=settings.log_queue_size)
+# Client error reports can arrive in floods; cap what reaches the log
+client_errors = logging.getLogger("client_errors")
+rate_limit(
+    "client_errors",
+    rate=settings.client_error_log_rate,
+    burst=settings.client_error_log_burst,
+    sample_rate=settings.client_error_log_sample_rate
+)
+# ...and aggregate them, so a storm of one error becomes one record per window
+error_aggregator = ErrorAggregator(
+    client_errors,
+    window_s=settings.client_error_window_s,
+    max_fingerprints=settings.client_error_max_fingerprints
+)
+client_error_limiter = ClientRateLimiter(
+    rate=settings.client_error_client_rate,
+    burst=settings.client_error_client_burst
+)
+
 app = FastAPI(debug=settings.debug)
 
 app.add_middleware(
@@ -21,6 +61,91 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+executor = InferenceExecutor(
+    kind=settings.executor_kind,
+    max_workers=settings.executor_workers,
+    max_in_flight=settings.max_in_flight,
+    retry_after=settings.retry_after_s,
+    initializer=preload,
+    thread_name_prefix="speech"
+)
+
+@app.middleware("http")
+async def correlation_id_middleware(request: Request, call_next):
+    # Reuse the caller's request ID when given so logs line up across services
+    cid = request.headers.get("X-Request-ID") or new_correlation_id()
+    token = correlation_id.set(cid)
+    try:
+        response = await call_next(request)
+    finally:
+        correlation_id.reset(token)
+    response.headers["X-Request-ID"] = cid
+    return response
+
+metrics.gauge("api_in_flight_requests", "Requests holding a recognition slot", lambda: executor.in_flight)
+metrics.gauge("api_resident_memory_bytes", "Resident memory of the API process", resident_memory_bytes)
+metrics.gauge("api_client_error_fingerprints", "Distinct client errors remembered", lambda: len(error_aggregator.groups))
+
+@app.on_event("startup")
+async def start_executor():
+    # Engines load once per worker here instead of during the first request
+    await executor.prestart()
+    if executor.kind != "process":
+        # Thread and inline pools share this process's engines
+        await run_in_threadpool(load_engines)
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    executor.shutdown()
+
+@app.on_event("startup")
+async def start_error_aggregator():
+    await error_aggregator.start()
+
+@app.on_event("shutdown")
+async def stop_error_aggregator():
+    # Writes the summaries of the unfinished window
+    await error_aggregator.stop()
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    OUTCOMES.inc("overloaded")
+    return JSONResponse(
+        status_code=settings.overload_status_code,
+        content={"error": exc.message},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(UploadLimitError)
+async def upload_limit_handler(request: Request, exc: UploadLimitError):
+    OUTCOMES.inc("rejected_upload")
+    return JSONResponse(status_code=413, content={"error": exc.message, "type": exc.error_type})
+
+async def read_audio(audio: UploadFile, max_bytes: int, max_duration_s: Optional[float]) -> Tuple[bytearray, int]:
+    """Read an upload in chunks, rejecting it with a 413 as soon as it crosses a limit
+
+    Returns the audio and the most bytes that were buffered at once.
+    """
+    reader = await read_upload(
+        audio.read, settings.upload_chunk_bytes, max_bytes=max_bytes, max_duration_s=max_duration_s
+    )
+    UPLOAD_BYTES.observe(reader.peak_buffered)
+    return reader.finish(), reader.peak_buffered
+
+@app.exception_handler(ClientErrorLimitError)
+async def client_error_limit_handler(request: Request, exc: ClientErrorLimitError):
+    CLIENT_ERRORS.inc("rejected_batch")
+    return JSONResponse(status_code=413, content={"error": exc.message})
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_handler(request: Request, exc: DeadlineExceededError):
+    OUTCOMES.inc("deadline_exceeded")
+    return JSONResponse(
+        status_code=504,
+        content={"error": exc.message},
+        headers={"Retry-After": str(settings.retry_after_s)}
+    )
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -32,17 +157,60 @@ if __name__ == "__main__":
 class ErrorLog(BaseModel):
     timestamp: str
     message: str
-    stack: str | None = None
+    stack: Optional[str] = None
     context: dict = {}
 
+def ingest_errors(errors: List[ErrorLog], request: Request):
+    """Aggregate reports up to the client's rate limit; a 429 when none fit"""
+    client = request.client.host if request.client else "-"
+    accepted = client_error_limiter.take(client, len(errors))
+    for error in errors[:accepted]:
+        error_aggregator.add(error.message, error.stack, error.context, error.timestamp, client)
+    CLIENT_ERRORS.inc("accepted", amount=accepted)
+    CLIENT_ERRORS.inc("rate_limited", amount=len(errors) - accepted)
+    if errors and not accepted:
+        return JSONResponse(
+            status_code=429,
+            content={"error": "Too many client error reports"},
+            headers={"Retry-After": str(client_error_limiter.retry_after())}
+        )
+    return {"status": "logged", "accepted": accepted, "rate_limited": len(errors) - accepted}
+
 @app.post("/log-error")
-async def log_error(error: ErrorLog):
-    logging.error(f"Client Error: {error.message}", extra={
-        "timestamp": error.timestamp,
-        "stack": error.stack,
-        "context": error.context
-    })
-    return {"status": "logged"}
+async def log_error(error: ErrorLog, request: Request):
+    return ingest_errors([error], request)
+
+@app.post("/log-errors")
+async def log_errors(request: Request):
+    """Batched /log-error: a JSON array of ErrorLog records, optionally with ``Content-Encoding: gzip``
+
+    Reports are counted per fingerprint (normalized message and stack) and
+    logged as one summary per fingerprint every ``client_error_window_s``.
+    Reports past the client's rate limit are dropped and counted in the
+    response as ``rate_limited``.
+    """
+    try:
+        body = await read_body(
+            request.stream(), request.headers.get("Content-Encoding"), settings.client_error_max_body_bytes
+        )
+        errors = parse_obj_as(List[ErrorLog], json.loads(body))
+    except ClientErrorLimitError:
+        raise
+    except ValueError as e:
+        # Also bad JSON, text encoding and validation errors
+        CLIENT_ERRORS.inc("invalid")
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if len(errors) > settings.client_error_max_batch:
+        raise ClientErrorLimitError(f"{len(errors)} reports is over the batch limit of {settings.client_error_max_batch}")
+    return ingest_errors(errors, request)
+
+@app.get("/log-errors/top")
+async def top_errors(n: int = 10):
+    """The most reported client errors since startup, with their counts in the current window"""
+    return {
+        "window_s": error_aggregator.window_s,
+        "fingerprints": error_aggregator.top(max(1, min(n, settings.client_error_max_fingerprints))),
+    }
 
 @app.get("/")
 async def read_root():
@@ -57,18 +225,139 @@ async def process_message(message: str):
     }
 
 @app.post("/process-audio")
-async def process_audio(audio: UploadFile = File(...)):
+async def process_audio(audio: UploadFile = File(...), mode: str = "text"):
+    """``mode=timings`` adds the engine used and per-stage timings in milliseconds"""
+    async with executor.admit():
+        deadline = Deadline(settings.request_deadline_s)
+        try:
+            started = time.perf_counter_ns()
+            contents, peak_buffered = await read_audio(audio, settings.max_upload_bytes, settings.max_audio_duration_s)
+            read_ns = time.perf_counter_ns() - started
+            result = await executor.run(transcribe_bytes, contents, deadline=deadline)
+            timings = {"upload_read": read_ns, **result["timings"]}
+            for stage, nanoseconds in timings.items():
+                STAGE_SECONDS.observe_ns(nanoseconds, stage)
+            OUTCOMES.inc("fallback" if result["fallback"] else "success")
+
+            if mode == "timings":
+                timings["total"] = time.perf_counter_ns() - started
+                return {
+                    "transcription": result["text"],
+                    "engine": result["engine"],
+                    "upload": {"bytes": len(contents), "peak_buffered_bytes": peak_buffered},
+                    "timings_ms": {stage: round(ns / 1e6, 3) for stage, ns in timings.items()},
+                }
+            return {"transcription": result["text"]}
+        except (DeadlineExceededError, UploadLimitError):
+            raise
+        except Exception as e:
+            OUTCOMES.inc("error")
+            return {"error": str(e)}
+
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def stream_record(record: dict, format: str) -> str:
+    if format == "sse":
+        return f"event: {record['type']}\ndata: {json.dumps(record)}\n\n"
+    return json.dumps(record) + "\n"
+
+class CleanupStreamingResponse(StreamingResponse):
+    """StreamingResponse that calls ``cleanup`` however it ends, even if the body was never iterated"""
+    def __init__(self, *args, cleanup, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cleanup = cleanup
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.cleanup()
+
+@app.post("/process-audio/long")
+async def process_long_audio(audio: UploadFile = File(...), format: str = "ndjson"):
+    """Transcribe a recording of any length, streaming segments as they are ready
+
+    The recording is cut at quiet points into overlapping windows that run in
+    parallel on the recognition pool. Each record is ``{"type": "segment",
+    "id", "start", "end", "text"}`` (seconds) and the stream ends with a
+    ``done`` or ``error`` record. ``format`` is ``ndjson`` or ``sse``.
+    """
+    if format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(STREAM_FORMATS)}")
+    # The slot is held until the stream finishes, not just until this handler returns
+    executor.acquire()
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            executor.release()
+
     try:
-        # Read the uploaded audio file
-        contents = await audio.read()
-        audio_bytes = BytesIO(contents)
-
-        # Convert to wav format for speech recognition
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(audio_bytes) as source:
-            audio_data = recognizer.record(source)
-            text = recognizer.recognize_google(audio_data)
-            
-        return {"transcription": text}
+        started = time.perf_counter_ns()
+        contents, peak_buffered = await read_audio(audio, settings.longform_max_upload_bytes, settings.longform_max_duration_s)
+        STAGE_SECONDS.observe_ns(time.perf_counter_ns() - started, "upload_read")
+        with STAGE_SECONDS.time("decode"):
+            samples = await run_in_threadpool(decode_samples, contents)
+        del contents
+    except UploadLimitError:
+        release()
+        raise
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        release()
+        OUTCOMES.inc("error")
+        return {"error": str(e)}
+
+    cid = correlation_id.get()
+
+    async def records():
+        # The body streams in its own task, after the middleware has reset the request's ID
+        correlation_id.set(cid)
+        count = 0
+        try:
+            async for segment in aiter_segments(
+                samples,
+                partial(run_with_correlation_id, cid, transcribe_window),
+                executor.pool,
+                max_parallel=settings.longform_max_parallel or executor.max_workers,
+                window_s=settings.longform_window_s,
+                overlap_s=settings.longform_overlap_s
+            ):
+                count += 1
+                yield stream_record({"type": "segment", **segment}, format)
+            OUTCOMES.inc("success")
+            yield stream_record({
+                "type": "done",
+                "segments": count,
+                "audio_seconds": round(len(samples) / TARGET_SAMPLE_RATE, 3),
+                "peak_buffered_bytes": peak_buffered,
+                "elapsed_seconds": round((time.perf_counter_ns() - started) / 1e9, 3),
+            }, format)
+        except Exception as e:
+            OUTCOMES.inc("error")
+            logging.error(f"Long-form transcription failed: {e}")
+            yield stream_record({"type": "error", "error": str(e)}, format)
+        finally:
+            STAGE_SECONDS.observe_ns(time.perf_counter_ns() - started, "longform_total")
+            release()
+
+    # records()' finally never runs when the client is gone before the stream starts; the response's does
+    return CleanupStreamingResponse(records(), media_type=STREAM_FORMATS[format], headers={"X-Request-ID": cid},
+                                    cleanup=release)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/executor")
+async def executor_stats():
+    return executor.stats()
+
+@app.get("/stats/logging")
+async def log_stats():
+    return logging_stats()
+
+@app.get("/stats/client-errors")
+async def client_error_stats():
+    return {**error_aggregator.stats(), "rate_limit": client_error_limiter.stats()}
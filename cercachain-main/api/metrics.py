@@ -0,0 +1,17 @@
+"""The api app's metrics, on top of the registry shared with CercaAgent (ml_metrics)"""
+from ml_metrics import MetricsRegistry, resident_memory_bytes  # noqa: F401
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "api_stage_seconds", "Time spent in each stage of /process-audio", ["stage"]
+)
+OUTCOMES = metrics.counter("api_outcomes_total", "/process-audio requests by outcome", ["outcome"])
+# 16 KiB to 256 MiB
+UPLOAD_BYTES = metrics.histogram(
+    "api_upload_peak_buffered_bytes", "Most upload bytes held in memory at once per request",
+    buckets=[2 ** n for n in range(14, 30, 2)]
+)
+CLIENT_ERRORS = metrics.counter(
+    "api_client_errors_total", "Client error reports on /log-error and /log-errors by outcome", ["outcome"]
+)
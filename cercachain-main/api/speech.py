@@ -0,0 +1,183 @@
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+
+from audio_ingest import UploadLimitError, check_duration, wav_header
+
+class SpeechEngine:
+    """Turns an uploaded audio file into text.
+
+    Engines are created once per worker process (see executor.preload) and
+    reused for every request. ``recognize`` returns at least ``text`` and
+    ``inference_time`` in seconds.
+    """
+
+    name = "base"
+
+    def load(self) -> "SpeechEngine":
+        return self
+
+    def recognize(self, contents: bytes) -> Dict[str, Any]:
+        raise NotImplementedError
+
+class WhisperEngine(SpeechEngine):
+    """Offline Whisper through ml/audio_recognition/whisper_inference.py"""
+
+    name = "whisper"
+
+    def load(self):
+        from whisper_inference import WhisperTranscriber
+        self.transcriber = WhisperTranscriber(
+            model_name=settings.whisper_model,
+            backend=settings.whisper_backend,
+            cpu_threads=settings.cpu_threads,
+            max_duration_s=settings.max_audio_duration_s
+        )
+        return self
+
+    def recognize(self, contents):
+        return self.transcriber.transcribe(contents)
+
+class DeepSpeechEngine(SpeechEngine):
+    """Offline DeepSpeech through ml/audio_recognition/deepspeech_inference.py"""
+
+    name = "deepspeech"
+
+    def load(self):
+        from deepspeech_inference import DeepSpeechTranscriber
+        if not settings.deepspeech_model_path:
+            raise ValueError("The deepspeech engine needs deepspeech_model_path")
+        pool_size = settings.deepspeech_pool_size
+        if pool_size is None and settings.executor_kind == "process":
+            # Every worker process has its own pool; one model each already fills the cores
+            pool_size = 1
+        self.transcriber = DeepSpeechTranscriber(
+            settings.deepspeech_model_path,
+            max_duration_s=settings.max_audio_duration_s,
+            scorer_path=settings.deepspeech_scorer_path,
+            pool_size=pool_size
+        )
+        return self
+
+    def recognize(self, contents):
+        return self.transcriber.transcribe(contents)
+
+class GoogleEngine(SpeechEngine):
+    """Google's web speech API; a network round-trip per request, so only used when configured"""
+
+    name = "google"
+
+    def load(self):
+        import speech_recognition as sr
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        return self
+
+    def recognize(self, contents):
+        with self.sr.AudioFile(BytesIO(contents)) as source:
+            check_duration(source.DURATION, settings.max_audio_duration_s)
+            audio_data = self.recognizer.record(source)
+        started = time.perf_counter()
+        text = self.recognizer.recognize_google(audio_data)
+        return {"text": text, "inference_time": time.perf_counter() - started}
+
+ENGINES = {engine.name: engine for engine in (WhisperEngine, DeepSpeechEngine, GoogleEngine)}
+
+_engines: Dict[str, SpeechEngine] = {}
+_lock = threading.Lock()
+
+def get_engine(name: str) -> SpeechEngine:
+    engine = _engines.get(name)
+    if engine is not None:
+        return engine
+    if name not in ENGINES:
+        raise ValueError(f"Unknown speech engine: {name} (expected one of {sorted(ENGINES)})")
+    with _lock:
+        if name not in _engines:
+            _engines[name] = ENGINES[name]().load()
+            logging.info(f"Loaded speech engine {name} in worker {os.getpid()}")
+    return _engines[name]
+
+def load_engines():
+    """Load the configured engines and fallback up front"""
+    if settings.speech_fallback:
+        get_engine(settings.speech_fallback)
+    if settings.short_command_engine:
+        get_engine(settings.short_command_engine)
+    try:
+        get_engine(settings.speech_engine)
+    except Exception as e:
+        if not settings.speech_fallback:
+            raise
+        # Requests retry the load and fall back while it keeps failing
+        logging.error(f"Could not load speech engine {settings.speech_engine}: {e}")
+
+def decode_samples(contents: bytes):
+    """16kHz mono float32 samples for long-form transcription"""
+    from audio_ingest import decode_audio
+    return decode_audio(contents, max_duration_s=settings.longform_max_duration_s)
+
+def transcribe_window(samples) -> List[Dict[str, Any]]:
+    """Long-form pool task: segments for one window, times relative to the window"""
+    engine = get_engine(settings.speech_engine)
+    if not hasattr(engine, "transcriber"):
+        raise ValueError(f"Long-form transcription needs a local engine, not {settings.speech_engine}")
+    return engine.transcriber.transcribe_samples(samples)["segments"]
+
+def clip_seconds(contents: bytes) -> Optional[float]:
+    """Duration of a WAV upload from its header, None for other formats"""
+    try:
+        header = wav_header(contents)
+    except Exception:
+        return None
+    if header is None:
+        return None
+    fmt, offset, size = header
+    byte_rate = fmt[3]
+    return min(size, len(contents) - offset) / byte_rate if byte_rate else None
+
+def choose_engine(contents: bytes) -> Tuple[str, Optional[str]]:
+    """Engine for an upload and the one to retry with if it fails
+
+    Short WAV clips go to short_command_engine when one is configured, with
+    the main engine as their fallback.
+    """
+    if settings.short_command_engine:
+        seconds = clip_seconds(contents)
+        if seconds is not None and seconds <= settings.short_command_max_s:
+            return settings.short_command_engine, settings.speech_engine
+    return settings.speech_engine, settings.speech_fallback
+
+def transcribe_bytes(contents: bytes) -> Dict[str, Any]:
+    """Blocking speech recognition, run on the executor pool
+
+    Returns the text, the engine that produced it, whether that was a
+    fallback and the decode/recognize stage timings in nanoseconds.
+    """
+    engine, fallback = choose_engine(contents)
+    fell_back = False
+    started = time.perf_counter_ns()
+    try:
+        result = get_engine(engine).recognize(contents)
+    except UploadLimitError:
+        # The fallback would have to reject it too
+        raise
+    except Exception as e:
+        if not fallback or fallback == engine:
+            raise
+        logging.warning(f"Speech engine {engine} failed, falling back to {fallback}: {e}")
+        engine, fell_back = fallback, True
+        started = time.perf_counter_ns()
+        result = get_engine(engine).recognize(contents)
+    total = time.perf_counter_ns() - started
+    recognize = min(total, int(result["inference_time"] * 1e9))
+    return {
+        "text": result["text"],
+        "engine": engine,
+        "fallback": fell_back,
+        "timings": {"decode": total - recognize, "recognize": recognize},
+    }
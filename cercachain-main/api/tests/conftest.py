@@ -0,0 +1,10 @@
+"""CI runs pytest from api/, so the api app's modules import directly; CercaAgent and the shared ml modules are added here"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Appended, so the api app's own config, metrics and logging_config win over CercaAgent's
+for path in (os.path.join(ROOT, "CercaAgent"), os.path.join(ROOT, "ml", "audio_recognition")):
+    if path not in sys.path:
+        sys.path.append(path)
@@ -0,0 +1,35 @@
+import struct
+
+import numpy as np
+import pytest
+
+from audio_ingest import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, AudioDecodeError, decode_audio
+
+def wav(payload: bytes, format_tag=WAVE_FORMAT_PCM, bits=16, channels=1, sample_rate=16000) -> bytes:
+    block = channels * max(1, bits // 8)
+    fmt = struct.pack("<HHIIHH", format_tag, channels, sample_rate, sample_rate * block, block, bits)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(payload)) + payload
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+def test_pcm16_wav():
+    samples = (np.sin(np.arange(1600) / 5) * 8000).astype("<i2")
+    decoded = decode_audio(wav(samples.tobytes()))
+    assert decoded.dtype == np.float32
+    assert len(decoded) == 1600
+    assert np.allclose(decoded, samples / 32768.0)
+
+@pytest.mark.parametrize("bits", [0, 4])
+def test_sub_byte_sample_width_is_invalid(bits):
+    # Found by the fuzzer: a zero sample width divided by zero
+    with pytest.raises(AudioDecodeError) as e:
+        decode_audio(wav(b"\0" * 64, bits=bits))
+    assert e.value.error_type == "INVALID_WAV"
+
+@pytest.mark.parametrize("dtype", [np.float32, np.int16])
+def test_non_finite_float_samples_are_clamped(dtype):
+    # Found by the fuzzer: NaN and infinity reached the model and the int16 cast
+    samples = np.array([np.nan, np.inf, -np.inf, 0.5] * 400, dtype="<f4")
+    decoded = decode_audio(wav(samples.tobytes(), WAVE_FORMAT_IEEE_FLOAT, bits=32), dtype=dtype)
+    assert np.isfinite(decoded.astype(np.float32)).all()
+    if dtype == np.float32:
+        assert decoded[:4].tolist() == [0.0, 1.0, -1.0, 0.5]
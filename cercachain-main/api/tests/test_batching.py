@@ -0,0 +1,22 @@
+import asyncio
+import time
+
+import pytest
+
+from voice_recognition.batching import BatchScheduler
+
+def test_stop_fails_a_batch_whose_dispatch_never_started():
+    async def scenario():
+        scheduler = BatchScheduler(lambda items: (time.sleep(0.2), items)[1], max_batch_size=2, max_wait_ms=0)
+        await scheduler.start()
+        caller = asyncio.ensure_future(scheduler.submit("clip"))
+        # Long enough for the worker to hand the batch to a task, too short for that task to start
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert len(scheduler._running) == 1
+        await scheduler.stop()
+        with pytest.raises(RuntimeError, match="stopped"):
+            await asyncio.wait_for(caller, 1)
+        assert scheduler._running == {}
+
+    asyncio.run(scenario())
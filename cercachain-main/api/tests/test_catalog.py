@@ -0,0 +1,36 @@
+from command_mapping.catalog import CommandCatalog, parse_number, tokenize
+
+SPEC = {
+    "slots": {"level": {"type": "number"}},
+    "commands": [{"action": "set_volume", "patterns": ["set [the] volume to {level} [percent]"]}],
+}
+
+def test_parse_number():
+    assert parse_number(tokenize("forty five"), 0) == [(45, 2), (40, 1)]
+    assert parse_number(tokenize("two hundred and six"), 0)[0] == (206, 4)
+    assert parse_number(["45"], 0) == [(45, 1)]
+
+def test_repeated_hundreds_do_not_recurse():
+    # Found by the fuzzer: each "hundred" recursed once, overflowing the stack
+    tokens = tokenize("one hundred " * 5000)
+    # "one hundred one", then the rest is left unparsed
+    assert parse_number(tokens, 0)[0] == (101, 3)
+
+def test_long_and_non_ascii_digit_strings_are_not_numbers():
+    # int() refuses strings this long, and "²" is a digit int() cannot read
+    assert parse_number(["9" * 100000], 0) == []
+    assert parse_number(["²"], 0) == []
+
+def test_catalog_match_survives_fuzzer_inputs():
+    catalog = CommandCatalog(SPEC)
+    assert catalog.match("set the volume to 40 percent") == ("set_volume", {"level": 40})
+    assert catalog.match("set the volume to " + "9" * 100000) is None
+    assert catalog.match("set the volume to " + "one hundred " * 5000) is None
+
+def test_trailing_and_after_hundred():
+    # A partial transcript halfway through "one hundred and five"
+    assert parse_number(tokenize("one hundred and"), 0) == [(100, 2), (1, 1)]
+    catalog = CommandCatalog(SPEC)
+    assert catalog.match("set the volume to one hundred and") is None
+    assert catalog.is_final("set the volume to one hundred and") is False
+    assert catalog.match("set the volume to one hundred and five") == ("set_volume", {"level": 105})
@@ -0,0 +1,34 @@
+import asyncio
+import gzip
+
+import pytest
+
+from client_errors import ClientErrorLimitError, read_body
+
+def read(body, encoding=None, max_bytes=1024, chunk_size=256):
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    return asyncio.run(read_body(chunks(), encoding, max_bytes))
+
+def test_plain_and_gzip_bodies():
+    payload = b'{"message": "boom"}' * 10
+    assert read(payload) == payload
+    assert read(gzip.compress(payload), "gzip") == payload
+
+def test_gzip_bomb_is_refused():
+    bomb = gzip.compress(b"\0" * (10 * 1024 * 1024))
+    assert len(bomb) < 64 * 1024
+    with pytest.raises(ClientErrorLimitError):
+        read(bomb, "gzip", max_bytes=64 * 1024)
+
+def test_large_body_is_refused_before_decompressing():
+    with pytest.raises(ClientErrorLimitError):
+        read(b"x" * 2048, max_bytes=1024)
+
+def test_bad_gzip_and_encodings():
+    with pytest.raises(ValueError):
+        read(gzip.compress(b"hello")[:-8], "gzip")
+    with pytest.raises(ValueError):
+        read(b"hello", "br")
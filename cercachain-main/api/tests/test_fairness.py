@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from api.errors import RateLimitedError
+from inference.fairness import FairScheduler
+
+def unlimited(**kwargs):
+    return FairScheduler(rate=0, max_outstanding=0, **kwargs)
+
+async def hold(fair, client, priority="interactive"):
+    """Take a slot outside any task; release it with ``await slot.__aexit__(None, None, None)``"""
+    slot = fair.slot(client, priority)
+    await slot.__aenter__()
+    return slot
+
+async def record(fair, order, client, priority="interactive"):
+    async with fair.slot(client, priority):
+        order.append(client)
+
+def test_clients_take_turns():
+    async def scenario():
+        fair = unlimited(slots=1)
+        order = []
+        slot = await hold(fair, "a")
+        tasks = [asyncio.ensure_future(record(fair, order, client)) for client in ("a", "a", "a", "b")]
+        await asyncio.sleep(0)
+        await slot.__aexit__(None, None, None)
+        await asyncio.gather(*tasks)
+        return order
+
+    # b arrived last but goes ahead of a's backlog
+    assert asyncio.run(scenario()) == ["a", "b", "a", "a"]
+
+def test_interactive_goes_ahead_of_bulk():
+    async def scenario():
+        fair = unlimited(slots=1)
+        order = []
+        slot = await hold(fair, "a")
+        tasks = [asyncio.ensure_future(record(fair, order, "bulk", "bulk")),
+                 asyncio.ensure_future(record(fair, order, "interactive"))]
+        await asyncio.sleep(0)
+        await slot.__aexit__(None, None, None)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive", "bulk"]
+
+def test_bulk_slots_cap():
+    async def scenario():
+        fair = unlimited(slots=3, bulk_slots=1)
+        first = await hold(fair, "a", "bulk")
+        second = asyncio.ensure_future(hold(fair, "b", "bulk"))
+        await asyncio.sleep(0)
+        # Two slots are free, but bulk already holds its share
+        assert not second.done()
+        assert fair.stats()["classes"]["bulk"]["queue_depth"] == 1
+        interactive = await hold(fair, "c")
+        assert fair.active == {"interactive": 1, "bulk": 1}
+
+        await first.__aexit__(None, None, None)
+        await asyncio.sleep(0)
+        assert second.done()
+        assert fair.active == {"interactive": 1, "bulk": 1}
+        await second.result().__aexit__(None, None, None)
+        await interactive.__aexit__(None, None, None)
+        assert fair.active == {"interactive": 0, "bulk": 0}
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_hands_its_slot_on():
+    async def scenario():
+        fair = unlimited(slots=1)
+        order = []
+        slot = await hold(fair, "a")
+        cancelled = asyncio.ensure_future(record(fair, order, "b"))
+        waiting = asyncio.ensure_future(record(fair, order, "c"))
+        await asyncio.sleep(0)
+        # Granted to b and cancelled in the same tick, before b ever runs
+        await slot.__aexit__(None, None, None)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        await asyncio.wait_for(waiting, 1)
+        return fair, order
+
+    fair, order = asyncio.run(scenario())
+    assert order == ["c"]
+    assert fair.active == {"interactive": 0, "bulk": 0}
+    assert fair.stats()["classes"]["interactive"]["queue_depth"] == 0
+
+def test_cancelled_while_queued_is_skipped():
+    async def scenario():
+        fair = unlimited(slots=1)
+        order = []
+        slot = await hold(fair, "a")
+        cancelled = asyncio.ensure_future(record(fair, order, "b"))
+        waiting = asyncio.ensure_future(record(fair, order, "c"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        await slot.__aexit__(None, None, None)
+        await asyncio.wait_for(waiting, 1)
+        return fair, order
+
+    fair, order = asyncio.run(scenario())
+    assert order == ["c"]
+    assert fair.active == {"interactive": 0, "bulk": 0}
+
+def test_max_outstanding_rejects_without_spending_tokens():
+    async def scenario():
+        fair = FairScheduler(rate=1, burst=2, max_outstanding=1)
+        async with fair.admit("a"):
+            with pytest.raises(RateLimitedError):
+                async with fair.admit("a"):
+                    pass
+        # The rejected request took no token, so a second one still fits the burst
+        async with fair.admit("a"):
+            pass
+        with pytest.raises(RateLimitedError):
+            async with fair.admit("a"):
+                pass
+        return fair
+
+    assert asyncio.run(scenario()).rate_limited == 2
@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+
+from jobs.store import JobStore
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"), max_attempts=2).open()
+
+def spooled_file(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"RIFF")
+    return str(path)
+
+def done(item, text="hello"):
+    return {"id": item["id"], "text": text, "intent": "greet", "timings": {"decode": 1.0}}
+
+def test_claim_takes_oldest_first_and_counts_attempts(store):
+    job_id = store.create_job([("a", "a.wav", False), ("b", "b.wav", False), ("c", "c.wav", False)], "test")
+    first = store.claim("w1", 2)
+    assert [item["name"] for item in first] == ["a", "b"]
+    assert [item["name"] for item in store.claim("w2", 2)] == ["c"]
+    assert store.claim("w3", 2) == []
+    assert store.job(job_id)["counts"]["running"] == 3
+    assert store.results(job_id)["items"][0]["attempts"] == 1
+
+def test_complete_finishes_the_job(store, tmp_path):
+    path = spooled_file(tmp_path, "a.wav")
+    job_id = store.create_job([("a", path, True), ("b", "b.wav", False)], "test")
+    items = store.claim("w1", 10)
+    assert store.complete("w1", [done(item) for item in items]) == [path]
+    job = store.job(job_id)
+    assert job["status"] == "finished"
+    assert job["counts"]["done"] == 2
+    first = store.results(job_id)["items"][0]
+    assert (first["text"], first["intent"], first["timings"]) == ("hello", "greet", {"decode": 1.0})
+
+def test_failed_items_are_retried_until_out_of_attempts(store):
+    job_id = store.create_job([("a", "a.wav", False)], "test")
+    item = store.claim("w1", 1)[0]
+    store.complete("w1", [{"id": item["id"], "error": "boom"}])
+    assert store.job(job_id)["counts"]["queued"] == 1
+
+    item = store.claim("w2", 1)[0]
+    store.complete("w2", [{"id": item["id"], "error": "boom again"}])
+    job = store.job(job_id)
+    assert job["counts"]["failed"] == 1
+    assert job["status"] == "finished"
+    assert store.results(job_id)["items"][0]["error"] == "boom again"
+
+def test_release_does_not_spend_an_attempt(store):
+    job_id = store.create_job([("a", "a.wav", False)], "test")
+    item = store.claim("w1", 1)[0]
+    # Only the claiming worker can hand an item back
+    store.release("w2", [item["id"]])
+    assert store.job(job_id)["counts"]["running"] == 1
+    store.release("w1", [item["id"]])
+    assert store.claim("w1", 1)[0]["attempts"] == 0
+
+def test_late_result_does_not_overwrite_the_new_claim(tmp_path):
+    # A negative lease: every claim has already run out
+    store = JobStore(str(tmp_path / "jobs.db"), lease_s=-1.0, max_attempts=3).open()
+    job_id = store.create_job([("a", "a.wav", False)], "test")
+    item = store.claim("slow", 1)[0]
+    store.requeue_expired()
+    store.claim("fast", 1)
+
+    assert store.complete("slow", [done(item, "stale")]) == []
+    assert store.job(job_id)["counts"]["running"] == 1
+    store.complete("fast", [done(item, "fresh")])
+    assert store.results(job_id)["items"][0]["text"] == "fresh"
+
+def test_expired_leases_requeue_until_out_of_attempts(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), lease_s=-1.0, max_attempts=2).open()
+    path = spooled_file(tmp_path, "a.wav")
+    job_id = store.create_job([("a", path, True)], "test")
+
+    store.claim("w1", 1)
+    assert store.requeue_expired() == []
+    assert store.job(job_id)["counts"]["queued"] == 1
+
+    store.claim("w2", 1)
+    assert store.requeue_expired() == [path]
+    job = store.job(job_id)
+    assert job["counts"]["failed"] == 1
+    assert job["status"] == "finished"
+    assert "lease expired" in store.results(job_id)["items"][0]["error"]
+    assert store.claim("w3", 1) == []
+
+def test_a_second_store_reconnects_instead_of_rebuilding_again(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first = JobStore(path).open()
+    second = JobStore(path).open()  # stands in for another process on the same file
+    job_id = first.create_job([("a", "a.wav", False)], "test")
+    damaged = sqlite3.DatabaseError("database disk image is malformed")
+    first.recover(damaged)
+    second.recover(damaged)
+    assert (first.recoveries, second.recoveries) == (1, 0)
+    assert len(list(tmp_path.glob("jobs.db.corrupt-*[0-9]"))) == 1
+    assert second.job(job_id)["counts"]["queued"] == 1
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+from transcription_cache import TranscriptionCache
+
+class DictBackend:
+    def __init__(self, fail=False):
+        self.data = {}
+        self.fail = fail
+
+    def get(self, key):
+        if self.fail:
+            raise ConnectionError("store is down")
+        return self.data.get(key)
+
+    def set(self, key, value):
+        if self.fail:
+            raise ConnectionError("store is down")
+        self.data[key] = value
+
+def test_concurrent_async_misses_compute_once():
+    cache = TranscriptionCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"text": "hello"}
+
+    async def scenario():
+        return await asyncio.gather(*[cache.aget_or_compute("k", compute) for _ in range(5)])
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [value for value, _ in results] == [{"text": "hello"}] * 5
+    assert [cached for _, cached in results] == [False, True, True, True, True]
+    assert (cache.counters["misses"], cache.counters["coalesced"]) == (1, 4)
+    assert cache.get("k") == {"text": "hello"}
+
+def test_a_caller_giving_up_does_not_cancel_the_others():
+    cache = TranscriptionCache()
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def scenario():
+        first = asyncio.ensure_future(cache.aget_or_compute("k", compute))
+        second = asyncio.ensure_future(cache.aget_or_compute("k", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == ("value", True)
+
+def test_the_last_caller_leaving_cancels_the_computation():
+    cache = TranscriptionCache()
+    cancelled = []
+
+    async def compute():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return "value"
+
+    async def quick():
+        return "fresh"
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(cache.aget_or_compute("k", compute)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        # A later caller computes again instead of joining the cancelled task
+        return await cache.aget_or_compute("k", quick)
+
+    assert asyncio.run(scenario()) == ("fresh", False)
+    assert cancelled == [1]
+    assert cache.counters["abandoned"] == 1
+
+def test_concurrent_blocking_misses_compute_once():
+    cache = TranscriptionCache()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(results) == [("value", False)] + [("value", True)] * 3
+
+def test_shared_tier_hit_skips_compute():
+    backend = DictBackend()
+    TranscriptionCache(backend=backend).set("k", "shared")
+
+    async def compute():
+        raise AssertionError("should have come from the shared tier")
+
+    cache = TranscriptionCache(backend=backend)
+    assert asyncio.run(cache.aget_or_compute("k", compute)) == ("shared", True)
+    assert cache.counters["shared_hits"] == 1
+
+def test_shared_tier_errors_do_not_fail_requests():
+    cache = TranscriptionCache(backend=DictBackend(fail=True))
+
+    async def compute():
+        return "value"
+
+    async def scenario():
+        result = await cache.aget_or_compute("k", compute)
+        # Let the background write-back run
+        await asyncio.sleep(0.05)
+        return result
+
+    assert asyncio.run(scenario()) == ("value", False)
+    assert cache.counters["backend_errors"] == 2
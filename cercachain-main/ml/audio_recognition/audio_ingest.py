@@ -0,0 +1,222 @@
+import logging
+import shutil
+import struct
+import subprocess
+from typing import Optional, Tuple
+
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class AudioDecodeError(Exception):
+    """Custom exception for audio ingest errors"""
+    def __init__(self, error_type: str, message: str):
+        self.error_type = error_type
+        self.message = message
+        super().__init__(f"{error_type}: {message}")
+
+    def __reduce__(self):
+        # Raised inside process pool workers, so it has to survive pickling
+        return (self.__class__, (self.error_type, self.message))
+
+class UploadLimitError(AudioDecodeError):
+    """Raised when an upload is over the byte or duration limit (UPLOAD_TOO_LARGE, AUDIO_TOO_LONG)"""
+
+def is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+def wav_header(data: bytes) -> Optional[Tuple[tuple, int, int]]:
+    """Locate the format and sample data of a RIFF/WAVE buffer
+
+    Works on a prefix of the file, so uploads can be checked before they
+    have fully arrived.
+
+    Args:
+        data: Raw WAV bytes, or the start of them
+
+    Returns:
+        Tuple of (fmt fields, data offset, declared data size), or None if
+        ``data`` ends before the data chunk
+    """
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", data, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            if chunk_size < 16:
+                raise AudioDecodeError("INVALID_WAV", "fmt chunk is too short")
+            if body + chunk_size > len(data):
+                return None
+            fmt = struct.unpack_from("<HHIIHH", data, body)
+            if fmt[0] == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                # The real format tag is the first field of the SubFormat GUID
+                fmt = (struct.unpack_from("<H", data, body + 24)[0],) + fmt[1:]
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioDecodeError("INVALID_WAV", "data chunk before fmt chunk")
+            return fmt, body, chunk_size
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+def parse_wav(data: bytes) -> Tuple[np.ndarray, int, int]:
+    """Parse a RIFF/WAVE buffer without copying the sample data
+
+    Args:
+        data: Raw WAV bytes
+
+    Returns:
+        Tuple of (interleaved samples viewing ``data``, sample rate, channels)
+    """
+    header = wav_header(data)
+    if header is None:
+        raise AudioDecodeError("INVALID_WAV", "no data chunk found")
+    fmt, body, chunk_size = header
+    # Truncated uploads keep whatever whole frames arrived
+    end = min(body + chunk_size, len(data))
+    return _pcm_view(memoryview(data)[body:end], fmt)
+
+def _pcm_view(payload: memoryview, fmt: tuple) -> Tuple[np.ndarray, int, int]:
+    format_tag, channels, sample_rate, _, _, bits = fmt
+    if channels < 1 or sample_rate < 1 or bits < 8:
+        raise AudioDecodeError("INVALID_WAV", f"{channels} channels of {bits}-bit samples at {sample_rate} Hz")
+    width = bits // 8
+    usable = len(payload) - len(payload) % (width * channels)
+    payload = payload[:usable]
+
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        samples = np.frombuffer(payload, dtype="<f4")
+    elif format_tag == WAVE_FORMAT_PCM and bits == 16:
+        samples = np.frombuffer(payload, dtype="<i2")
+    elif format_tag == WAVE_FORMAT_PCM and bits == 32:
+        samples = np.frombuffer(payload, dtype="<i4")
+    elif format_tag == WAVE_FORMAT_PCM and bits == 8:
+        samples = np.frombuffer(payload, dtype=np.uint8)
+    elif format_tag == WAVE_FORMAT_PCM and bits == 24:
+        raw = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8)
+                   | (raw[:, 2].astype(np.int8).astype(np.int32) << 16))
+        samples = samples << 8  # scale into the int32 range
+    else:
+        raise AudioDecodeError("UNSUPPORTED_WAV", f"format {format_tag:#x} with {bits} bits")
+    return samples, sample_rate, channels
+
+def to_float32(samples: np.ndarray) -> np.ndarray:
+    """Scale integer PCM into [-1, 1] float32"""
+    if samples.dtype == np.float32:
+        # Float WAVs can carry NaN or infinity, which models and int16 casts do not survive
+        if not np.isfinite(samples).all():
+            return np.nan_to_num(samples, nan=0.0, posinf=1.0, neginf=-1.0)
+        return samples
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float32) - 128.0) / 128.0
+    scale = float(np.iinfo(samples.dtype).max) + 1.0
+    return samples.astype(np.float32) / scale
+
+def to_int16(samples: np.ndarray) -> np.ndarray:
+    if samples.dtype == np.int16:
+        return samples
+    return (np.clip(to_float32(samples), -1.0, 32767 / 32768) * 32768).astype(np.int16)
+
+def downmix(samples: np.ndarray, channels: int) -> np.ndarray:
+    """Average interleaved channels into mono"""
+    if channels == 1:
+        return samples
+    return samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Vectorized resampling of float mono audio
+
+    Integer downsampling ratios (48k, 32k -> 16k) average each block, which
+    doubles as a cheap anti-alias filter; other ratios interpolate linearly.
+    """
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    if src_rate > dst_rate and src_rate % dst_rate == 0:
+        factor = src_rate // dst_rate
+        usable = len(samples) - len(samples) % factor
+        return samples[:usable].reshape(-1, factor).mean(axis=1, dtype=np.float32)
+    duration = len(samples) / src_rate
+    positions = np.arange(int(duration * dst_rate), dtype=np.float64) * (src_rate / dst_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+def check_sample_rate(sample_rate: int, min_rate: int = 8000, max_rate: int = 192000):
+    """Reject a client-declared rate for headerless PCM that no real source produces
+
+    A rate of 0 divides by zero when resampling, a tiny one blows each frame
+    up into millions of samples, and a negative one yields no audio at all.
+    """
+    if not min_rate <= sample_rate <= max_rate:
+        raise AudioDecodeError("UNSUPPORTED_RATE", f"{sample_rate} Hz is outside {min_rate}-{max_rate} Hz")
+
+def decode_pcm(data: bytes, sample_rate: int, channels: int = 1,
+               target_rate: int = TARGET_SAMPLE_RATE, dtype=np.float32) -> np.ndarray:
+    """Decode headerless little-endian int16 PCM"""
+    usable = len(data) - len(data) % (2 * channels)
+    samples = np.frombuffer(memoryview(data)[:usable], dtype="<i2")
+    return _normalize(samples, sample_rate, channels, target_rate, dtype)
+
+def decode_ffmpeg(data: bytes, target_rate: int = TARGET_SAMPLE_RATE,
+                  max_duration_s: Optional[float] = None) -> np.ndarray:
+    """Decode compressed audio (webm, ogg, mp3...) by piping it through ffmpeg
+
+    With ``max_duration_s`` ffmpeg stops just past the limit, so an
+    over-long upload never decodes in full.
+    """
+    if shutil.which("ffmpeg") is None:
+        raise AudioDecodeError("DECODER_MISSING", "ffmpeg is required for compressed audio")
+    limit = ["-t", f"{max_duration_s + 1:.3f}"] if max_duration_s else []
+    process = subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0"] + limit +
+        ["-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(target_rate), "pipe:1"],
+        input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if process.returncode != 0:
+        raise AudioDecodeError("DECODE_ERROR", process.stderr.decode(errors="replace").strip())
+    samples = np.frombuffer(process.stdout, dtype="<i2")
+    check_duration(len(samples) / target_rate, max_duration_s)
+    return samples
+
+def check_duration(seconds: float, max_duration_s: Optional[float]):
+    if max_duration_s and seconds > max_duration_s:
+        raise UploadLimitError("AUDIO_TOO_LONG", f"{seconds:.1f}s of audio is over the {max_duration_s:g}s limit")
+
+def decode_audio(data: bytes, target_rate: int = TARGET_SAMPLE_RATE, dtype=np.float32,
+                 max_duration_s: Optional[float] = None) -> np.ndarray:
+    """Decode an upload into mono samples at ``target_rate``
+
+    WAV is parsed in place; anything else goes through ffmpeg over pipes.
+
+    Args:
+        data: Raw audio bytes
+        target_rate: Output sample rate
+        dtype: np.float32 (Whisper) or np.int16 (DeepSpeech)
+        max_duration_s: Reject longer audio with UploadLimitError before resampling
+
+    Returns:
+        1-D numpy array of samples
+    """
+    if not data:
+        raise AudioDecodeError("EMPTY_AUDIO", "no audio data")
+    if is_wav(data):
+        try:
+            samples, sample_rate, channels = parse_wav(data)
+            check_duration(len(samples) / channels / sample_rate, max_duration_s)
+            return _normalize(samples, sample_rate, channels, target_rate, dtype)
+        except AudioDecodeError as e:
+            if e.error_type != "UNSUPPORTED_WAV":
+                raise
+            logging.info(f"Falling back to ffmpeg: {e}")
+    return _normalize(decode_ffmpeg(data, target_rate, max_duration_s), target_rate, 1, target_rate, dtype)
+
+def _normalize(samples: np.ndarray, sample_rate: int, channels: int,
+               target_rate: int, dtype) -> np.ndarray:
+    if dtype == np.int16 and samples.dtype == np.int16 and channels == 1 and sample_rate == target_rate:
+        return samples
+    audio = resample(downmix(to_float32(samples), channels), sample_rate, target_rate)
+    return to_int16(audio) if dtype == np.int16 else audio.astype(np.float32, copy=False)
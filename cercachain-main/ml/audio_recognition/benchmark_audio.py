@@ -1,24 +1,34 @@
+import argparse
 import logging
-import time
 import os
-from typing import Dict, Any, List
+import time
+import torch
+from typing import Dict, Any, List, Optional, Sequence
 from whisper_inference import WhisperTranscriber, AudioTranscriptionError
 from deepspeech_inference import DeepSpeechTranscriber, DeepSpeechError
+from audio_ingest import TARGET_SAMPLE_RATE, to_int16
+from benchmark_corpus import (
+    compare_results,
+    load_results,
+    percentiles,
+    save_results,
+    synthesize_corpus,
+    time_stages,
+    timed_decode,
+)
+from ml_logging import LOG_DIR, setup_logging
 
-# Setup logging if not already configured
-log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
-os.makedirs(log_dir, exist_ok=True)
-if not logging.getLogger().handlers:
-    logging.basicConfig(
-        filename=os.path.join(log_dir, "ml_benchmarks.log"),
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s"
-    )
+setup_logging()
 
 class AudioBenchmark:
-    def __init__(self):
-        """Initialize transcription models for benchmarking"""
-        self.whisper = WhisperTranscriber(model_name="tiny.en")
+    def __init__(self, model_name: Optional[str] = "tiny.en", backend: str = "torch"):
+        """Initialize transcription models for benchmarking
+
+        Args:
+            model_name: Whisper model to benchmark; None skips loading Whisper
+            backend: Whisper backend, "torch" or "ctranslate2"
+        """
+        self.whisper = WhisperTranscriber(model_name=model_name, backend=backend) if model_name else None
         # DeepSpeech model path should be configured based on installation
         self.deepspeech = None  # Initialize when model path is available
         
@@ -32,9 +42,9 @@ class AudioBenchmark:
             Dictionary containing transcription result and performance metrics
         """
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
             result = self.whisper.transcribe(audio_data)
-            total_time = time.time() - start_time
+            total_time = time.perf_counter() - start_time
             
             metrics = {
                 "model": "whisper",
@@ -70,9 +80,9 @@ class AudioBenchmark:
             if self.deepspeech is None:
                 self.deepspeech = DeepSpeechTranscriber(model_path)
                 
-            start_time = time.time()
+            start_time = time.perf_counter()
             result = self.deepspeech.transcribe(audio_data)
-            total_time = time.time() - start_time
+            total_time = time.perf_counter() - start_time
             
             metrics = {
                 "model": "deepspeech",
@@ -94,6 +104,51 @@ class AudioBenchmark:
                 "error": str(e)
             }
     
+    def benchmark_deepspeech_streaming(self, corpus: Sequence[Dict[str, Any]], model_path: str,
+                                       scorer_path: Optional[str] = None, chunk_ms: int = 100,
+                                       repeats: int = 3) -> Dict[str, Any]:
+        """Streaming DeepSpeech over a corpus, fed in chunks as a live microphone would
+
+        Per-chunk latency (feedAudioContent plus intermediateDecode) is what a
+        caller waits for while audio is still arriving; finalize latency is
+        what is left after the speaker stops, and is the number that matters
+        for short commands.
+
+        Args:
+            corpus: Output of benchmark_corpus.synthesize_corpus
+            model_path: Path to DeepSpeech model file
+            scorer_path: Optional external scorer file
+            chunk_ms: Audio per fed chunk in milliseconds
+            repeats: Measured passes over the corpus
+
+        Returns:
+            Dictionary with chunk/finalize/decode percentiles in milliseconds
+        """
+        if self.deepspeech is None:
+            self.deepspeech = DeepSpeechTranscriber(model_path, scorer_path=scorer_path)
+        chunk_samples = TARGET_SAMPLE_RATE * chunk_ms // 1000
+        stages: Dict[str, List[float]] = {"decode": [], "chunk": [], "finalize": []}
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for clip in corpus:
+                timings: Dict[str, int] = {}
+                samples = to_int16(timed_decode(clip["wav"], timings))
+                stages["decode"].append((timings["decode"] + timings["resample"]) / 1e6)
+                with self.deepspeech.stream() as stream:
+                    for offset in range(0, len(samples), chunk_samples):
+                        chunk_started = time.perf_counter_ns()
+                        stream.feed(samples[offset:offset + chunk_samples])
+                        stream.intermediate()
+                        stages["chunk"].append((time.perf_counter_ns() - chunk_started) / 1e6)
+                    stages["finalize"].append(stream.finish()["finalize_time"] * 1e3)
+        elapsed = time.perf_counter() - started
+        return {
+            "model": "deepspeech",
+            "chunk_ms": chunk_ms,
+            "stages": {stage: percentiles(values) for stage, values in stages.items()},
+            "clips_per_second": len(corpus) * repeats / elapsed,
+        }
+
     def run_benchmarks(self, audio_data: bytes, deepspeech_model_path: str = None) -> List[Dict[str, Any]]:
         """Run benchmarks for all available transcription models
         
@@ -111,6 +166,117 @@ class AudioBenchmark:
         
         return results
 
+    def whisper_stages(self, audio_data: bytes, timings: Dict[str, int]) -> str:
+        """Transcribe one clip, recording each stage in ``timings`` (nanoseconds)
+
+        With the torch backend this is a single-window greedy decode split into
+        features, encoder and decoder; faster-whisper runs as one "inference"
+        stage since it does not expose the encoder separately.
+
+        Args:
+            audio_data: WAV file bytes
+            timings: Dict the stage durations are written into
+
+        Returns:
+            Transcribed text
+        """
+        samples = timed_decode(audio_data, timings)
+        started = time.perf_counter_ns()
+        if self.whisper.backend != "torch":
+            text = self.whisper._run_model(samples)["text"]
+            timings["inference"] = time.perf_counter_ns() - started
+            return text
+
+        import whisper
+        model = self.whisper.model
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(samples), n_mels=model.dims.n_mels).to(model.device)
+        features_done = time.perf_counter_ns()
+        with torch.no_grad():
+            audio_features = model.embed_audio(mel[None])
+        encoder_done = time.perf_counter_ns()
+        # decode() skips the encoder when handed encoder output instead of a spectrogram
+        result = whisper.decode(model, audio_features, whisper.DecodingOptions(fp16=False))[0]
+        timings["features"] = features_done - started
+        timings["encoder"] = encoder_done - features_done
+        timings["decoder"] = time.perf_counter_ns() - encoder_done
+        return result.text
+
+    def benchmark_corpus(self, corpus: Sequence[Dict[str, Any]], repeats: int = 3) -> Dict[str, Any]:
+        """Per-stage p50/p95/p99 (ms) and throughput of Whisper over a corpus
+
+        Args:
+            corpus: Output of benchmark_corpus.synthesize_corpus
+            repeats: Measured passes over the corpus
+
+        Returns:
+            Dictionary with stage percentiles and clips/audio seconds per second
+        """
+        started = time.perf_counter()
+        stages = time_stages(self.whisper_stages, corpus, repeats=repeats)
+        elapsed = time.perf_counter() - started
+        clips = len(corpus) * repeats
+        return {
+            "model": self.whisper.model_name,
+            "backend": self.whisper.backend,
+            "stages": stages,
+            "clips_per_second": clips / elapsed,
+            "audio_seconds_per_second": sum(clip["seconds"] + 0.6 for clip in corpus) * repeats / elapsed,
+        }
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Per-stage Whisper benchmark over a synthetic corpus")
+    parser.add_argument("--models", default="tiny.en", help="comma-separated Whisper model names, empty for none")
+    parser.add_argument("--backends", default="torch", help="comma-separated backends: torch, ctranslate2")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=os.path.join(LOG_DIR, "benchmarks", "ml_benchmark.json"))
+    parser.add_argument("--deepspeech-model", help="also benchmark streaming DeepSpeech with this .pbmm file")
+    parser.add_argument("--deepspeech-scorer", help="optional .scorer file for --deepspeech-model")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="audio per streamed DeepSpeech chunk")
+    parser.add_argument("--baseline", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed p50 slowdown, 0.1 = 10%%")
+    args = parser.parse_args(argv)
+
+    corpus = synthesize_corpus(args.seed)
+    configs = {}
+    for model_name in filter(None, args.models.split(",")):
+        for backend in args.backends.split(","):
+            name = f"whisper-{model_name}-{backend}"
+            try:
+                configs[name] = AudioBenchmark(model_name, backend).benchmark_corpus(corpus, args.repeats)
+            except AudioTranscriptionError as e:
+                logging.error(f"Skipping {name}: {e}")
+                configs[name] = {"error": str(e)}
+                continue
+            stages = configs[name]["stages"]
+            print(f"{name}: " + ", ".join(f"{stage} p50={stats['p50']:.1f}ms" for stage, stats in stages.items()))
+
+    if args.deepspeech_model:
+        name = f"deepspeech-stream-{args.chunk_ms}ms"
+        try:
+            configs[name] = AudioBenchmark(None).benchmark_deepspeech_streaming(
+                corpus, args.deepspeech_model, args.deepspeech_scorer, args.chunk_ms, args.repeats
+            )
+        except DeepSpeechError as e:
+            logging.error(f"Skipping {name}: {e}")
+            configs[name] = {"error": str(e)}
+        else:
+            stages = configs[name]["stages"]
+            print(f"{name}: " + ", ".join(f"{stage} p50={stats['p50']:.1f}ms" for stage, stats in stages.items()))
+
+    regressions = compare_results(load_results(args.baseline).get("configs", {}), configs, tolerance=args.tolerance)
+    save_results({"corpus_size": len(corpus), "repeats": args.repeats, "configs": configs,
+                  "regressions": regressions}, args.out)
+    for regression in regressions:
+        print(f"REGRESSION {regression['config']} {regression['stage']}: "
+              f"{regression['baseline_ms']:.1f}ms -> {regression['current_ms']:.1f}ms")
+    print(f"Saved results to {args.out}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    # python benchmark_audio.py --models tiny.en,base.en --backends torch,ctranslate2
+    raise SystemExit(main())
+
 # Example usage:
 # benchmark = AudioBenchmark()
 # results = benchmark.run_benchmarks(audio_bytes, 'path/to/deepspeech.pbmm')
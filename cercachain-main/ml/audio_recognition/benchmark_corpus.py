@@ -0,0 +1,223 @@
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import wave
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from audio_ingest import downmix, parse_wav, resample, to_float32
+
+# Command phrases the corpus stands in for, with their rough spoken length
+UTTERANCES = [
+    ("turn on the lights", 1.2),
+    ("switch off lights", 1.1),
+    ("play music", 0.8),
+    ("pause music", 0.8),
+    ("hello there", 0.9),
+    ("turn off the lights in the living room please", 2.8),
+]
+# (sample rate, channels) the corpus is rendered at, so decode and resample paths all get exercised
+FORMATS = [(16000, 1), (8000, 1), (44100, 2), (48000, 1)]
+
+def _syllable(rng: np.random.Generator, sample_rate: int, seconds: float) -> np.ndarray:
+    """A voiced burst: harmonics of a gliding pitch under two formant-like peaks"""
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    pitch = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    formants = rng.uniform([300, 900], [800, 2500])
+    signal = np.zeros_like(t)
+    for harmonic in range(1, 16):
+        frequency = harmonic * pitch.mean()
+        if frequency >= sample_rate / 2:
+            break
+        gain = sum(np.exp(-((frequency - f) / 200) ** 2) for f in formants) + 0.05
+        signal += gain / harmonic * np.sin(harmonic * phase)
+    envelope = np.sin(np.pi * np.linspace(0, 1, len(t))) ** 2
+    return signal * envelope
+
+def synthesize_utterance(seconds: float, sample_rate: int = 16000, channels: int = 1,
+                         seed: int = 0) -> bytes:
+    """Render a speech-like clip as 16-bit WAV
+
+    The audio is syllable-shaped noise, not intelligible speech: it has the
+    length, loudness and spectrum of a spoken command so decode, feature and
+    model timings are realistic, but transcripts are meaningless.
+
+    Args:
+        seconds: Length of the voiced part; 0.3s of silence is added either side
+        sample_rate: Output sample rate
+        channels: Output channel count (channels carry the same signal)
+        seed: Seed for the random generator, so every run renders identical bytes
+
+    Returns:
+        WAV file bytes
+    """
+    rng = np.random.default_rng(seed)
+    pieces = [np.zeros(int(0.3 * sample_rate))]
+    remaining = seconds
+    while remaining > 0:
+        length = min(remaining, rng.uniform(0.12, 0.3))
+        pieces.append(_syllable(rng, sample_rate, length))
+        pieces.append(np.zeros(int(rng.uniform(0.02, 0.08) * sample_rate)))
+        remaining -= length
+    pieces.append(np.zeros(int(0.3 * sample_rate)))
+    signal = np.concatenate(pieces)
+    signal += rng.normal(0, 0.002, len(signal))
+    signal = 0.5 * signal / max(np.abs(signal).max(), 1e-9)
+    pcm = np.repeat((signal * 32767).astype("<i2")[:, None], channels, axis=1)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+def synthesize_corpus(seed: int = 0) -> List[Dict[str, Any]]:
+    """Fixed benchmark corpus: every utterance in every format
+
+    Returns:
+        List of dicts with name, text, sample_rate, channels, seconds and wav bytes
+    """
+    corpus = []
+    for i, (text, seconds) in enumerate(UTTERANCES):
+        for sample_rate, channels in FORMATS:
+            corpus.append({
+                "name": f"{text.replace(' ', '_')}-{sample_rate}-{channels}ch",
+                "text": text,
+                "sample_rate": sample_rate,
+                "channels": channels,
+                "seconds": seconds,
+                "wav": synthesize_utterance(seconds, sample_rate, channels, seed=seed + i),
+            })
+    return corpus
+
+def timed_decode(audio_data: bytes, timings: Dict[str, int]) -> np.ndarray:
+    """decode_audio for WAV input, split into the decode and resample stages
+
+    Args:
+        audio_data: WAV file bytes
+        timings: Dict the stage durations are written into, in nanoseconds
+
+    Returns:
+        16kHz mono float32 samples
+    """
+    started = time.perf_counter_ns()
+    samples, sample_rate, channels = parse_wav(audio_data)
+    samples = downmix(to_float32(samples), channels)
+    decoded = time.perf_counter_ns()
+    samples = resample(samples, sample_rate)
+    timings["decode"] = decoded - started
+    timings["resample"] = time.perf_counter_ns() - decoded
+    return samples
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99, mean and max of a list of durations"""
+    if not values:
+        return {"count": 0}
+    array = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(array, [50, 95, 99])
+    return {
+        "count": len(array),
+        "mean": float(array.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": float(array.max()),
+    }
+
+def summarize_stages(runs: Sequence[Dict[str, int]]) -> Dict[str, Dict[str, float]]:
+    """Per-stage percentiles in milliseconds from a list of nanosecond timing dicts"""
+    stages: Dict[str, List[float]] = {}
+    for timings in runs:
+        for stage, nanoseconds in timings.items():
+            stages.setdefault(stage, []).append(nanoseconds / 1e6)
+    return {stage: percentiles(values) for stage, values in stages.items()}
+
+def time_stages(fn: Callable[[bytes, Dict[str, int]], Any], corpus: Sequence[Dict[str, Any]],
+                repeats: int = 3, warmup: int = 1) -> Dict[str, Dict[str, float]]:
+    """Run ``fn(wav, timings)`` over the corpus and summarize the stages it records
+
+    Args:
+        fn: Callable that processes one clip and fills ``timings`` (ns per stage)
+        corpus: Output of synthesize_corpus
+        repeats: Passes over the corpus that are measured
+        warmup: Unmeasured passes over the first clip
+
+    Returns:
+        Stage name -> percentiles in milliseconds, including a "total" stage
+    """
+    for _ in range(warmup):
+        fn(corpus[0]["wav"], {})
+    runs = []
+    for _ in range(repeats):
+        for clip in corpus:
+            timings: Dict[str, int] = {}
+            started = time.perf_counter_ns()
+            fn(clip["wav"], timings)
+            timings["total"] = time.perf_counter_ns() - started
+            runs.append(timings)
+    return summarize_stages(runs)
+
+def environment() -> Dict[str, Any]:
+    """Where the numbers came from, so results from different machines are not compared blindly"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def save_results(results: Dict[str, Any], path: str):
+    """Write benchmark results with environment metadata as JSON"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), **results}, f, indent=2)
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    metric: str = "p50", tolerance: float = 0.1) -> List[Dict[str, Any]]:
+    """Find stage timings that got slower than ``baseline`` by more than ``tolerance``
+
+    Both inputs map configuration names to {"stages": {stage: percentiles}}.
+
+    Args:
+        baseline: Previously saved results (the "configs" section)
+        current: New results in the same shape
+        metric: Percentile to compare
+        tolerance: Allowed relative slowdown, 0.1 = 10%
+
+    Returns:
+        One dict per regression with config, stage, baseline and current values
+    """
+    regressions = []
+    for config, result in current.items():
+        old_stages = baseline.get(config, {}).get("stages", {})
+        for stage, stats in result.get("stages", {}).items():
+            old = old_stages.get(stage, {}).get(metric)
+            new = stats.get(metric)
+            if old and new and new > old * (1 + tolerance):
+                regressions.append({
+                    "config": config,
+                    "stage": stage,
+                    "baseline_ms": old,
+                    "current_ms": new,
+                    "change": round(new / old - 1, 3),
+                })
+    return regressions
+
+def load_results(path: Optional[str]) -> Dict[str, Any]:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
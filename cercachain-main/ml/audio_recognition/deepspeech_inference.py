@@ -1,42 +1,189 @@
 import deepspeech
 import logging
-import numpy as np
 import os
-from typing import Dict, Any
-from pydub import AudioSegment
-import io
+import queue
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Union
 import time
+from audio_ingest import TARGET_SAMPLE_RATE, UploadLimitError, decode_audio, to_int16
+from ml_logging import setup_logging
 
-# Setup logging if not already configured
-log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
-os.makedirs(log_dir, exist_ok=True)
-if not logging.getLogger().handlers:
-    logging.basicConfig(
-        filename=os.path.join(log_dir, "ml_benchmarks.log"),
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s"
-    )
+setup_logging()
 
 class DeepSpeechError(Exception):
     """Custom exception for DeepSpeech transcription errors"""
     def __init__(self, error_type: str, message: str):
         self.error_type = error_type
+        self.message = message
         super().__init__(f"{error_type}: {message}")
 
+    def __reduce__(self):
+        # Raised inside process pool workers, so it has to survive pickling
+        return (self.__class__, (self.error_type, self.message))
+
+class DeepSpeechStream:
+    """One utterance decoded while its audio is still arriving
+
+    Wraps DeepSpeech's streaming API: each ``feed`` hands the new samples to
+    the decoder (feedAudioContent), so by the time the speaker stops only the
+    final beam search is left for ``finish``. The stream holds one pooled
+    model until it is finished or cancelled; use it as a context manager.
+
+    No serving path uses it yet, only benchmark_audio.py: the api app runs
+    engines in process pool workers, which cannot keep a stream open between
+    requests.
+    """
+
+    def __init__(self, model, release):
+        self._model = model
+        self._release = release
+        self._stream = model.createStream()
+        self._odd_byte = b""
+        self.samples = 0
+        self.chunk_times: List[float] = []
+        self.finalize_time: Optional[float] = None
+
+    def feed(self, chunk: Union[bytes, np.ndarray]):
+        """Decode the next piece of audio: 16kHz mono int16 bytes, or samples
+
+        Byte chunks may split a sample; the dangling byte is kept for the next call.
+        """
+        if self._stream is None:
+            raise DeepSpeechError("STREAM_CLOSED", "The stream was already finished")
+        if isinstance(chunk, np.ndarray):
+            samples = to_int16(chunk)
+        else:
+            data = self._odd_byte + bytes(chunk)
+            usable = len(data) - len(data) % 2
+            self._odd_byte = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=np.int16)
+        started = time.perf_counter()
+        try:
+            self._stream.feedAudioContent(samples)
+        except Exception as e:
+            self.cancel()
+            raise DeepSpeechError("TRANSCRIPTION_ERROR", f"Failed to decode audio chunk: {str(e)}")
+        self.chunk_times.append(time.perf_counter() - started)
+        self.samples += len(samples)
+
+    def intermediate(self) -> str:
+        """Best transcript of the audio fed so far; the stream stays open"""
+        if self._stream is None:
+            raise DeepSpeechError("STREAM_CLOSED", "The stream was already finished")
+        return self._stream.intermediateDecode()
+
+    def finish(self) -> Dict[str, Any]:
+        """Finalize the decode and give the model back to the pool
+
+        Returns:
+            Dictionary with the text, finalize time and audio duration in seconds
+        """
+        if self._stream is None:
+            raise DeepSpeechError("STREAM_CLOSED", "The stream was already finished")
+        started = time.perf_counter()
+        try:
+            text = self._stream.finishStream()
+        except Exception as e:
+            raise DeepSpeechError("TRANSCRIPTION_ERROR", f"Failed to finish stream: {str(e)}")
+        finally:
+            self._close()
+        self.finalize_time = time.perf_counter() - started
+        return {
+            "text": text,
+            "inference_time": sum(self.chunk_times) + self.finalize_time,
+            "finalize_time": self.finalize_time,
+            "audio_seconds": self.samples / TARGET_SAMPLE_RATE,
+            "model": "deepspeech"
+        }
+
+    def cancel(self):
+        """Drop the stream without decoding the rest and release the model"""
+        if self._stream is None:
+            return
+        try:
+            self._stream.freeStream()
+        except Exception as e:
+            logging.warning(f"Could not free DeepSpeech stream: {str(e)}")
+        self._close()
+
+    def _close(self):
+        self._stream = None
+        self._release(self._model)
+
+    def __enter__(self) -> "DeepSpeechStream":
+        return self
+
+    def __exit__(self, *exc):
+        self.cancel()
+
 class DeepSpeechTranscriber:
-    def __init__(self, model_path: str):
-        """Initialize DeepSpeech model for transcription
-        
+    def __init__(self, model_path: str, max_duration_s: Optional[float] = None,
+                 scorer_path: Optional[str] = None, pool_size: Optional[int] = 1,
+                 beam_width: Optional[int] = None, acquire_timeout: Optional[float] = None):
+        """Initialize a pool of DeepSpeech models for transcription
+
+        DeepSpeech decodes outside the GIL, so with ``pool_size`` models that
+        many threads transcribe at once; each call or stream checks one out.
+
         Args:
             model_path: Path to DeepSpeech model file (.pbmm)
+            max_duration_s: Longer audio is rejected with UploadLimitError before resampling
+            scorer_path: Optional external scorer (.scorer) enabling the language model
+            pool_size: Model instances to load; None sizes the pool to the CPU count
+            beam_width: Decoder beam width; None keeps the model's default
+            acquire_timeout: Seconds to wait for a free model; None waits indefinitely
         """
+        self.max_duration_s = max_duration_s
+        self.pool_size = pool_size or os.cpu_count() or 1
+        self.acquire_timeout = acquire_timeout
+        self._idle: "queue.Queue" = queue.Queue()
         try:
-            self.model = deepspeech.Model(model_path)
-            logging.info(f"Loaded DeepSpeech model from {model_path}")
+            for _ in range(self.pool_size):
+                model = deepspeech.Model(model_path)
+                if scorer_path:
+                    model.enableExternalScorer(scorer_path)
+                if beam_width:
+                    model.setBeamWidth(beam_width)
+                self._idle.put(model)
+            logging.info(
+                f"Loaded {self.pool_size} DeepSpeech model(s) from {model_path}"
+                + (f" with scorer {scorer_path}" if scorer_path else "")
+            )
         except Exception as e:
             logging.error(f"Failed to load DeepSpeech model: {str(e)}")
             raise DeepSpeechError("MODEL_LOAD_ERROR", f"Failed to load DeepSpeech model: {str(e)}")
 
+    def _acquire(self):
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise DeepSpeechError("POOL_EXHAUSTED", f"No DeepSpeech model free after {self.acquire_timeout}s")
+
+    @contextmanager
+    def model(self) -> Iterator[Any]:
+        """Check a model out of the pool for one blocking call"""
+        model = self._acquire()
+        try:
+            yield model
+        finally:
+            self._idle.put(model)
+
+    def stream(self) -> DeepSpeechStream:
+        """Start an incremental decode; the stream keeps its model until finished
+
+        Only benchmark_audio.py calls this; see DeepSpeechStream.
+        """
+        model = self._acquire()
+        try:
+            return DeepSpeechStream(model, self._idle.put)
+        except Exception as e:
+            self._idle.put(model)
+            raise DeepSpeechError("TRANSCRIPTION_ERROR", f"Failed to create stream: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"pool_size": self.pool_size, "idle": self._idle.qsize()}
+
     def preprocess_audio(self, audio_data: bytes) -> np.ndarray:
         """Convert audio data to format suitable for DeepSpeech
         
@@ -47,14 +194,10 @@ class DeepSpeechTranscriber:
             Numpy array of audio samples
         """
         try:
-            # Convert to WAV format
-            audio = AudioSegment.from_file(io.BytesIO(audio_data))
-            audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
-            
-            # Convert to numpy array
-            samples = np.array(audio.get_array_of_samples())
-            
-            return samples
+            # 16kHz mono int16, viewing the upload buffer directly when it already matches
+            return decode_audio(audio_data, dtype=np.int16, max_duration_s=self.max_duration_s)
+        except UploadLimitError:
+            raise
         except Exception as e:
             logging.error(f"Audio preprocessing failed: {str(e)}")
             raise DeepSpeechError("PREPROCESSING_ERROR", f"Failed to preprocess audio: {str(e)}")
@@ -73,9 +216,10 @@ class DeepSpeechTranscriber:
             audio_samples = self.preprocess_audio(audio_data)
             
             # Transcribe
-            start_time = time.time()
-            text = self.model.stt(audio_samples)
-            inference_time = time.time() - start_time
+            start_time = time.perf_counter()
+            with self.model() as model:
+                text = model.stt(audio_samples)
+            inference_time = time.perf_counter() - start_time
             
             # Log performance metrics
             logging.info(f"DeepSpeech transcription completed in {inference_time:.2f}s")
@@ -86,14 +230,43 @@ class DeepSpeechTranscriber:
                 "model": "deepspeech"
             }
             
-        except DeepSpeechError as e:
+        except (DeepSpeechError, UploadLimitError):
             # Re-raise custom exceptions
             raise
         except Exception as e:
             logging.error(f"Transcription failed: {str(e)}")
             raise DeepSpeechError("TRANSCRIPTION_ERROR", f"Failed to transcribe audio: {str(e)}")
 
+    def transcribe_samples(self, samples: np.ndarray) -> Dict[str, Any]:
+        """Transcribe already decoded 16kHz mono samples, e.g. one long-form window
+
+        Args:
+            samples: int16 or float32 samples
+
+        Returns:
+            Dictionary with the text and a single segment spanning the samples
+        """
+        try:
+            with self.model() as model:
+                text = model.stt(to_int16(samples))
+        except DeepSpeechError:
+            raise
+        except Exception as e:
+            logging.error(f"Transcription failed: {str(e)}")
+            raise DeepSpeechError("TRANSCRIPTION_ERROR", f"Failed to transcribe audio: {str(e)}")
+        return {
+            "text": text,
+            "segments": [{"start": 0.0, "end": len(samples) / TARGET_SAMPLE_RATE, "text": text}]
+        }
+
 # Example usage:
-# transcriber = DeepSpeechTranscriber('path/to/model.pbmm')
+# transcriber = DeepSpeechTranscriber('path/to/model.pbmm', scorer_path='path/to/model.scorer', pool_size=None)
 # result = transcriber.transcribe(audio_bytes)
-# print(result["text"])
\ No newline at end of file
+# print(result["text"])
+#
+# Decoding while audio arrives (16kHz mono int16 chunks):
+# with transcriber.stream() as stream:
+#     for chunk in chunks:
+#         stream.feed(chunk)
+#         print(stream.intermediate())
+#     print(stream.finish()["text"])
\ No newline at end of file
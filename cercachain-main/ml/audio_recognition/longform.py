@@ -0,0 +1,204 @@
+import asyncio
+import re
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from audio_ingest import TARGET_SAMPLE_RATE
+
+_WORD = re.compile(r"[\w']+")
+
+class Window(NamedTuple):
+    """A slice of the recording sent to one worker, in sample offsets
+
+    ``keep_start``/``keep_end`` is the part this window owns; the rest is
+    overlap shared with its neighbours for context.
+    """
+    index: int
+    start: int
+    end: int
+    keep_start: int
+    keep_end: int
+
+def frame_levels(samples: np.ndarray, frame_size: int) -> np.ndarray:
+    """Mean-square energy of each complete frame, vectorized"""
+    n_frames = len(samples) // frame_size
+    frames = samples[:n_frames * frame_size].reshape(n_frames, frame_size)
+    return np.mean(np.square(frames, dtype=np.float32), axis=1)
+
+def plan_windows(samples: np.ndarray, sample_rate: int = TARGET_SAMPLE_RATE, window_s: float = 28.0,
+                 overlap_s: float = 1.0, search_s: float = 6.0, frame_ms: int = 30) -> List[Window]:
+    """Split a recording at its quietest points into overlapping windows
+
+    Each cut is placed at the lowest-energy frame in the last ``search_s``
+    seconds before ``window_s``, so words are rarely split. Windows then reach
+    ``overlap_s`` past each cut on both sides; with the defaults a window
+    never exceeds Whisper's 30 second context.
+
+    Args:
+        samples: Mono samples
+        sample_rate: Sample rate of ``samples``
+        window_s: Maximum owned length of a window
+        overlap_s: Context added on each side of a cut
+        search_s: How far back from ``window_s`` to look for silence
+        frame_ms: Energy frame length
+
+    Returns:
+        Windows in order, covering the whole recording
+    """
+    total = len(samples)
+    frame_size = max(1, sample_rate * frame_ms // 1000)
+    window = int(window_s * sample_rate)
+    search = int(min(search_s, window_s) * sample_rate)
+    overlap = int(overlap_s * sample_rate)
+
+    levels = frame_levels(samples, frame_size)
+    cuts = [0]
+    while total - cuts[-1] > window:
+        lo = (cuts[-1] + window - search) // frame_size
+        hi = max(lo + 1, (cuts[-1] + window) // frame_size)
+        quietest = lo + int(np.argmin(levels[lo:hi]))
+        cuts.append(max(cuts[-1] + frame_size, quietest * frame_size + frame_size // 2))
+    cuts.append(total)
+
+    return [
+        Window(i, max(0, keep_start - overlap), min(total, keep_end + overlap), keep_start, keep_end)
+        for i, (keep_start, keep_end) in enumerate(zip(cuts, cuts[1:]))
+    ]
+
+def _words(text: str) -> List[str]:
+    return [word.lower() for word in _WORD.findall(text)]
+
+def drop_repeated_prefix(previous: str, text: str, max_words: int = 8) -> str:
+    """Remove the start of ``text`` that repeats the end of ``previous``
+
+    Overlapping windows often both transcribe the words around a cut. The
+    longest run of up to ``max_words`` words ending ``previous`` and starting
+    ``text`` (ignoring case and punctuation) is dropped from ``text``.
+    """
+    tail = _words(previous)[-max_words:]
+    head = _words(text)
+    for size in range(min(len(tail), len(head)), 0, -1):
+        if tail[-size:] == head[:size]:
+            matches = list(_WORD.finditer(text))
+            return text[matches[size - 1].end():].lstrip(" ,.;:!?-")
+    return text
+
+class LongFormStitcher:
+    """Turns per-window results, arriving in any order, into ordered segments
+
+    Segment times are relative to their window; they come out absolute, in
+    seconds. A segment is kept only by the window owning its midpoint, and
+    words repeated across a cut are removed.
+    """
+
+    def __init__(self, windows: Sequence[Window], sample_rate: int = TARGET_SAMPLE_RATE):
+        self.windows = windows
+        self.sample_rate = sample_rate
+        self._results: Dict[int, List[Dict[str, Any]]] = {}
+        self._next = 0
+        self._last_text = ""
+        self.segments_emitted = 0
+
+    @property
+    def done(self) -> bool:
+        return self._next >= len(self.windows)
+
+    def add(self, index: int, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Record window ``index``'s segments and return every segment now ready, in order"""
+        self._results[index] = segments
+        ready = []
+        while self._next in self._results:
+            ready.extend(self._stitch(self.windows[self._next], self._results.pop(self._next)))
+            self._next += 1
+        return ready
+
+    def _stitch(self, window: Window, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        offset = window.start / self.sample_rate
+        keep_start = window.keep_start / self.sample_rate
+        keep_end = window.keep_end / self.sample_rate
+        stitched = []
+        for segment in segments:
+            start = offset + segment["start"]
+            end = offset + segment["end"]
+            if len(segments) == 1:
+                # One segment for the whole window (e.g. DeepSpeech): report the owned span
+                start, end = max(start, keep_start), min(end, keep_end)
+            elif not keep_start <= (start + end) / 2 < keep_end:
+                continue
+            text = drop_repeated_prefix(self._last_text, segment["text"].strip())
+            if not text:
+                continue
+            self._last_text = text
+            stitched.append({
+                "id": self.segments_emitted,
+                "window": window.index,
+                "start": round(start, 3),
+                "end": round(end, 3),
+                "text": text,
+            })
+            self.segments_emitted += 1
+        return stitched
+
+def iter_segments(samples: np.ndarray, transcribe: Callable[[np.ndarray], List[Dict[str, Any]]],
+                  executor: Executor, max_parallel: Optional[int] = None,
+                  sample_rate: int = TARGET_SAMPLE_RATE, **window_options) -> Iterator[Dict[str, Any]]:
+    """Transcribe a long recording window by window on ``executor``, yielding stitched segments
+
+    At most ``max_parallel`` windows are outstanding, so a single recording
+    cannot flood the pool; only those windows' samples are copied to workers.
+
+    Args:
+        samples: Mono samples at ``sample_rate``
+        transcribe: Picklable function mapping a window's samples to segments
+            ({"start", "end", "text"}, seconds relative to the window)
+        executor: Pool the windows run on
+        max_parallel: Outstanding window limit; defaults to every window
+        sample_rate: Sample rate of ``samples``
+        **window_options: Passed to plan_windows
+
+    Yields:
+        Segments with absolute timestamps, in order, as soon as they are final
+    """
+    windows = plan_windows(samples, sample_rate, **window_options)
+    stitcher = LongFormStitcher(windows, sample_rate)
+    pending = {}
+    queued = iter(windows)
+    limit = max_parallel or len(windows)
+    try:
+        while not stitcher.done:
+            for window in queued:
+                pending[executor.submit(transcribe, samples[window.start:window.end])] = window.index
+                if len(pending) >= limit:
+                    break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield from stitcher.add(pending.pop(future), future.result())
+    finally:
+        for future in pending:
+            future.cancel()
+
+async def aiter_segments(samples: np.ndarray, transcribe: Callable[[np.ndarray], List[Dict[str, Any]]],
+                         executor: Optional[Executor], max_parallel: Optional[int] = None,
+                         sample_rate: int = TARGET_SAMPLE_RATE, **window_options) -> AsyncIterator[Dict[str, Any]]:
+    """Async variant of iter_segments for event-loop callers; ``executor=None`` uses the loop's default pool"""
+    loop = asyncio.get_running_loop()
+    windows = plan_windows(samples, sample_rate, **window_options)
+    stitcher = LongFormStitcher(windows, sample_rate)
+    pending = {}
+    queued = iter(windows)
+    limit = max_parallel or len(windows)
+    try:
+        while not stitcher.done:
+            for window in queued:
+                future = loop.run_in_executor(executor, transcribe, samples[window.start:window.end])
+                pending[future] = window.index
+                if len(pending) >= limit:
+                    break
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in finished:
+                for segment in stitcher.add(pending.pop(future), future.result()):
+                    yield segment
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,137 @@
+"""Off-event-loop execution with bounded admission, shared by both apps.
+
+Each app creates an ``InferenceExecutor`` with its own pool initializer,
+which loads that app's models once per worker process. Requests hold an
+in-flight slot while they use the pool (``admit``) and share one
+``Deadline`` across their stages. Load shedding raises OverloadedError, and
+running out of time raises DeadlineExceededError. Each app maps these to
+its own HTTP responses.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from ml_logging import correlation_id, run_with_correlation_id, setup_worker_logging, worker_log_queue
+
+class OverloadedError(Exception):
+    """Raised when the server is at its in-flight limit and sheds load"""
+    def __init__(self, message="Server is overloaded", retry_after=1):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+class DeadlineExceededError(Exception):
+    """Raised when a request runs past its deadline"""
+    def __init__(self, message="Request deadline exceeded"):
+        self.message = message
+        super().__init__(self.message)
+
+class Deadline:
+    """Per-request time budget shared by every stage of a request"""
+
+    def __init__(self, seconds: Optional[float]):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        remaining = self.expires_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError()
+        return remaining
+
+class InferenceExecutor:
+    """Runs blocking inference work off the event loop with bounded admission.
+
+    ``kind`` selects the backend: ``process`` (``initializer`` preloads each
+    worker), ``thread`` or ``inline`` (runs on the event loop, for debugging
+    only). The initializer is called with the queue the worker logs to.
+    """
+
+    def __init__(self, kind: str = "process", max_workers: Optional[int] = None,
+                 max_in_flight: int = 16, retry_after: int = 1,
+                 initializer: Callable[[Any], None] = setup_worker_logging,
+                 start_method: Optional[str] = None, thread_name_prefix: str = "inference"):
+        self.kind = kind
+        self.start_method = start_method
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.initializer = initializer
+        self.thread_name_prefix = thread_name_prefix
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.pool = self._create_pool()
+
+    def _create_pool(self) -> Optional[Executor]:
+        if self.kind == "process":
+            context = multiprocessing.get_context(self.start_method) if self.start_method else None
+            return ProcessPoolExecutor(max_workers=self.max_workers, initializer=self.initializer,
+                                       initargs=(worker_log_queue(self.start_method),), mp_context=context)
+        if self.kind == "thread":
+            return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.thread_name_prefix)
+        if self.kind == "inline":
+            return None
+        raise ValueError(f"Unknown executor kind: {self.kind}")
+
+    async def prestart(self):
+        """Start every pool worker (running its initializer) now rather than on the first request"""
+        if self.pool is not None:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(self.pool, os.getpid) for _ in range(self.max_workers)])
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+
+    @asynccontextmanager
+    async def admit(self):
+        """Reserve an in-flight slot, shedding load when none is free"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self):
+        """admit() for slots held past the handler, e.g. by a streaming response"""
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            raise OverloadedError(f"{self.in_flight} requests in flight", retry_after=self.retry_after)
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+
+    async def run(self, fn: Callable[..., Any], *args, deadline: Optional[Deadline] = None) -> Any:
+        """Run ``fn(*args)`` on the pool, cancelling it if the deadline passes first"""
+        if self.pool is None:
+            return fn(*args)
+        timeout = deadline.remaining() if deadline else None
+        future = asyncio.get_running_loop().run_in_executor(
+            self.pool, run_with_correlation_id, correlation_id.get(), fn, *args
+        )
+        return await self.wait(future, timeout)
+
+    async def wait(self, awaitable, timeout: Optional[float]) -> Any:
+        # Cancelling the wrapper also cancels the pool future while it is still queued
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise DeadlineExceededError()
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
@@ -0,0 +1,218 @@
+"""JSON-lines logging shared by both apps and the ML scripts.
+
+Every process logs through a bounded in-process queue drained by a
+background listener thread. Request handlers only enqueue records, and
+formatting and disk I/O happen on the listener. When the queue is full,
+records are dropped and counted rather than blocking the caller.
+
+Process pool workers do not write any files. They send their records over a
+multiprocessing queue (``worker_log_queue``) to the parent, whose listener
+writes them with its own handlers. Only one process ever rotates a log file.
+
+The apps' logging_config modules pick the handlers (file path, console) and
+call ``start_logging``. Standalone runs of the ML scripts call ``setup_logging``.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
+
+# Request correlation ID, set per request by the app middleware
+correlation_id: ContextVar[str] = ContextVar("correlation_id", default="-")
+
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "correlation_id"}
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+class CorrelationIdFilter(logging.Filter):
+    """Stamps records with the current correlation ID; runs in the calling thread, before queueing"""
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra`` fields"""
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", "-"),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RESERVED})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Already formatted by a pool worker (see WorkerQueueHandler)
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller: records are dropped and counted when full"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class WorkerQueueHandler(DroppingQueueHandler):
+    """Sends a pool worker's records to the parent process, which formats and writes them"""
+    def prepare(self, record):
+        # Records are pickled on the way, so arguments, tracebacks and extras become plain values
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        for key, value in list(vars(record).items()):
+            if key not in _RESERVED and not isinstance(value, (str, int, float, bool, type(None), list, dict)):
+                setattr(record, key, str(value))
+        return record
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket for noisy loggers, with optional random sampling on top"""
+    def __init__(self, rate: float = 10.0, burst: int = 50, sample_rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.sample_rate = sample_rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.suppressed += 1
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return False
+            self.tokens -= 1
+        return True
+
+def run_with_correlation_id(cid, fn, *args):
+    """Pool entry point that carries the caller's correlation ID into the worker"""
+    token = correlation_id.set(cid)
+    try:
+        return fn(*args)
+    finally:
+        correlation_id.reset(token)
+
+_state = {"handler": None, "listener": None, "handlers": [], "pid": None, "limiters": {},
+          "worker_queue": None, "worker_listener": None}
+
+def start_logging(handlers: Sequence[logging.Handler], level="INFO", queue_size: int = 10000):
+    """Route all of this process's logging through a bounded queue to ``handlers``
+
+    Idempotent per process; returns the listener.
+    """
+    if _state["pid"] == os.getpid():
+        return _state["listener"]
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(CorrelationIdFilter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    _state.update(handler=handler, listener=listener, handlers=list(handlers), pid=os.getpid(),
+                  worker_queue=None, worker_listener=None)
+    return listener
+
+def worker_log_queue(start_method: Optional[str] = None, queue_size: int = 10000):
+    """The queue pool workers log to, drained into this process's handlers
+
+    Created on first use, so processes without a pool never start its
+    listener. Pass it to ``setup_worker_logging`` in the pool initializer.
+    Returns None when logging was not set up in this process.
+    """
+    if _state["pid"] != os.getpid():
+        return None
+    if _state["worker_queue"] is None:
+        context = multiprocessing.get_context(start_method) if start_method else multiprocessing
+        log_queue = context.Queue(maxsize=queue_size)
+        listener = logging.handlers.QueueListener(log_queue, *_state["handlers"], respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        _state.update(worker_queue=log_queue, worker_listener=listener)
+    return _state["worker_queue"]
+
+def setup_worker_logging(log_queue=None):
+    """Pool initializer hook: send this worker's records to the parent's ``worker_log_queue``
+
+    Without a queue, records go to stderr; workers never write the parent's files.
+    """
+    if _state["pid"] == os.getpid():
+        return
+    if log_queue is not None:
+        handler = WorkerQueueHandler(log_queue)
+    else:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+    handler.addFilter(CorrelationIdFilter())
+    logging.getLogger().handlers = [handler]
+    # Inherited from a forked parent: its listener threads do not exist here
+    _state.update(handler=handler if log_queue is not None else None, listener=None, handlers=[],
+                  pid=os.getpid(), worker_queue=None, worker_listener=None)
+
+def rate_limit(logger_name, rate=10.0, burst=50, sample_rate=1.0):
+    """Attach a RateLimitFilter to a noisy logger and return it"""
+    limiter = RateLimitFilter(rate, burst, sample_rate)
+    logging.getLogger(logger_name).addFilter(limiter)
+    _state["limiters"][logger_name] = limiter
+    return limiter
+
+def logging_stats():
+    handler = _state["handler"]
+    return {
+        "queued": handler.queue.qsize() if handler else 0,
+        "dropped": handler.dropped if handler else 0,
+        "suppressed": {name: limiter.suppressed for name, limiter in _state["limiters"].items()},
+    }
+
+def setup_logging(filename: str = "ml_benchmarks.log", queue_size: int = 10000):
+    """Queue-backed JSON-lines logging for standalone runs of the ML scripts
+
+    Does nothing when logging is already configured, e.g. when the modules
+    are imported by one of the apps, so library imports never take over
+    the host's root logger.
+
+    Args:
+        filename: Log file name inside ml/logs
+        queue_size: Maximum number of records waiting to be written
+    """
+    if logging.getLogger().handlers:
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+    file_handler = logging.FileHandler(os.path.join(LOG_DIR, filename))
+    file_handler.setFormatter(JsonFormatter())
+    start_logging([file_handler], logging.INFO, queue_size)
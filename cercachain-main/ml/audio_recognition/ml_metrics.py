@@ -0,0 +1,191 @@
+"""Prometheus-style metrics shared by both apps.
+
+Counters and histograms record into per-thread shards, gauges are read at
+scrape time, and ``MetricsRegistry.render`` produces the text exposition
+format for /metrics. Each app's metrics.py creates its registry and defines
+its own metrics on top of this module.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# Seconds; spans sub-millisecond reads and classification up to multi-second recognition
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class _Sharded:
+    """Per-thread storage: each thread writes only its own shard, so recording needs no lock.
+
+    Scrapes sum the shards; a read racing a write can be one observation
+    behind, which is fine for monitoring.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple[str, ...], Any]] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict[Tuple[str, ...], Any]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            # Only taken once per thread
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            shards = list(self._shards)
+        # list() copies the items atomically under the GIL
+        return [item for shard in shards for item in list(shard.items())]
+
+    def _labels(self, labels: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        totals: Dict[Tuple[str, ...], float] = {}
+        for labels, value in self._series():
+            totals[labels] = totals.get(labels, 0.0) + value
+        return [f"{self.name}{self._labels(labels)} {_number(value)}" for labels, value in sorted(totals.items())]
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            # One slot per bucket plus +Inf, then sum and count
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def observe_ns(self, nanoseconds: int, *labels: str):
+        self.observe(nanoseconds / 1e9, *labels)
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        totals: Dict[Tuple[str, ...], List[float]] = {}
+        for labels, series in self._series():
+            total = totals.setdefault(labels, [0] * len(series))
+            for i, value in enumerate(series):
+                total[i] += value
+        lines = []
+        for labels, series in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{self._labels(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {series[-1]}")
+        return lines
+
+class Gauge:
+    """Read at scrape time from a callback returning a value or {labels: value}"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Any], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        value = self.fn()
+        if not self.labelnames:
+            return [f"{self.name} {_number(value)}"]
+        lines = []
+        for labels, v in sorted(value.items()):
+            pairs = ",".join(f'{name}="{_escape(label)}"' for name, label in zip(self.labelnames, labels))
+            lines.append(f"{self.name}{{{pairs}}} {_number(v)}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe_ns(time.perf_counter_ns() - self.started, *self.labels)
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Any], labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, fn, labelnames))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def timed(fn: Callable[..., Any], *args) -> Tuple[Any, int]:
+    """Run ``fn(*args)`` and return (result, nanoseconds); picklable for process pools"""
+    started = time.perf_counter_ns()
+    result = fn(*args)
+    return result, time.perf_counter_ns() - started
+
+def resident_memory_bytes() -> int:
+    """Current RSS from /proc, falling back to the peak RSS elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+        except ImportError:
+            # Windows: no cheap portable source
+            return 0
+        # ru_maxrss is KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+def make_key(audio_data: bytes, model: str, **options) -> str:
+    """Content address for a transcription: audio hash + model + decode options"""
+    digest = hashlib.sha256(audio_data).hexdigest()
+    opts = json.dumps(options, sort_keys=True, default=str)
+    return f"transcription:{model}:{hashlib.sha256(opts.encode()).hexdigest()[:16]}:{digest}"
+
+class LRUCache:
+    """Bounded in-process LRU with a per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+class RedisBackend:
+    """Shared cache tier on any Redis-protocol store (Redis, KeyDB, a local stand-in)"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", ttl: float = 600.0, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self.client = client
+        self.ttl = int(ttl)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any):
+        self.client.set(key, json.dumps(value), ex=self.ttl)
+
+class _Inflight:
+    """One key's computation on the event loop and how many callers still wait for it"""
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class TranscriptionCache:
+    """Two-tier transcription cache with request coalescing.
+
+    Lookups go to the local LRU first, then to the optional shared backend.
+    Concurrent misses on the same key wait for the first caller's result
+    instead of running inference again. Shared tier failures are counted
+    and otherwise ignored so an unavailable store never fails a request.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 600.0, backend=None):
+        self.local = LRUCache(max_entries, ttl)
+        self.backend = backend
+        self.counters = {"hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0, "abandoned": 0, "backend_errors": 0}
+        self._inflight: Dict[str, threading.Event] = {}
+        self._ainflight: Dict[str, _Inflight] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._local_get(key)
+        if value is None and self.backend is not None:
+            value = self._shared_get(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        if self.backend is not None:
+            self._shared_set(key, value)
+
+    def _local_get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.counters["hits"] += 1
+        return value
+
+    def _shared_get(self, key: str) -> Optional[Any]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            self.counters["backend_errors"] += 1
+            logging.warning(f"Shared cache read failed: {e}")
+            return None
+        if value is not None:
+            self.counters["shared_hits"] += 1
+            self.local.set(key, value)
+        return value
+
+    def _shared_set(self, key: str, value: Any):
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            self.counters["backend_errors"] += 1
+            logging.warning(f"Shared cache write failed: {e}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Blocking lookup; returns (value, cached)"""
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value, True
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    break
+            self.counters["coalesced"] += 1
+            event.wait()
+        self.counters["misses"] += 1
+        try:
+            value = compute()
+            self.set(key, value)
+            return value, False
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Event-loop lookup; returns (value, cached)
+
+        Only the local LRU is read on the event loop. The shared backend is a
+        blocking client, so its reads and writes run on the loop's default
+        thread pool. Lookup and computation run as one task per key:
+        concurrent misses share one backend read and one computation. A
+        caller that times out or disconnects leaves it running for the
+        others, and the last one to leave cancels it, releasing whatever
+        slots and pool time it holds.
+        """
+        value = self._local_get(key)
+        if value is not None:
+            return value, True
+        inflight = self._ainflight.get(key)
+        if inflight is None:
+            task = asyncio.ensure_future(self._acompute(key, compute))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            inflight = self._ainflight[key] = _Inflight(task)
+            joined = False
+        else:
+            self.counters["coalesced"] += 1
+            joined = True
+        inflight.waiters += 1
+        try:
+            value, cached = await asyncio.shield(inflight.task)
+        finally:
+            inflight.waiters -= 1
+            if not inflight.waiters and not inflight.task.done():
+                self.counters["abandoned"] += 1
+                inflight.task.cancel()
+                # Later callers start afresh rather than join a cancelled computation
+                if self._ainflight.get(key) is inflight:
+                    del self._ainflight[key]
+        return value, cached or joined
+
+    async def _acompute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        loop = asyncio.get_running_loop()
+        try:
+            if self.backend is not None:
+                value = await loop.run_in_executor(None, self._shared_get, key)
+                if value is not None:
+                    return value, True
+            self.counters["misses"] += 1
+            value = await compute()
+            self.local.set(key, value)
+            if self.backend is not None:
+                # Callers get the result now; the shared copy is written in the background
+                loop.run_in_executor(None, self._shared_set, key, value)
+            return value, False
+        finally:
+            inflight = self._ainflight.get(key)
+            if inflight is not None and inflight.task is asyncio.current_task():
+                del self._ainflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "entries": len(self.local),
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+            "shared_tier": self.backend is not None,
+        }
@@ -0,0 +1,121 @@
+import struct
+from typing import Awaitable, Callable, Optional
+
+from audio_ingest import AudioDecodeError, UploadLimitError, check_duration, is_wav, wav_header
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Give up looking for the WAV data chunk after this much; decoding reports the error
+MAX_WAV_HEADER_BYTES = 64 * 1024
+# Streaming writers put these in size fields they cannot know yet
+UNKNOWN_SIZES = (0, 0xFFFFFFFF)
+
+class UploadReader:
+    """Collects an upload chunk by chunk into one buffer, enforcing limits as bytes arrive
+
+    The buffer is allocated once when the size is known up front (a size
+    hint, or the RIFF header of a WAV) and grown in place otherwise, so an
+    upload costs a single copy of itself plus one chunk. Oversized uploads
+    are rejected as soon as their declared size or the bytes received so far
+    cross a limit. Compressed audio only has its duration checked when it is
+    decoded (see decode_audio).
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, max_duration_s: Optional[float] = None,
+                 size_hint: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_duration_s = max_duration_s
+        self.buffer = bytearray()
+        self.received = 0
+        self.peak_buffered = 0
+        self._header_done = False
+        self._data_offset = 0
+        self._byte_rate = 0
+        if size_hint:
+            self._check_bytes(size_hint)
+            self.buffer = bytearray(size_hint)
+
+    @property
+    def duration_s(self) -> Optional[float]:
+        """Audio received so far in seconds; None for compressed audio"""
+        if not self._byte_rate:
+            return None
+        return max(0, self.received - self._data_offset) / self._byte_rate
+
+    def feed(self, chunk: bytes):
+        end = self.received + len(chunk)
+        self._check_bytes(end)
+        # In place while within the preallocated buffer, appends past it
+        self.buffer[self.received:end] = chunk
+        self.received = end
+        self.peak_buffered = max(self.peak_buffered, len(self.buffer) + len(chunk))
+        if not self._header_done:
+            self._read_header()
+        if self._byte_rate:
+            check_duration(self.duration_s, self.max_duration_s)
+
+    def finish(self) -> bytearray:
+        """The upload, trimmed to what actually arrived"""
+        del self.buffer[self.received:]
+        return self.buffer
+
+    def _check_bytes(self, size: int):
+        if self.max_bytes and size > self.max_bytes:
+            raise UploadLimitError("UPLOAD_TOO_LARGE", f"upload is over the {self.max_bytes} byte limit")
+
+    def _read_header(self):
+        if self.received < 12:
+            return
+        # Copies at most the header probe, so the buffer stays resizable
+        head = bytes(self.buffer[:min(self.received, MAX_WAV_HEADER_BYTES)])
+        if not is_wav(head):
+            self._header_done = True
+            return
+        try:
+            header = wav_header(head)
+        except AudioDecodeError:
+            # Malformed; decoding reports it
+            self._header_done = True
+            return
+        if header is None:
+            self._header_done = self.received >= MAX_WAV_HEADER_BYTES
+            return
+        self._header_done = True
+        fmt, self._data_offset, data_size = header
+        _, channels, sample_rate, _, _, bits = fmt
+        self._byte_rate = channels * sample_rate * (bits // 8)
+        if not self._byte_rate:
+            return
+        if data_size not in UNKNOWN_SIZES:
+            check_duration(data_size / self._byte_rate, self.max_duration_s)
+        riff_size = struct.unpack_from("<I", head, 4)[0]
+        if riff_size not in UNKNOWN_SIZES and len(self.buffer) == self.received:
+            total = riff_size + 8
+            self._check_bytes(total)
+            # Allocate the whole file now; only the header read so far is copied
+            buffer = bytearray(total)
+            buffer[:self.received] = self.buffer
+            self.buffer = buffer
+
+async def read_upload(read: Callable[[int], Awaitable[bytes]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      **limits) -> UploadReader:
+    """Read an upload through ``read`` (e.g. UploadFile.read) in ``chunk_size`` pieces
+
+    Args:
+        read: Async callable returning up to n bytes, empty at the end
+        chunk_size: Bytes per read
+        **limits: max_bytes, max_duration_s and size_hint for UploadReader
+
+    Returns:
+        The reader; ``finish()`` gives the bytes and ``peak_buffered`` the
+        most memory held at once
+
+    Raises:
+        UploadLimitError: As soon as a limit is crossed, without reading the rest
+    """
+    reader = UploadReader(**limits)
+    while True:
+        chunk = await read(chunk_size)
+        if not chunk:
+            break
+        reader.feed(chunk)
+    return reader
@@ -1,57 +1,71 @@
 import whisper
 import logging
-from pydub import AudioSegment
-import io
-import os
+import torch
+import numpy as np
+import time
 from typing import Optional, Dict, Any
+from audio_ingest import TARGET_SAMPLE_RATE, UploadLimitError, decode_audio
+from transcription_cache import TranscriptionCache, make_key
+from ml_logging import setup_logging
 
-# Setup logging
-log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    filename=os.path.join(log_dir, "ml_benchmarks.log"),
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+setup_logging()
 
 class AudioTranscriptionError(Exception):
     """Custom exception for audio transcription errors"""
     def __init__(self, error_type: str, message: str):
         self.error_type = error_type
+        self.message = message
         super().__init__(f"{error_type}: {message}")
 
+    def __reduce__(self):
+        # Raised inside process pool workers, so it has to survive pickling
+        return (self.__class__, (self.error_type, self.message))
+
 class WhisperTranscriber:
-    def __init__(self, model_name: str = "tiny.en"):
+    def __init__(self, model_name: str = "tiny.en", cache: Optional[TranscriptionCache] = None,
+                 backend: str = "torch", cpu_threads: Optional[int] = None,
+                 max_duration_s: Optional[float] = None):
         """Initialize Whisper model for transcription
         
         Args:
             model_name: Name of the Whisper model to use (tiny.en is fastest)
+            cache: Optional transcription cache shared between transcribers
+            backend: "torch" (openai-whisper) or "ctranslate2" (faster-whisper, int8)
+            cpu_threads: Intra-op threads for the backend; None keeps its default
+            max_duration_s: Longer audio is rejected with UploadLimitError before resampling
         """
+        self.model_name = model_name
+        self.max_duration_s = max_duration_s
+        self.cache = cache
+        self.backend = backend
         try:
-            self.model = whisper.load_model(model_name)
-            logging.info(f"Loaded Whisper model: {model_name}")
+            if backend == "torch":
+                if cpu_threads:
+                    torch.set_num_threads(cpu_threads)
+                self.model = whisper.load_model(model_name, device="cpu")
+            elif backend == "ctranslate2":
+                from faster_whisper import WhisperModel
+                self.model = WhisperModel(model_name, device="cpu", compute_type="int8", cpu_threads=cpu_threads or 0)
+            else:
+                raise ValueError(f"Unknown backend: {backend}")
+            logging.info(f"Loaded Whisper model: {model_name} ({backend})")
         except Exception as e:
             logging.error(f"Failed to load Whisper model: {str(e)}")
             raise AudioTranscriptionError("MODEL_LOAD_ERROR", f"Failed to load Whisper model: {str(e)}")
 
-    def preprocess_audio(self, audio_data: bytes) -> str:
-        """Convert audio data to WAV format suitable for Whisper
+    def preprocess_audio(self, audio_data: bytes) -> np.ndarray:
+        """Decode audio data into the 16kHz mono float32 array Whisper expects
         
         Args:
             audio_data: Raw audio bytes
             
         Returns:
-            Path to temporary WAV file
+            Numpy array of audio samples
         """
         try:
-            # Convert to WAV format
-            audio = AudioSegment.from_file(io.BytesIO(audio_data))
-            audio = audio.set_frame_rate(16000).set_channels(1)  # Whisper expects 16kHz mono
-            
-            # Save to temporary file
-            temp_path = os.path.join(os.path.dirname(__file__), "temp.wav")
-            audio.export(temp_path, format="wav")
-            return temp_path
+            return decode_audio(audio_data, max_duration_s=self.max_duration_s)
+        except UploadLimitError:
+            raise
         except Exception as e:
             logging.error(f"Audio preprocessing failed: {str(e)}")
             raise AudioTranscriptionError("PREPROCESSING_ERROR", f"Failed to preprocess audio: {str(e)}")
@@ -65,22 +79,25 @@ class WhisperTranscriber:
         Returns:
             Dictionary containing transcription result and metadata
         """
+        if self.cache is None:
+            return self._transcribe(audio_data)
+        key = make_key(audio_data, f"whisper/{self.model_name}", backend=self.backend)
+        result, cached = self.cache.get_or_compute(key, lambda: self._transcribe(audio_data))
+        return {**result, "cached": cached}
+
+    def _transcribe(self, audio_data: bytes) -> Dict[str, Any]:
         try:
             # Preprocess audio
-            temp_path = self.preprocess_audio(audio_data)
+            samples = self.preprocess_audio(audio_data)
             
             # Transcribe
-            start_time = time.time()
-            result = self.model.transcribe(temp_path)
-            inference_time = time.time() - start_time
+            start_time = time.perf_counter()
+            result = self._run_model(samples)
+            inference_time = time.perf_counter() - start_time
             
             # Log performance metrics
             logging.info(f"Transcription completed in {inference_time:.2f}s")
             
-            # Cleanup
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            
             return {
                 "text": result["text"],
                 "inference_time": inference_time,
@@ -88,13 +105,47 @@ class WhisperTranscriber:
                 "segments": result.get("segments", [])
             }
             
-        except AudioTranscriptionError as e:
+        except (AudioTranscriptionError, UploadLimitError):
             # Re-raise custom exceptions
             raise
         except Exception as e:
             logging.error(f"Transcription failed: {str(e)}")
             raise AudioTranscriptionError("TRANSCRIPTION_ERROR", f"Failed to transcribe audio: {str(e)}")
 
+    def transcribe_samples(self, samples: np.ndarray) -> Dict[str, Any]:
+        """Transcribe already decoded 16kHz mono float32 samples, e.g. one long-form window
+
+        Args:
+            samples: Audio samples
+
+        Returns:
+            Dictionary with the text and its segments (start/end in seconds)
+        """
+        try:
+            result = self._run_model(samples)
+        except Exception as e:
+            logging.error(f"Transcription failed: {str(e)}")
+            raise AudioTranscriptionError("TRANSCRIPTION_ERROR", f"Failed to transcribe audio: {str(e)}")
+        segments = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result.get("segments", [])]
+        if not segments and result["text"].strip():
+            segments = [{"start": 0.0, "end": len(samples) / TARGET_SAMPLE_RATE, "text": result["text"]}]
+        return {"text": result["text"], "segments": segments}
+
+    def _run_model(self, samples: np.ndarray) -> Dict[str, Any]:
+        if self.backend == "torch":
+            return self.model.transcribe(samples, fp16=False)
+        # faster-whisper yields segments lazily; decoding happens while iterating
+        segments, info = self.model.transcribe(samples, beam_size=5)
+        segments = [
+            {"id": i, "start": s.start, "end": s.end, "text": s.text, "avg_logprob": s.avg_logprob}
+            for i, s in enumerate(segments)
+        ]
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "language": info.language,
+            "segments": segments
+        }
+
 # Example usage:
 # transcriber = WhisperTranscriber()
 # result = transcriber.transcribe(audio_bytes)
@@ -1,6 +1,7 @@
 import sqlite3
 import os
 import random
+import sys
 
 def corrupt_db(path='test.db'):
     # Create a test database
@@ -44,4 +45,39 @@ def corrupt_db(path='test.db'):
             pass
         # Clean up test database
         if os.path.exists(path):
-            os.remove(path)
\ No newline at end of file
+            os.remove(path)
+
+def corrupt_job_store(path='jobs_chaos.db', items=500):
+    # The bulk transcription queue (CercaAgent/jobs/store.py) must reopen a damaged file
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "CercaAgent"))
+    from jobs.store import JobStore
+
+    store = JobStore(path).open()
+    try:
+        job_id = store.create_job([(f"clip{i}.wav", f"/archive/clip{i}.wav", False) for i in range(items)], "chaos")
+        claimed = store.claim("chaos", 50)
+        store.complete({"id": item["id"], "text": "ok", "intent": "unknown"} for item in claimed[:25])
+        store._conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        store._conn().close()
+        store._local.conn = None
+
+        # Corrupt the database file, sparing the header half the time
+        size = os.path.getsize(path)
+        with open(path, 'r+b') as f:
+            for _ in range(10):
+                f.seek(random.randint(0 if random.random() < 0.5 else 100, size))
+                f.write(os.urandom(10))
+
+        store = JobStore(path).open()
+        job = store.job(job_id)
+        counts = job["counts"] if job else store.stats()["items"]
+        print(f"Recovered after {store.recoveries} rebuild(s): {counts}")
+        # The rebuilt queue has to keep working
+        store.complete({"id": item["id"], "text": "ok", "intent": "unknown"} for item in store.claim("chaos", 10))
+        print(f"Queue usable after recovery: {store.stats()['items']}")
+    except Exception as e:
+        print(f"Job store did not recover: {e}")
+    finally:
+        for name in os.listdir(os.path.dirname(os.path.abspath(path))):
+            if name.startswith(os.path.basename(path)):
+                os.remove(os.path.join(os.path.dirname(os.path.abspath(path)), name))
@@ -1,5 +1,10 @@
+import asyncio
 import os
 import random
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+from harness import Budget, Target
 
 def generate_garbage_audio(path='junk.wav'):
     with open(path, 'wb') as f:
@@ -11,4 +16,133 @@ def test_transcriber(transcribe_func):
         result = transcribe_func('junk.wav')
         print("Transcription result:", result)
     except Exception as e:
-        print("Handled fuzz exception:", e)
\ No newline at end of file
+        print("Handled fuzz exception:", e)
+
+def make_wav(payload: bytes, sample_rate: int = 16000, channels: int = 1, bits: int = 16,
+             format_tag: int = 1, data_size: Optional[int] = None, riff_size: Optional[int] = None,
+             fmt_size: int = 16, extra_chunks: bytes = b"") -> bytes:
+    """A RIFF/WAVE file whose header fields can all lie about the payload"""
+    block_align = (channels * bits // 8) & 0xFFFF
+    byte_rate = (sample_rate * block_align) & 0xFFFFFFFF
+    fmt = struct.pack("<HHIIHH", format_tag, channels & 0xFFFF, sample_rate & 0xFFFFFFFF,
+                      byte_rate, block_align, bits & 0xFFFF)
+    # A small oversized fmt chunk is padded; a huge one only claims its size
+    fmt += b"\0" * max(0, fmt_size - len(fmt)) if fmt_size <= 1024 else b""
+    data_size = len(payload) if data_size is None else data_size
+    body = (b"WAVE" + b"fmt " + struct.pack("<I", fmt_size) + fmt + extra_chunks +
+            b"data" + struct.pack("<I", data_size & 0xFFFFFFFF) + payload)
+    riff_size = len(body) if riff_size is None else riff_size
+    return b"RIFF" + struct.pack("<I", riff_size & 0xFFFFFFFF) + body
+
+def stream_frame(sample_rate: int, payload: bytes) -> bytes:
+    """A /ws/transcribe input: the declared sample_rate (int32) followed by one binary PCM frame"""
+    return struct.pack("<i", sample_rate) + payload
+
+def noise(rng: random.Random, size: int) -> bytes:
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+def audio_corpus(rng: random.Random) -> Iterator[Tuple[str, bytes]]:
+    """Adversarial uploads: broken headers, extreme formats, silence and lying sizes"""
+    yield "empty", b""
+    yield "noise_2k", noise(rng, 2048)
+    yield "riff_noise", b"RIFF" + noise(rng, 4) + b"WAVE" + noise(rng, 2048)
+
+    tone = noise(rng, 32000)
+    valid = make_wav(tone)
+    for cut in (4, 8, 11, 12, 16, 20, 24, 36, 40, 43, 44, 45, 1000):
+        yield f"truncated_header_{cut}", valid[:cut]
+
+    for rate in (0, 1, 2, 7, 8000, 11025, 44100, 96000, 384000, 0xFFFFFFFF):
+        yield f"rate_{rate}", make_wav(tone[:3200], sample_rate=rate)
+    yield "rate_384000_5s", make_wav(noise(rng, 384000 * 2 * 5), sample_rate=384000)
+    for channels in (0, 2, 8, 255, 65535):
+        yield f"channels_{channels}", make_wav(tone[:25500], channels=channels)
+    for format_tag, bits in ((1, 0), (1, 1), (1, 8), (1, 12), (1, 24), (1, 32), (1, 64), (3, 32),
+                             (3, 64), (0xFFFE, 16), (0x55, 16)):
+        yield f"format_{format_tag:#x}_{bits}bit", make_wav(tone[:3200], bits=bits, format_tag=format_tag)
+
+    yield "silence_1s", make_wav(bytes(32000))
+    yield "silence_30s", make_wav(bytes(32000 * 30))
+    yield "silence_48k_stereo_10s", make_wav(bytes(48000 * 4 * 10), sample_rate=48000, channels=2)
+
+    hours = 3 * 3600 * 32000
+    yield "hours_data_size", make_wav(tone[:2048], data_size=hours)
+    yield "hours_riff_size", make_wav(tone[:2048], riff_size=hours)
+    yield "hours_both", make_wav(tone[:2048], data_size=hours, riff_size=hours + 36)
+    yield "max_sizes", make_wav(tone[:2048], data_size=0xFFFFFFFF, riff_size=0xFFFFFFFF)
+    yield "zero_sizes", make_wav(tone, data_size=0, riff_size=0)
+    yield "hours_at_1hz", make_wav(tone[:2048], sample_rate=1, data_size=hours)
+
+    yield "huge_fmt_chunk", make_wav(tone[:2048], fmt_size=0xFFFFFFF0)
+    yield "odd_fmt_chunk", make_wav(tone[:2048], fmt_size=17)
+    yield "many_chunks", make_wav(tone[:2048], extra_chunks=b"LIST\0\0\0\0" * 8000)
+    yield "huge_chunk", make_wav(tone[:2048], extra_chunks=b"junk\xff\xff\xff\x7f")
+    yield "data_before_fmt", b"RIFF\0\0\0\0WAVEdata\x10\0\0\0" + bytes(16)
+
+    # The WebSocket's query parameter goes straight to the resampler
+    for rate in (0, 1, 2, -16000, 7999, 8000, 16000, 44100, 192000, 192001, 2 ** 31 - 1, -2 ** 31):
+        yield f"ws_rate_{rate}", stream_frame(rate, tone[:200])
+    yield "ws_odd_frame", stream_frame(16000, tone[:201])
+    yield "ws_empty_frame", stream_frame(16000, b"")
+    yield "ws_large_frame", stream_frame(8000, noise(rng, 1 << 20))
+
+    for i in range(20):
+        data = bytearray(valid[:rng.randrange(44, 4000)])
+        for _ in range(rng.randrange(1, 8)):
+            data[rng.randrange(min(len(data), 48))] = rng.getrandbits(8)
+        yield f"flipped_header_{i}", bytes(data)
+
+def audio_targets() -> List[Target]:
+    """The upload and WebSocket paths of CercaAgent/main.py, stage by stage (run from CercaAgent/)"""
+    import numpy as np
+    from config import settings
+    from voice_recognition.audio import AudioDecodeError, check_sample_rate, decode_audio, decode_pcm, read_upload
+    from voice_recognition.transcribe import load_samples
+
+    def checked(decode):
+        def run(data: bytes):
+            samples = decode(data)
+            assert samples.ndim == 1, f"{samples.ndim}-D samples"
+            if samples.dtype == np.float32:
+                assert np.isfinite(samples).all(), "non-finite samples"
+            return samples
+        return run
+
+    def upload(data: bytes):
+        view = memoryview(data)
+        offset = 0
+
+        async def read(size: int) -> bytes:
+            nonlocal offset
+            chunk = bytes(view[offset:offset + size])
+            offset += len(chunk)
+            return chunk
+
+        async def run():
+            reader = await read_upload(read, settings.upload_chunk_bytes, max_bytes=settings.max_upload_bytes,
+                                       max_duration_s=settings.max_audio_duration_s, size_hint=len(data))
+            return reader.finish()
+
+        return load_samples(asyncio.run(run()))
+
+    def decode_int16(data: bytes):
+        # DeepSpeech's input format
+        return decode_audio(data, dtype=np.int16, max_duration_s=settings.max_audio_duration_s)
+
+    def ws_frame(data: bytes):
+        # ws_transcribe: the rate is checked once when the socket opens, then every frame is decoded with it
+        if len(data) < 4:
+            raise AudioDecodeError("INVALID_FRAME", "no sample rate")
+        sample_rate = struct.unpack_from("<i", data)[0]
+        check_sample_rate(sample_rate, settings.stream_min_sample_rate, settings.stream_max_sample_rate)
+        return decode_pcm(data[4:], sample_rate)
+
+    # Decoding may legitimately hold the input as int16, float32 and float64
+    # copies at once, and a short clip can resample up to the duration limit
+    budget = Budget(seconds=2.0, base_bytes=32 * 1024 * 1024, per_byte=24.0)
+    return [
+        Target("load_samples", checked(load_samples), budget, (AudioDecodeError,)),
+        Target("upload", checked(upload), budget, (AudioDecodeError,)),
+        Target("decode_int16", checked(decode_int16), budget, (AudioDecodeError,)),
+        Target("ws_frame", checked(ws_frame), budget, (AudioDecodeError,)),
+    ]
@@ -1,5 +1,8 @@
 import random
 import string
+from typing import Iterator, List, Tuple
+
+from harness import Budget, Target
 
 def generate_garbage_text(length=100):
     characters = string.ascii_letters + string.digits + string.punctuation + ' '
@@ -27,4 +30,58 @@ def test_text_classifier(classify_func):
         result = classify_func(long_text)
         print(f"Classification result for very long text: {result}")
     except Exception as e:
-        print(f"Handled long text exception: {e}")
\ No newline at end of file
+        print(f"Handled long text exception: {e}")
+
+def random_unicode(rng: random.Random, length: int) -> str:
+    """Code points from every plane, surrogates and private use included"""
+    return "".join(chr(rng.choice((rng.randrange(0x20, 0x7F), rng.randrange(0x80, 0xD800),
+                                   rng.randrange(0xD800, 0xE000), rng.randrange(0xE000, 0x110000))))
+                   for _ in range(length))
+
+def text_corpus(rng: random.Random) -> Iterator[Tuple[str, str]]:
+    """Transcripts no recognizer should produce, but a client can still send"""
+    printable = string.ascii_letters + string.digits + string.punctuation + " "
+    yield "empty", ""
+    yield "garbage_100", "".join(rng.choice(printable) for _ in range(100))
+    yield "garbage_10k", "".join(rng.choice(printable) for _ in range(10000))
+    yield "whitespace_100k", " \t\n\r\x0b\x0c" * 20000
+    yield "ascii_1m", "".join(rng.choice(string.ascii_lowercase + " ") for _ in range(1000000))
+    yield "one_word_1m", "a" * 1000000
+    yield "punctuation_100k", string.punctuation * 3000
+
+    # Long inputs that keep matching the catalog's prefixes and slots
+    yield "command_prefix_repeated", "turn on the " * 20000
+    yield "optional_words_repeated", "please um uh " * 20000 + "turn on the lights"
+    yield "query_slot_100k_words", "play " + "jazz " * 100000
+    yield "room_synonyms", "turn on the lights in the " + "master bedroom front room " * 20000
+    yield "number_words", "set the lights to " + "one hundred and " * 20000 + "percent"
+    yield "huge_number", "set the volume to " + "9" * 100000
+    yield "ambiguous_slots", " ".join(rng.choice(("play", "jazz", "music", "in", "the", "kitchen", "start",
+                                                  "rock", "hip", "hop")) for _ in range(50000))
+
+    # Unicode that changes length, case or class under normalization
+    yield "combining_marks", "turn on the lights" + "\u0301" * 100000
+    yield "zero_width", "\u200b".join("turn on the lights") * 2000
+    yield "rtl_override", "\u202e" + "stheil eht no nrut" * 5000
+    yield "emoji_zwj", "\U0001F468\u200d\U0001F469\u200d\U0001F467" * 30000
+    yield "fullwidth", "".join(chr(ord(c) + 0xFEE0) if c != " " else c for c in "turn on the lights to 100 percent")
+    yield "case_expanding", "\u0130" * 50000 + " \u00df" * 50000
+    yield "lone_surrogates", "turn on \ud800 the \udfff lights" * 1000
+    yield "control_chars", "".join(chr(c) for c in range(32)) * 3000
+    yield "nul_bytes", "turn\0on\0the\0lights" * 5000
+    yield "unicode_digits", "set the volume to \u0665\u0660 percent"
+    for i in range(10):
+        yield f"random_unicode_{i}", random_unicode(rng, rng.choice((10, 1000, 100000)))
+
+def text_targets() -> List[Target]:
+    """Transcript handling in CercaAgent, cheapest first (run from CercaAgent/)"""
+    from command_mapping.action_map import catalog
+    from voice_recognition.classify import normalize, parse_command
+
+    # is_final runs once per generated token while decoding, so it gets the tightest budget
+    return [
+        Target("normalize", normalize, Budget(seconds=0.5), kind="text"),
+        Target("catalog_match", lambda text: catalog.current().match(text), Budget(seconds=0.5), kind="text"),
+        Target("is_final", lambda text: catalog.current().is_final(text), Budget(seconds=0.25), kind="text"),
+        Target("parse_command", parse_command, Budget(seconds=2.0, base_bytes=64 * 1024 * 1024), kind="text"),
+    ]
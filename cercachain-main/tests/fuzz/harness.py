@@ -0,0 +1,189 @@
+"""Budgeted fuzzing: run inputs through a target, check time and memory, keep what fails.
+
+Every input is timed, then run again under tracemalloc, so the memory budget
+covers Python and numpy allocations (numpy reports its buffers to
+tracemalloc). A hard timeout (SIGALRM, where the platform has it) stops
+inputs that hang. An input fails when it raises anything but the target's
+expected errors, or when it goes over the time or peak-memory budget. Failures are shrunk to the smallest input that
+fails the same way and written to the reproducer directory. Later runs replay
+them before the generated corpus, so they act as regression tests.
+"""
+import hashlib
+import json
+import os
+import signal
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+Input = Union[bytes, str]
+
+class HardTimeout(Exception):
+    pass
+
+class Budget:
+    """Per-input limits: wall time, plus peak traced memory of ``base + per_byte * input size``"""
+
+    def __init__(self, seconds: float = 1.0, base_bytes: int = 16 * 1024 * 1024, per_byte: float = 16.0):
+        self.seconds = seconds
+        self.base_bytes = base_bytes
+        self.per_byte = per_byte
+
+    def peak_bytes(self, data: Input) -> int:
+        return int(self.base_bytes + self.per_byte * len(data))
+
+class Target:
+    """A pipeline function under fuzzing and the errors that count as a clean rejection"""
+
+    def __init__(self, name: str, func: Callable[[Input], object], budget: Budget,
+                 expected: Tuple[type, ...] = (), kind: str = "bytes"):
+        self.name = name
+        self.func = func
+        self.budget = budget
+        self.expected = expected
+        # "bytes" or "text", for saving and loading reproducers
+        self.kind = kind
+
+def _max_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return rss if os.uname().sysname == "Darwin" else rss * 1024
+
+def _on_alarm(signum, frame):
+    raise HardTimeout()
+
+def _run(target: Target, data: Input, hard_limit: int) -> Tuple[str, Optional[str]]:
+    alarm = hasattr(signal, "SIGALRM")
+    if alarm:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.alarm(hard_limit)
+    try:
+        target.func(data)
+        return "ok", None
+    except HardTimeout:
+        return "hang", f"still running after {hard_limit}s"
+    except target.expected as e:
+        return "rejected", f"{type(e).__name__}: {e}"
+    except Exception as e:
+        return "crash", f"{type(e).__name__}: {e}"
+    finally:
+        if alarm:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous)
+
+def measure(target: Target, data: Input) -> Dict:
+    """Run one input and report its outcome, wall time and peak memory
+
+    Time and memory come from separate runs: tracing every allocation slows
+    allocation-heavy code down several times over.
+    """
+    hard_limit = max(1, int(target.budget.seconds * 10))
+    started = time.perf_counter()
+    outcome, error = _run(target, data, hard_limit)
+    elapsed = time.perf_counter() - started
+
+    peak = rss_growth = None
+    if outcome not in ("hang", "crash"):
+        rss_before = _max_rss_bytes()
+        tracemalloc.start()
+        try:
+            _run(target, data, hard_limit)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        if rss_before is not None:
+            rss_growth = _max_rss_bytes() - rss_before
+
+    failure = None
+    if outcome in ("hang", "crash"):
+        failure = outcome
+    elif elapsed > target.budget.seconds:
+        failure = "slow"
+    elif peak > target.budget.peak_bytes(data):
+        failure = "memory"
+    return {
+        "outcome": outcome,
+        "failure": failure,
+        "error": error,
+        "seconds": round(elapsed, 4),
+        "peak_bytes": peak,
+        # Process-wide high-water mark growth; informational, the budget uses tracemalloc
+        "rss_growth_bytes": rss_growth,
+        "size": len(data),
+    }
+
+def minimize(target: Target, data: Input, failure: str, max_attempts: int = 200) -> Input:
+    """Shrink ``data`` while it keeps failing with the same kind of failure
+
+    Drops ever smaller chunks from the input (a simplified delta debugging),
+    stopping after ``max_attempts`` runs.
+    """
+    attempts = 0
+    chunk = len(data) // 2
+    while chunk >= 1 and attempts < max_attempts:
+        start = 0
+        shrunk = False
+        while start < len(data) and attempts < max_attempts:
+            candidate = data[:start] + data[start + chunk:]
+            attempts += 1
+            if candidate and measure(target, candidate)["failure"] == failure:
+                data = candidate
+                shrunk = True
+            else:
+                start += chunk
+        if not shrunk:
+            chunk //= 2
+    return data
+
+def save_reproducer(directory: str, target: Target, data: Input, report: Dict) -> str:
+    """Write the input and its report as ``<target>/<failure>-<digest>``; returns the input's path"""
+    raw = data.encode("utf-8", "surrogatepass") if isinstance(data, str) else data
+    folder = os.path.join(directory, target.name)
+    os.makedirs(folder, exist_ok=True)
+    stem = os.path.join(folder, f"{report['failure']}-{hashlib.sha1(raw).hexdigest()[:12]}")
+    with open(f"{stem}.bin", "wb") as f:
+        f.write(raw)
+    with open(f"{stem}.json", "w") as f:
+        json.dump({"target": target.name, **report}, f, indent=2)
+    return f"{stem}.bin"
+
+def load_reproducers(directory: str, target: Target) -> List[Tuple[str, Input]]:
+    folder = os.path.join(directory, target.name)
+    if not os.path.isdir(folder):
+        return []
+    found = []
+    for name in sorted(os.listdir(folder)):
+        if name.endswith(".bin"):
+            with open(os.path.join(folder, name), "rb") as f:
+                raw = f.read()
+            found.append((f"replay:{name}", raw.decode("utf-8", "surrogatepass") if target.kind == "text" else raw))
+    return found
+
+def run_target(target: Target, corpus: Iterable[Tuple[str, Input]], reproducer_dir: Optional[str] = None,
+               shrink: bool = True, verbose: bool = False) -> List[Dict]:
+    """Fuzz one target with saved reproducers first, then ``corpus`` (name, input) pairs
+
+    Returns the failure reports; each failure is saved, minimized, when
+    ``reproducer_dir`` is set.
+    """
+    inputs = load_reproducers(reproducer_dir, target) if reproducer_dir else []
+    failures = []
+    for name, data in inputs + list(corpus):
+        report = measure(target, data)
+        if verbose or report["failure"]:
+            status = report["failure"] or report["outcome"]
+            print(f"  {target.name:<14} {name:<36} {status:<8} {report['seconds'] * 1000:8.1f} ms "
+                  f"{(report['peak_bytes'] or 0) / 1e6:8.2f} MB  {report['error'] or ''}"[:200])
+        if not report["failure"]:
+            continue
+        report["input"] = name
+        if reproducer_dir and not name.startswith("replay:"):
+            smallest = minimize(target, data, report["failure"]) if shrink else data
+            report["minimized_size"] = len(smallest)
+            report["reproducer"] = save_reproducer(reproducer_dir, target, smallest, report)
+        failures.append(report)
+    return failures
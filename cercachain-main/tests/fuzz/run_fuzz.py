@@ -0,0 +1,76 @@
+"""Fuzz the voice pipeline with adversarial text and audio under time and memory budgets.
+
+    python tests/fuzz/run_fuzz.py [--suite text,audio] [--seed 0] [--budget-scale 2]
+
+Saved reproducers in tests/fuzz/reproducers are replayed first. New failures
+are minimized and saved there as <failure>-<digest>, and the run exits with
+status 1. Fix the bug, then rename the files to regression-<digest> and keep
+them as regression inputs.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+FUZZ_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.abspath(os.path.join(FUZZ_DIR, "..", "..", "CercaAgent"))
+sys.path.insert(0, AGENT_DIR)
+# The shared audio modules, which CercaAgent's entry points normally put on the path
+sys.path.append(os.path.abspath(os.path.join(FUZZ_DIR, "..", "..", "ml", "audio_recognition")))
+
+from harness import run_target  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description="Budgeted fuzzing of the voice pipeline")
+    parser.add_argument("--suite", default="text,audio", help="Comma-separated: text, audio")
+    parser.add_argument("--target", action="append", help="Only these targets (repeatable)")
+    parser.add_argument("--seed", type=int, default=None, help="Corpus seed (random by default, printed)")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="Multiply every time budget, e.g. for slow CI machines")
+    parser.add_argument("--reproducers", default=os.path.join(FUZZ_DIR, "reproducers"),
+                        help="Where failing inputs are saved and replayed from")
+    parser.add_argument("--no-shrink", action="store_true", help="Save failing inputs without minimizing them")
+    parser.add_argument("--verbose", action="store_true", help="Print every input, not just failures")
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    reproducers = os.path.abspath(args.reproducers)
+    # CercaAgent resolves its config, catalog and model paths from its own directory
+    os.chdir(AGENT_DIR)
+
+    suites = []
+    for name in [s.strip() for s in args.suite.split(",") if s.strip()]:
+        if name == "text":
+            from fuzz_text import text_corpus, text_targets
+            suites.append((text_targets, text_corpus))
+        elif name == "audio":
+            from fuzz_audio import audio_corpus, audio_targets
+            suites.append((audio_targets, audio_corpus))
+        else:
+            parser.error(f"Unknown suite: {name}")
+
+    print(f"Fuzzing with seed {seed}")
+    failures = []
+    started = time.perf_counter()
+    for targets, corpus in suites:
+        for target in targets():
+            if args.target and target.name not in args.target:
+                continue
+            target.budget.seconds *= args.budget_scale
+            # Warm up once so model loading and catalog compilation stay out of the budgets
+            try:
+                target.func(b"" if target.kind == "bytes" else "")
+            except Exception:
+                pass
+            print(f"{target.name}:")
+            failures += run_target(target, corpus(random.Random(seed)), reproducers,
+                                   shrink=not args.no_shrink, verbose=args.verbose)
+
+    print(f"\n{len(failures)} failing inputs in {time.perf_counter() - started:.1f}s (seed {seed})")
+    for failure in failures:
+        print(f"  {failure['input']}: {failure['failure']} -> {failure.get('reproducer', 'replayed')}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()